@@ -1,6 +1,9 @@
 import logging
 import asyncio
 
+from memory import install_memory_report
+from metrics import start_metrics
+from profiler import install_profiler
 from qfl_signals import QFL_signals
 from signals import ResearchSignals
 from websocket import (
@@ -15,14 +18,22 @@ logging.basicConfig(
     level=logging.INFO,
 )
 
-async def signals_main():
-    qfl = QFL_signals()
+async def signals_main(research: ResearchSignals):
+    # 15m stats resampled from research candles, candlestick_interval must divide 15m
+    # or CANDLE_BASE_INTERVAL (e.g. 1m) be set, otherwise stats are requested from Binbot
+    qfl = QFL_signals(clock=research.clock, candles=research.base_candles)
     await asyncio.gather(
         qfl.start_stream(),
     )
 
 
 if __name__ == "__main__":
+    # Latency histograms, opt-in with METRICS_PORT or METRICS_LOG_INTERVAL
+    start_metrics()
+    # Sampling profiler, opt-in with PROFILE_SECONDS or SIGUSR1
+    install_profiler()
+    # Memory snapshots at /memory and on SIGUSR2
+    install_memory_report()
     try:
         rs = ResearchSignals()
         rs.start_stream()
@@ -27,7 +27,9 @@ def ma_candlestick_jump(
         e.g. Given predictor y = 0.123x + 2.5, for x = 1, y = 0.123 + 2.5 = 2.623
              Given predictor y = 0.123x + 10, for x = 1, y = 0.123 + 10 = 10.123
 
-    Chaikin_diff: positive values indicate overbought, negative values indicate oversold
+    self.chaikin_diff: change of the Chaikin oscillator since the previous candle
+    (see ResearchSignals.candle_features), positive values indicate overbought,
+    negative values indicate oversold
     - Buy when oversold, sell when overbought
 
     SD: standard deviation of 0.006 seems to be a good threshold after monitoring signals,
@@ -6,8 +6,10 @@ import string
 import time
 from datetime import datetime
 
-from requests import Session, get
+from requests import Session
 
+from clock import get_clock
+from http_client import get
 from telegram_bot import TelegramBot
 
 
@@ -26,6 +28,7 @@ class NewTokens:
         self.amount = None
         self.tx = 1
         self.qty = 0
+        self.clock = get_clock()
 
     def run(self):
         """
@@ -53,7 +56,7 @@ class NewTokens:
             f"{self.annoucements_url}"
             f"?{queries[0]}&{queries[1]}&{queries[2]}&{queries[3]}&{queries[4]}&{queries[5]}"
         )
-        response = self.session.get(request_url)
+        response = get(request_url, session=self.session)
         response.raise_for_status()
         latest_announcement = response.json()
         data = latest_announcement["data"]["catalogs"][0]["articles"][0]["title"]
@@ -63,7 +66,7 @@ class NewTokens:
             for i, t in enumerate(tokens):
                 if (
                     t in self.last_processed_kline
-                    and (float(time.time()) - float(self.last_processed_kline[t]))
+                    and (float(self.clock.time()) - float(self.last_processed_kline[t]))
                     > 86400
                 ):
                     del self.last_processed_kline[t]
@@ -73,7 +76,7 @@ class NewTokens:
                 release_date = dt_object.strftime("%Y-%m-%dT%H:%M")
 
                 # launched already?
-                if datetime.now() < dt_object:
+                if self.clock.now() < dt_object:
                     msg = f"New token/cryptocurrency <strong>#{t}</strong> about to launch {release_date}."
                     self.telegram_bot.send_msg(msg)
                     print(msg)
@@ -1,5 +1,5 @@
 import os
-import requests
+import http_client
 from utils import handle_binance_errors, define_strategy
 
 
@@ -21,7 +21,7 @@ def rally_or_pullback(
 
     https://www.binance.com/en/support/faq/understanding-top-movers-statuses-on-binance-spot-trading-18c97e8ab67a4e1b824edd590cae9f16
     """
-    response = requests.get(url=self.ticker24_url, params={"symbol": symbol})
+    response = http_client.get(url=self.ticker24_url, params={"symbol": symbol})
     data = handle_binance_errors(response)
 
     # Rally
@@ -5,7 +5,9 @@ from decimal import Decimal
 from random import randrange
 from urllib.parse import urlencode
 from dotenv import load_dotenv
-from requests import Session, get, post
+from requests import Session
+from http_client import get, post, request
+from price_cache import get_price_cache
 from utils import handle_binance_errors
 
 load_dotenv()
@@ -14,10 +16,11 @@ class BinanceApi:
     """
     Binance Api URLs
     Picks root url randomly to avoid rate limits
+    BINANCE_API_URL overrides it, e.g. local fake exchange (benchmarks/fake_exchange.py)
     """
 
     api_servers = ["https://api.binance.com", "https://api3.binance.com"]
-    BASE = api_servers[randrange(3) - 1]
+    BASE = os.getenv("BINANCE_API_URL") or api_servers[randrange(3) - 1]
     WS_BASE = "wss://stream.binance.com:9443/stream?streams="
 
     recvWindow = 5000
@@ -79,7 +82,7 @@ class BinanceApi:
             hashlib.sha256,
         ).hexdigest()
         url = f"{url}?{query_string}&signature={signature}"
-        res = session.request(method, url=url)
+        res = request(method, url, session=session)
         data = handle_binance_errors(res)
         return data
 
@@ -95,8 +98,16 @@ class BinanceApi:
         exchange_info = get(url=self.exchangeinfo_url, params=params).json()
         return exchange_info
 
-    def _get_raw_klines(self, pair, limit=500, interval="15m"):
+    def _get_raw_klines(self, pair, limit=500, interval="15m", start_time=None, end_time=None):
+        """
+        Weight 2. Latest `limit` klines (max 1000),
+        or the first `limit` from start_time if given (see kline_sync.py)
+        """
         params = {"symbol": pair, "interval": interval, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
         res = get(url=self.candlestick_url, params=params)
         data = handle_binance_errors(res)
         return data
@@ -104,9 +115,14 @@ class BinanceApi:
     def ticker_price(self, symbol=None):
         """
         Weight 2 (v3). Ideal for list of symbols
+
+        Single symbols come from the streams price cache (price_cache.py) when fresh
         """
         params = None
         if symbol:
+            price = get_price_cache().get(symbol)
+            if price is not None:
+                return {"symbol": symbol, "price": price}
             params = {"symbol": symbol}
         r = get(url=self.ticker_price_url, params=params)
         response = handle_binance_errors(r)
@@ -1,11 +1,13 @@
 import copy
 import math
 import logging
-import requests
+import http_client
 
-from datetime import datetime
+from clock import get_clock
 from enums import Strategy
 from apis import BinbotApi
+from balances import BalanceSnapshot
+from settings_store import thaw
 from utils import InvalidSymbol, handle_binance_errors, round_numbers, supress_notation
 
 class AutotradeError(Exception):
@@ -16,7 +18,14 @@ class AutotradeError(Exception):
 
 class Autotrade(BinbotApi):
     def __init__(
-        self, pair, settings, algorithm_name, db_collection_name="paper_trading"
+        self,
+        pair,
+        settings,
+        algorithm_name,
+        db_collection_name="paper_trading",
+        balance_snapshot: BalanceSnapshot | None = None,
+        clock=None,
+        reservation_key=None,
     ) -> None:
         """
         Initialize automatic bot trading.
@@ -30,11 +39,15 @@ class Autotrade(BinbotApi):
         settings: autotrade/test_autotrade settings
         algorithm_name: usually the filename
         db_collection_name: Mongodb collection name ["paper_trading", "bots"]
+        balance_snapshot: shared balance cache, a new one is created if not provided
+        clock: see clock.py, defaults to process clock
+        reservation_key: key of the balance_snapshot reservation made for this bot, defaults to pair
         """
         self.pair = pair
-        self.settings = settings # both settings and test_settings
+        self.settings = thaw(settings) # both settings and test_settings, mutable copy of the snapshot
         self.decimals = self.price_precision(pair)
-        current_date = datetime.now().strftime("%Y-%m-%dT%H:%M")
+        self.clock = clock or get_clock()
+        current_date = self.clock.now().strftime("%Y-%m-%dT%H:%M")
         self.algorithm_name = algorithm_name
         self.default_bot = {
             "pair": pair,
@@ -59,6 +72,8 @@ class Autotrade(BinbotApi):
             "dynamic_trailling": False
         }
         self.db_collection_name = db_collection_name
+        self.balance_snapshot = balance_snapshot or BalanceSnapshot(clock=self.clock)
+        self.reservation_key = reservation_key or pair
         self.blacklist: list | None = None
         blacklist_res = self.get_blacklist()
         if not "error" in blacklist_res:
@@ -84,17 +99,17 @@ class Autotrade(BinbotApi):
             self.settings["system_logs"] = []
             self.settings["system_logs"].append(msg)
 
-        res = requests.put(url=self.bb_autotrade_settings_url, json=self.settings)
+        res = http_client.put(url=self.bb_autotrade_settings_url, json=self.settings)
         result = handle_binance_errors(res)
         return result
 
     def submit_bot_event_logs(self, bot_id, message):
-        res = requests.post(url=f"{self.bb_submit_errors}/{bot_id}", json=message)
+        res = http_client.post(url=f"{self.bb_submit_errors}/{bot_id}", json=message)
         return res
 
     def add_to_blacklist(self, symbol, reason=None):
         data = {"symbol": symbol, "reason": reason}
-        res = requests.post(url=self.bb_blacklist_url, json=data)
+        res = http_client.post(url=self.bb_blacklist_url, json=data)
         result = handle_binance_errors(res)
         return result
 
@@ -102,12 +117,12 @@ class Autotrade(BinbotApi):
         """
         Liquidate and disable margin_short trades
         """
-        res = requests.get(url=f'{self.bb_liquidation_url}/{pair}')
+        res = http_client.get(url=f'{self.bb_liquidation_url}/{pair}')
         result = handle_binance_errors(res)
         return result
     
     def delete_bot(self, bot_id):
-        res = requests.delete(url=f"{self.bb_bot_url}", params={"id": bot_id})
+        res = http_client.delete(url=f"{self.bb_bot_url}", params={"id": bot_id})
         result = handle_binance_errors(res)
         return result
 
@@ -294,6 +309,8 @@ class Autotrade(BinbotApi):
         Run autotrade
         2. Create bot with given parameters from research_controller
         3. Activate bot
+
+        Returns True if the bot was opened
         """
         logging.info(f"{self.db_collection_name} Autotrade running with {self.pair}...")
         if self.blacklist:
@@ -304,8 +321,7 @@ class Autotrade(BinbotApi):
             
         # Check balance, if no balance set autotrade = 0
         # Use dahsboard add quantity
-        res = requests.get(url=self.bb_balance_url)
-        balances = handle_binance_errors(res)
+        balances = self.balance_snapshot.balances()
         qty = 0
         self.default_bot["strategy"] = self.settings["strategy"]
 
@@ -343,7 +359,8 @@ class Autotrade(BinbotApi):
                 stop_loss_price_inc = (float(initial_price) * (1 + (self.default_bot["stop_loss"] / 100)))
                 # transfer quantity required to cover losses
                 transfer_qty = stop_loss_price_inc * estimate_qty
-                balances = self.balance_estimate()
+                # Funds reserved for this bot are the ones we are about to use
+                balances = self.balance_snapshot.available(exclude=self.reservation_key)
                 if balances < transfer_qty:
                     logging.error(f"Not enough funds to autotrade margin_short bot. Unable to cover potential losses. balances: {balances}. transfer qty: {transfer_qty}")
                     return
@@ -354,7 +371,7 @@ class Autotrade(BinbotApi):
                 pass
 
         # Create bot
-        create_bot_res = requests.post(url=bot_url, json=self.default_bot)
+        create_bot_res = http_client.post(url=bot_url, json=self.default_bot)
         create_bot = handle_binance_errors(create_bot_res)
 
         if "error" in create_bot and create_bot["error"] == 1:
@@ -366,7 +383,7 @@ class Autotrade(BinbotApi):
 
         # Activate bot
         botId = create_bot["botId"]
-        res = requests.get(url=f"{activate_url}/{botId}")
+        res = http_client.get(url=f"{activate_url}/{botId}")
         bot = res.json()
 
         if "error" in bot and bot["error"] > 0:
@@ -386,3 +403,4 @@ class Autotrade(BinbotApi):
         else:
             message = f"Succesful {self.db_collection_name} autotrade, opened with {self.pair}!"
             self.submit_bot_event_logs(botId, message)
+            return True
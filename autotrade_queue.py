@@ -0,0 +1,130 @@
+import logging
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from metrics import get_metrics
+
+
+class AutotradeJob:
+    """
+    Status of one autotrade request submitted to the AutotradeQueue
+    """
+
+    def __init__(self, key) -> None:
+        self.key = key
+        self.status = "queued"  # ["queued", "running", "completed", "failed"]
+        self.result = None
+        self.error = None
+        self.submitted_at = perf_counter()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def wait_time(self):
+        if self.started_at is None:
+            return None
+        return self.started_at - self.submitted_at
+
+    @property
+    def latency(self):
+        """
+        Total time between submission and completion
+        """
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.submitted_at
+
+
+class AutotradeQueue:
+    """
+    Runs autotrade activations in a dedicated thread pool,
+    so signal processing (kline stream) never waits on Binbot
+
+    - Jobs are identified by an idempotency key (pair + algorithm + candle time),
+    the same key submitted twice is ignored
+    - Concurrency is bounded by max_workers,
+    jobs beyond max_pending are rejected instead of piling up
+    """
+
+    def __init__(self, max_workers=4, max_pending=50, history=500) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="autotrade"
+        )
+        self.max_pending = max_pending
+        self.history = history
+        self.lock = threading.Lock()
+        self.jobs: OrderedDict[str, AutotradeJob] = OrderedDict()
+        self.pending = 0
+
+    def submit(self, key, fn, *args, **kwargs) -> AutotradeJob | None:
+        """
+        Submit fn(*args, **kwargs) as an autotrade job
+
+        Returns None if the job was not queued (duplicate key or queue full)
+        """
+        with self.lock:
+            if key in self.jobs:
+                logging.info(f"Autotrade job {key} already submitted, skipping")
+                return None
+
+            if self.pending >= self.max_pending:
+                logging.error(f"Autotrade queue full, dropping job {key}")
+                return None
+
+            job = AutotradeJob(key)
+            self.jobs[key] = job
+            self.pending += 1
+            # Old jobs are only kept to reject duplicates and for stats
+            while len(self.jobs) > self.history:
+                self.jobs.popitem(last=False)
+
+        self.executor.submit(self._run, job, fn, *args, **kwargs)
+        return job
+
+    def _run(self, job: AutotradeJob, fn, *args, **kwargs):
+        job.status = "running"
+        job.started_at = perf_counter()
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = "completed"
+        except Exception as error:
+            job.error = error
+            job.status = "failed"
+            logging.error(f"Autotrade job {job.key} failed: {error}")
+        finally:
+            job.finished_at = perf_counter()
+            with self.lock:
+                self.pending -= 1
+
+        metrics = get_metrics()
+        metrics.observe("autotrade_job.wait", job.wait_time)
+        metrics.observe("autotrade_job.run", job.finished_at - job.started_at)
+        logging.info(
+            f"Autotrade job {job.key} {job.status} in {job.latency:.3f}s (queued {job.wait_time:.3f}s)"
+        )
+
+    def stats(self) -> dict:
+        """
+        Job count per status and latency percentiles (seconds) of finished jobs
+        """
+        with self.lock:
+            jobs = list(self.jobs.values())
+
+        statuses = {}
+        for job in jobs:
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+
+        latencies = sorted(job.latency for job in jobs if job.latency is not None)
+        percentiles = {}
+        if latencies:
+            for p in (50, 99):
+                index = min(len(latencies) - 1, int(len(latencies) * p / 100))
+                percentiles[f"p{p}"] = round(latencies[index], 4)
+
+        return {"pending": self.pending, "statuses": statuses, "latency": percentiles}
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
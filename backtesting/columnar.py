@@ -0,0 +1,107 @@
+import json
+import os
+
+import numpy
+
+"""
+Minimal columnar storage: one fixed-width binary file per column
+plus a schema.json with column names and dtypes.
+
+Rows are appended to every column at once, so after an interruption
+all columns are truncated to the shortest one when reopened.
+"""
+
+
+class ColumnarWriter:
+    def __init__(self, directory, columns: dict | None = None) -> None:
+        """
+        Args:
+        - directory: created if it doesn't exist
+        - columns: name -> numpy dtype. Required for new files,
+        read from schema.json for existing ones
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        schema_path = os.path.join(directory, "schema.json")
+
+        if os.path.exists(schema_path):
+            with open(schema_path) as f:
+                schema = json.load(f)
+            if columns and list(columns) != list(schema):
+                raise ValueError(f"Columns don't match existing schema in {directory}")
+        else:
+            if not columns:
+                raise ValueError("columns are required to create a new columnar file")
+            schema = {name: numpy.dtype(dtype).str for name, dtype in columns.items()}
+            with open(schema_path, "w") as f:
+                json.dump(schema, f, indent=2)
+
+        self.dtypes = {name: numpy.dtype(dtype) for name, dtype in schema.items()}
+        self._truncate()
+        self.files = {
+            name: open(self._path(name), "ab") for name in self.dtypes
+        }
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def _truncate(self):
+        """
+        Drop partially written rows
+        """
+        rows = self.rows()
+        for name, dtype in self.dtypes.items():
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) > rows * dtype.itemsize:
+                os.truncate(path, rows * dtype.itemsize)
+
+    def rows(self) -> int:
+        counts = []
+        for name, dtype in self.dtypes.items():
+            path = self._path(name)
+            counts.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+        return min(counts) if counts else 0
+
+    def append(self, rows: dict):
+        """
+        Append rows, rows is column name -> value or array of values
+        """
+        for name, dtype in self.dtypes.items():
+            numpy.asarray(rows[name], dtype=dtype).reshape(-1).tofile(self.files[name])
+        for f in self.files.values():
+            f.flush()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_columns(directory, columns=None, mmap=False) -> dict:
+    """
+    Read columns as numpy arrays (memory mapped if mmap=True)
+    """
+    with open(os.path.join(directory, "schema.json")) as f:
+        schema = json.load(f)
+
+    dtypes = {name: numpy.dtype(dtype) for name, dtype in schema.items()}
+    paths = {name: os.path.join(directory, f"{name}.bin") for name in dtypes}
+    rows = min(
+        (os.path.getsize(path) // dtypes[name].itemsize if os.path.exists(path) else 0)
+        for name, path in paths.items()
+    )
+
+    result = {}
+    for name in columns or dtypes:
+        if rows == 0:
+            result[name] = numpy.array([], dtype=dtypes[name])
+        elif mmap:
+            result[name] = numpy.memmap(paths[name], dtype=dtypes[name], mode="r", shape=(rows,))
+        else:
+            result[name] = numpy.fromfile(paths[name], dtype=dtypes[name], count=rows)
+    return result
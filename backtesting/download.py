@@ -0,0 +1,304 @@
+import argparse
+import json
+import logging
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy
+import http_client
+from apis import BinanceApi
+from backtesting.columnar import ColumnarWriter, read_columns
+from backtesting.engine import CandleArrays
+from candles import FIELDS, next_open_time
+from clock import get_clock
+
+"""
+Bulk klines history downloader
+
+Pages through /api/v3/klines (1000 candles per request) for many symbols concurrently,
+under a shared request weight budget per minute, into a columnar archive (see columnar.py):
+
+<directory>/<interval>/<SYMBOL>/{schema.json, open_time.bin, open.bin, ...}
+<directory>/<interval>/index.json: rows, first and last open time per symbol
+
+Downloads resume from the last stored candle of each symbol. Only closed candles newer
+than the last stored one are appended, so overlapping pages and retries don't duplicate rows.
+
+Usage:
+python -m backtesting.download archive --interval 1m --start 2024-01-01
+python -m backtesting.download archive --interval 1m --symbols BTCUSDT ETHUSDT --start 2024-01-01 --end 2024-03-01
+python -m backtesting.download archive --interval 1m --start 2024-02-01 --export candles.npz
+"""
+
+# Weight of a klines request, any limit
+KLINE_WEIGHT = 2
+
+COLUMNS = {name: numpy.int64 if name == "open_time" else numpy.float64 for name in FIELDS}
+
+
+class WeightBudget:
+    """
+    Request weight per minute shared by downloader threads,
+    half of Binance 6000 limit by default so live processes have room
+    """
+
+    def __init__(self, per_minute=3000, clock=None) -> None:
+        self.per_minute = per_minute
+        self.clock = clock or get_clock()
+        self.lock = threading.Lock()
+        self.minute = None
+        self.used = 0
+
+    def _reset(self, now):
+        minute = int(now // 60)
+        if minute != self.minute:
+            self.minute = minute
+            self.used = 0
+
+    def acquire(self, weight):
+        """
+        Wait until weight fits in the current minute
+        """
+        while True:
+            with self.lock:
+                now = self.clock.time()
+                self._reset(now)
+                if self.used + weight <= self.per_minute:
+                    self.used += weight
+                    return
+                wait = (self.minute + 1) * 60 - now
+            self.clock.sleep(wait)
+
+    def observe(self, used_weight):
+        """
+        x-mbx-used-weight-1m of a response, includes other processes using the same IP
+        """
+        with self.lock:
+            self._reset(self.clock.time())
+            self.used = max(self.used, used_weight)
+
+
+class KlineDownloader:
+    def __init__(self, directory, interval="1m", budget=None, workers=8, limit=1000, clock=None) -> None:
+        """
+        Args:
+        - directory: archive root, see module docstring
+        - interval: one of EnumDefinitions.chart_intervals
+        - budget: WeightBudget, defaults to 3000 per minute
+        - workers: symbols downloaded concurrently
+        - limit: candles per request, max 1000
+        """
+        self.directory = os.path.join(directory, interval)
+        self.interval = interval
+        self.clock = clock or get_clock()
+        self.budget = budget or WeightBudget(clock=self.clock)
+        self.workers = workers
+        self.limit = limit
+        self.index_lock = threading.Lock()
+
+    def path(self, symbol):
+        return os.path.join(self.directory, symbol)
+
+    def last_open_time(self, symbol) -> int | None:
+        if not os.path.exists(os.path.join(self.path(symbol), "schema.json")):
+            return None
+        open_time = read_columns(self.path(symbol), ["open_time"], mmap=True)["open_time"]
+        return int(open_time[-1]) if len(open_time) else None
+
+    def _fetch(self, symbol, start_time, end_time) -> list | None:
+        """
+        Raw klines page, None if rate limited (retry after waiting)
+        """
+        self.budget.acquire(KLINE_WEIGHT)
+        response = http_client.get(
+            url=BinanceApi.candlestick_url,
+            params={
+                "symbol": symbol,
+                "interval": self.interval,
+                "startTime": start_time,
+                "endTime": end_time,
+                "limit": self.limit,
+            },
+        )
+        used_weight = response.headers.get("x-mbx-used-weight-1m")
+        if used_weight:
+            self.budget.observe(int(used_weight))
+        if response.status_code in (418, 429):
+            retry_after = int(response.headers.get("Retry-After", 60))
+            logging.warning(f"Klines rate limited ({response.status_code}), waiting {retry_after}s")
+            self.clock.sleep(retry_after)
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def download_symbol(self, symbol, start_time, end_time) -> int:
+        """
+        Append closed candles of symbol opened between start_time and end_time (ms),
+        continuing after the last stored one
+
+        Returns the number of new candles
+        """
+        added = 0
+        last = self.last_open_time(symbol)
+        start = max(start_time, next_open_time(last, self.interval)) if last is not None else start_time
+
+        with ColumnarWriter(self.path(symbol), COLUMNS) as writer:
+            while start < end_time:
+                rows = self._fetch(symbol, start, end_time - 1)
+                if rows is None:
+                    continue
+                now = self.clock.time() * 1000
+                page = numpy.array([row[:6] for row in rows if row[6] < now], dtype=numpy.float64)
+                if not len(page):
+                    break
+
+                open_time, index = numpy.unique(page[:, 0].astype(numpy.int64), return_index=True)
+                new = open_time > last if last is not None else numpy.ones(len(open_time), dtype=bool)
+                page = page[index[new]]
+                if len(page):
+                    writer.append({name: page[:, i] for i, name in enumerate(FIELDS)})
+                    last = int(page[-1, 0])
+                    added += len(page)
+
+                if len(rows) < self.limit or last is None:
+                    break
+                start = next_open_time(last, self.interval)
+
+        self._update_index(symbol)
+        return added
+
+    def _update_index(self, symbol):
+        open_time = read_columns(self.path(symbol), ["open_time"], mmap=True)["open_time"]
+        index_path = os.path.join(self.directory, "index.json")
+        with self.index_lock:
+            index = load_index(self.directory)
+            index[symbol] = {
+                "rows": len(open_time),
+                "first_open_time": int(open_time[0]) if len(open_time) else None,
+                "last_open_time": int(open_time[-1]) if len(open_time) else None,
+            }
+            with open(f"{index_path}.tmp", "w") as f:
+                json.dump(index, f, indent=2, sort_keys=True)
+            os.replace(f"{index_path}.tmp", index_path)
+
+    def download(self, symbols, start_time, end_time=None) -> dict:
+        """
+        Download symbols concurrently, failed symbols are logged and
+        picked up by the next run
+
+        Returns symbol -> new candles (None if failed)
+        """
+        if end_time is None:
+            end_time = int(self.clock.time() * 1000)
+
+        result = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="download") as pool:
+            futures = {
+                pool.submit(self.download_symbol, symbol, start_time, end_time): symbol
+                for symbol in symbols
+            }
+            for count, future in enumerate(as_completed(futures), start=1):
+                symbol = futures[future]
+                try:
+                    result[symbol] = future.result()
+                except Exception as error:
+                    logging.error(f"Download failed for {symbol}: {error}")
+                    result[symbol] = None
+                logging.info(f"Downloaded {symbol} ({count}/{len(futures)}): {result[symbol]} candles")
+        return result
+
+
+def load_index(directory) -> dict:
+    path = os.path.join(directory, "index.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def usdt_symbols() -> list:
+    response = http_client.get(url=BinanceApi.exchangeinfo_url)
+    response.raise_for_status()
+    return sorted(
+        s["symbol"]
+        for s in response.json()["symbols"]
+        if s["status"] == "TRADING" and s["quoteAsset"] == "USDT"
+    )
+
+
+def load_archive(directory, interval, symbols=None, start_time=None, end_time=None) -> CandleArrays:
+    """
+    CandleArrays (backtesting/engine.py) of archived symbols between start_time
+    and end_time (ms, end excluded), aligned on the union of their open times
+    """
+    directory = os.path.join(directory, interval)
+    symbols = sorted(symbols or load_index(directory))
+
+    columns = {}
+    for symbol in symbols:
+        data = read_columns(os.path.join(directory, symbol), mmap=True)
+        first, last = numpy.searchsorted(
+            data["open_time"],
+            [start_time if start_time is not None else numpy.iinfo(numpy.int64).min,
+             end_time if end_time is not None else numpy.iinfo(numpy.int64).max],
+        )
+        columns[symbol] = {name: numpy.asarray(values[first:last]) for name, values in data.items()}
+
+    open_time = numpy.unique(
+        numpy.concatenate(
+            [columns[s]["open_time"] for s in symbols] or [numpy.array([], dtype=numpy.int64)]
+        )
+    )
+    arrays = {
+        field: numpy.full((len(symbols), len(open_time)), numpy.nan) for field in CandleArrays.fields
+    }
+    for i, symbol in enumerate(symbols):
+        index = numpy.searchsorted(open_time, columns[symbol]["open_time"])
+        for field in CandleArrays.fields:
+            arrays[field][i, index] = columns[symbol][field]
+
+    return CandleArrays(symbols, open_time, **arrays)
+
+
+def _timestamp(date) -> int:
+    parsed = datetime.fromisoformat(date)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Bulk klines downloader into a columnar archive")
+    parser.add_argument("directory", help="Archive directory")
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--start", required=True, help="ISO date (UTC), e.g. 2024-01-01")
+    parser.add_argument("--end", help="ISO date (UTC), defaults to now")
+    parser.add_argument("--symbols", nargs="*", help="Defaults to all USDT symbols trading")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--weight-budget", type=int, default=3000, help="Request weight per minute")
+    parser.add_argument("--export", help="Save archived candles as CandleArrays .npz instead of downloading")
+    args = parser.parse_args()
+
+    start_time = _timestamp(args.start)
+    end_time = _timestamp(args.end) if args.end else None
+
+    if args.export:
+        candles = load_archive(args.directory, args.interval, args.symbols, start_time, end_time)
+        candles.save_npz(args.export)
+        logging.info(f"Exported {len(candles.symbols)} symbols x {len(candles.open_time)} candles")
+    else:
+        downloader = KlineDownloader(
+            args.directory,
+            args.interval,
+            budget=WeightBudget(args.weight_budget),
+            workers=args.workers,
+        )
+        result = downloader.download(args.symbols or usdt_symbols(), start_time, end_time)
+        failed = [symbol for symbol, added in result.items() if added is None]
+        logging.info(
+            f"Downloaded {sum(added or 0 for added in result.values())} candles, failed: {failed}"
+        )
@@ -0,0 +1,571 @@
+import json
+import logging
+import sys
+
+from time import perf_counter
+
+import numpy
+import indicators
+
+"""
+Vectorized backtesting of the research algorithms
+
+Indicators and entry conditions are computed at once over (symbols x time) arrays,
+trades are then simulated with a single loop over time (vectorized over symbols and algorithms)
+using the same take profit, stop loss, trailling and safety orders settings as Autotrade.
+
+Usage:
+python -m backtesting.engine candles.npz
+"""
+
+ALGORITHMS = (
+    "ma_candlestick_jump",
+    "ma_candlestick_drop",
+    "coinrule_fast_and_slow_macd",
+    "coinrule_buy_low_sell_high",
+    "price_rise_15",
+    "top_gainers_drop",
+)
+
+# Thresholds hard-coded in algorithms/
+DEFAULT_PARAMS = {
+    "sd_threshold": 0.09,  # ma_candlestick_jump, ma_candlestick_drop
+    "drop_candle_size": 0.02,  # ma_candlestick_drop
+    "rsi_threshold": 35,  # buy_low_sell_high
+    "price_rise_min": 0.07,  # price_rise_15
+    "price_rise_max": 0.11,  # price_rise_15
+    "volatility_threshold": 0.8,  # coinrule algorithms (bollinguer spreads)
+    "btc_correlation_max": 0.5,  # top_gainers_drop
+    "top_gainers": 4,  # top_gainers_drop
+}
+
+# Autotrade settings (same keys as controller settings)
+DEFAULT_SETTINGS = {
+    "take_profit": 2.3,
+    "stop_loss": 3,
+    "trailling": "true",
+    "trailling_deviation": 0.63,
+    "commission": 0.1,  # % per side
+    # Safety orders (long only), see Autotrade.handle_price_drops
+    "total_num_so": 0,
+    "per_deviation": 1.2,
+    "exp_increase": 1.2,
+    "initial_so": 10,
+    "base_order_size": 15,
+}
+
+EXIT_REASONS = ("open", "stop_loss", "take_profit", "trailling", "end")
+
+class CandleArrays:
+    """
+    OHLCV of many symbols aligned on the same time axis
+
+    - open_time: (time,) int64 milliseconds
+    - open, high, low, close, volume: (symbols, time) float64, NaN where there is no candle
+    """
+
+    fields = ("open", "high", "low", "close", "volume")
+
+    def __init__(self, symbols, open_time, open, high, low, close, volume) -> None:
+        self.symbols = list(symbols)
+        self.open_time = numpy.asarray(open_time, dtype=numpy.int64)
+        self.open = numpy.asarray(open, dtype=numpy.float64)
+        self.high = numpy.asarray(high, dtype=numpy.float64)
+        self.low = numpy.asarray(low, dtype=numpy.float64)
+        self.close = numpy.asarray(close, dtype=numpy.float64)
+        self.volume = numpy.asarray(volume, dtype=numpy.float64)
+
+    @property
+    def interval(self) -> int:
+        """
+        Candle interval in milliseconds
+        """
+        return int(numpy.min(numpy.diff(self.open_time)))
+
+    @classmethod
+    def from_klines(cls, klines: dict):
+        """
+        Args:
+        - klines: symbol -> raw Binance klines ([open_time, open, high, low, close, volume, ...])
+        """
+        symbols = sorted(klines)
+        open_time = numpy.unique(
+            numpy.concatenate(
+                [numpy.array([k[0] for k in klines[s]], dtype=numpy.int64) for s in symbols]
+            )
+        )
+        arrays = {
+            field: numpy.full((len(symbols), len(open_time)), numpy.nan)
+            for field in cls.fields
+        }
+        for i, symbol in enumerate(symbols):
+            rows = numpy.array([k[:6] for k in klines[symbol]], dtype=numpy.float64)
+            index = numpy.searchsorted(open_time, rows[:, 0].astype(numpy.int64))
+            for column, field in enumerate(cls.fields, start=1):
+                arrays[field][i, index] = rows[:, column]
+
+        return cls(symbols, open_time, **arrays)
+
+    @classmethod
+    def load_npz(cls, path):
+        data = numpy.load(path, allow_pickle=False)
+        return cls(
+            [str(s) for s in data["symbols"]],
+            data["open_time"],
+            *(data[field] for field in cls.fields),
+        )
+
+    def save_npz(self, path):
+        numpy.savez(
+            path,
+            symbols=numpy.array(self.symbols),
+            open_time=self.open_time,
+            **{field: getattr(self, field) for field in self.fields},
+        )
+
+
+def _fill_missing(values):
+    """
+    Forward fill NaN along time, then back fill leading NaN (before listing)
+    so that filters don't propagate NaN. Masked out later with `valid`
+    """
+    mask = numpy.isnan(values)
+    index = numpy.where(~mask, numpy.arange(values.shape[1]), 0)
+    numpy.maximum.accumulate(index, axis=1, out=index)
+    first = numpy.argmax(~mask, axis=1)
+    index = numpy.maximum(index, first[:, None])
+    return numpy.nan_to_num(numpy.take_along_axis(values, index, axis=1))
+
+
+def _rolling_sum(values, window):
+    """
+    Trailing rolling sum, expanding for the first window - 1 values
+    """
+    cumsum = numpy.zeros((values.shape[0], values.shape[1] + 1))
+    numpy.cumsum(values, axis=1, out=cumsum[:, 1:])
+    start = numpy.maximum(numpy.arange(values.shape[1]) + 1 - window, 0)
+    return cumsum[:, 1:] - cumsum[:, start]
+
+
+def _rolling_count(length, window):
+    return numpy.minimum(numpy.arange(length) + 1, window).astype(numpy.float64)
+
+
+def _rolling_corr(values, reference, window):
+    """
+    Pearson correlation of each row with reference row
+    """
+    x = values - values[:, :1]
+    y = numpy.broadcast_to(reference - reference[:1], x.shape)
+    count = _rolling_count(values.shape[1], window)
+    mean_x = _rolling_sum(x, window) / count
+    mean_y = _rolling_sum(y, window) / count
+    cov = _rolling_sum(x * y, window) / count - mean_x * mean_y
+    var_x = _rolling_sum(x**2, window) / count - mean_x**2
+    var_y = _rolling_sum(y**2, window) / count - mean_y**2
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / numpy.sqrt(var_x * var_y)
+    return numpy.nan_to_num(corr)
+
+
+def _shift(values, periods):
+    result = numpy.empty_like(values)
+    result[..., :periods] = values[..., :1]
+    result[..., periods:] = values[..., :-periods]
+    return result
+
+
+class BacktestResult:
+    """
+    Trades from a backtest run, one array per column
+    """
+
+    def __init__(self, trades: dict, symbols, algorithms, elapsed) -> None:
+        self.trades = trades
+        self.symbols = symbols
+        self.algorithms = algorithms
+        self.elapsed = elapsed
+
+    def summary(self) -> dict:
+        summary = {}
+        for index, algorithm in enumerate(self.algorithms):
+            selected = self.trades["algorithm"] == index
+            pnl = self.trades["pnl"][selected]
+            order = numpy.argsort(self.trades["exit_time"][selected], kind="stable")
+            equity = numpy.cumsum(pnl[order])
+            drawdown = numpy.maximum.accumulate(numpy.concatenate([[0], equity]))[1:] - equity
+            summary[algorithm] = {
+                "trades": int(pnl.size),
+                "win_rate": round(float(numpy.mean(pnl > 0)), 4) if pnl.size else 0,
+                "avg_pnl": round(float(numpy.mean(pnl)), 4) if pnl.size else 0,
+                "total_pnl": round(float(numpy.sum(pnl)), 4),
+                "max_drawdown": round(float(numpy.max(drawdown)), 4) if pnl.size else 0,
+            }
+        return summary
+
+
+class Backtest:
+    """
+    Args:
+    - candles: CandleArrays for the whole universe (include BTCUSDT for correlations)
+    - settings: autotrade settings (DEFAULT_SETTINGS keys), e.g. controller settings
+    - params: algorithm thresholds (DEFAULT_PARAMS keys)
+    - window: number of candles used for stats, same as the candlestick endpoint (500)
+    """
+
+    def __init__(
+        self,
+        candles: CandleArrays,
+        settings: dict | None = None,
+        params: dict | None = None,
+        algorithms=ALGORITHMS,
+        window=500,
+    ) -> None:
+        self.candles = candles
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self.algorithms = tuple(algorithms)
+        self.window = window
+        self._indicators = None
+
+    def indicators(self) -> dict:
+        """
+        Indicators used by algorithms, computed once and reused across runs
+        They don't depend on params, so the same Backtest can be run with different params
+        """
+        if self._indicators:
+            return self._indicators
+
+        candles = self.candles
+        valid = ~numpy.isnan(candles.close)
+        close = _fill_missing(candles.close)
+        open_price = _fill_missing(candles.open)
+        length = close.shape[1]
+
+        bar = candles.interval
+        bars_day = max(1, 86400000 // bar)
+        bars_hour = max(1, 3600000 // bar)
+
+        # Same batch indicators as the live candle features (indicators.py): NaN until
+        # there are enough candles, then sd, volatility and lowest price expand up to window
+        ma_7 = indicators.sma(close, 7)
+        ma_25 = indicators.sma(close, 25)
+        ma_100 = indicators.sma(close, 100)
+        macd, macd_signal, _ = indicators.macd(close)
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            volatility = indicators.log_volatility(close, self.window, expanding=True) * 100
+
+        if "BTCUSDT" in candles.symbols:
+            btc = close[candles.symbols.index("BTCUSDT")]
+            btc_correlation = _rolling_corr(close, btc, self.window)
+        else:
+            logging.warning("BTCUSDT not in candles, btc_correlation set to 0")
+            btc_correlation = numpy.zeros_like(close)
+
+        # Market domination (gainers vs losers in 24hr) sampled every hour
+        change = close / _shift(close, bars_day) - 1
+        gainers = numpy.sum((change > 0) & valid, axis=0)
+        losers = numpy.sum((change < 0) & valid, axis=0)
+        domination = gainers > losers
+        previous = _shift(domination, bars_hour)
+        events = numpy.where(domination & ~previous, 1, numpy.where(~domination & previous, -1, 0))
+        last_event = numpy.where(events != 0, numpy.arange(length), 0)
+        numpy.maximum.accumulate(last_event, out=last_event)
+        reversal = events[last_event]
+
+        # Listed for long enough to have MA 100
+        first = numpy.argmax(valid, axis=1)
+        warm = numpy.arange(length) >= (first[:, None] + 100)
+
+        self._indicators = {
+            "valid": valid & warm,
+            "open": open_price,
+            "close": close,
+            "prev_close": _shift(close, 1),
+            "ma_7": ma_7,
+            "ma_7_prev": _shift(ma_7, 1),
+            "ma_25": ma_25,
+            "ma_100": ma_100,
+            "macd": macd,
+            "macd_signal": macd_signal,
+            "rsi": indicators.rsi(close),
+            "sd": indicators.rolling_std(close, self.window, expanding=True),
+            "volatility": volatility,
+            "lowest_price": indicators.rolling_min(close, self.window, expanding=True),
+            "btc_correlation": btc_correlation,
+            "domination": domination,
+            "reversal": reversal,
+            # 24hr change, listed symbols only
+            "change": numpy.where(valid, change, -numpy.inf),
+            "band_1": numpy.abs((ma_100 - ma_25) / ma_100 * 100),
+            "band_2": numpy.abs((ma_25 - ma_7) / ma_25 * 100),
+        }
+        return self._indicators
+
+    def entry_masks(self) -> dict:
+        """
+        Entry conditions of each algorithm
+
+        Returns algorithm -> (mask (symbols, time), direction (time,))
+        where direction is 1 for long, -1 for short (margin_short) and 0 for no trade
+        """
+        ind = self.indicators()
+        p = self.params
+        close = ind["close"]
+        open_price = ind["open"]
+        ma_7, ma_7_prev, ma_25, ma_100 = ind["ma_7"], ind["ma_7_prev"], ind["ma_25"], ind["ma_100"]
+        # define_strategy
+        trend = ind["reversal"]
+        gainers_reversal = ind["domination"] & (trend == 1)
+
+        masks = {}
+        if "ma_candlestick_jump" in self.algorithms:
+            masks["ma_candlestick_jump"] = (
+                (close > open_price)
+                & (ind["sd"] > p["sd_threshold"])
+                & (close > ma_7)
+                & (open_price > ma_7)
+                & (close > ma_25)
+                & (open_price > ma_25)
+                & (ma_7 > ma_7_prev)
+                & (close > ma_7_prev)
+                & (open_price > ma_7_prev)
+                & (close > ma_100)
+                & (open_price > ma_100),
+                trend,
+            )
+
+        if "ma_candlestick_drop" in self.algorithms:
+            masks["ma_candlestick_drop"] = (
+                (close < open_price)
+                & (ind["sd"] > p["sd_threshold"])
+                & (close < ma_7)
+                & (open_price < ma_7)
+                & (close < ma_25)
+                & (open_price < ma_25)
+                & (ma_7 < ma_7_prev)
+                & (close < ma_7_prev)
+                & (open_price < ma_7_prev)
+                & (close < ma_100)
+                & (open_price < ma_100)
+                & (numpy.abs(close - open_price) / close > p["drop_candle_size"]),
+                trend,
+            )
+
+        if "coinrule_fast_and_slow_macd" in self.algorithms:
+            masks["coinrule_fast_and_slow_macd"] = (
+                (ind["macd"] > ind["macd_signal"]) & (ma_7 > ma_25),
+                # trend None runs with the default (long) strategy
+                numpy.where(trend == -1, -1, 1),
+            )
+
+        if "coinrule_buy_low_sell_high" in self.algorithms:
+            masks["coinrule_buy_low_sell_high"] = (
+                (ind["rsi"] < p["rsi_threshold"]) & (close > ma_25) & gainers_reversal,
+                trend,
+            )
+
+        if "price_rise_15" in self.algorithms:
+            price_diff = (close - ind["prev_close"]) / close
+            masks["price_rise_15"] = (
+                (price_diff >= p["price_rise_min"])
+                & (price_diff < p["price_rise_max"])
+                & gainers_reversal,
+                numpy.where(ind["domination"], 1, -1),
+            )
+
+        if "top_gainers_drop" in self.algorithms:
+            # Top gainers by 24hr change
+            top = min(int(p["top_gainers"]), close.shape[0])
+            top_gainers = numpy.zeros(close.shape, dtype=bool)
+            if top > 0:
+                best = numpy.argpartition(-ind["change"], top - 1, axis=0)[:top]
+                numpy.put_along_axis(top_gainers, best, True, axis=0)
+
+            masks["top_gainers_drop"] = (
+                (close < open_price)
+                & (ind["btc_correlation"] < p["btc_correlation_max"])
+                & top_gainers
+                & (trend != 0),
+                numpy.full(close.shape[1], -1),
+            )
+
+        return {
+            algorithm: (mask & ind["valid"], direction)
+            for algorithm, (mask, direction) in masks.items()
+        }
+
+    def _safety_orders(self):
+        """
+        Safety order deviations (fraction of price) and sizes, see Autotrade.handle_price_drops
+        """
+        s = self.settings
+        deviations = []
+        sizes = []
+        price_factor = 1.0
+        so_size = float(s["initial_so"])
+        # The last safety order slot is used for short_sell_price in Autotrade
+        for index in range(max(int(s["total_num_so"]) - 1, 0)):
+            threshold = (index + 1) * (float(s["per_deviation"]) / 100)
+            price_factor = price_factor * (1 - threshold)
+            so_size = so_size ** float(s["exp_increase"])
+            deviations.append(price_factor)
+            sizes.append(so_size)
+        return numpy.array(deviations), numpy.array(sizes)
+
+    def run(self) -> BacktestResult:
+        started = perf_counter()
+        ind = self.indicators()
+        masks = self.entry_masks()
+        algorithms = [a for a in self.algorithms if a in masks]
+        s = self.settings
+        candles = self.candles
+        n_algos, n_symbols, length = len(algorithms), len(candles.symbols), len(candles.open_time)
+
+        # Time major copies for contiguous access inside the loop
+        entries = numpy.ascontiguousarray(
+            numpy.stack([masks[a][0] for a in algorithms]).transpose(2, 0, 1)
+        )
+        directions = numpy.stack([masks[a][1] for a in algorithms]).T.astype(numpy.int8)
+        opens = numpy.ascontiguousarray(ind["open"].T)
+        highs = numpy.ascontiguousarray(_fill_missing(candles.high).T)
+        lows = numpy.ascontiguousarray(_fill_missing(candles.low).T)
+        closes = numpy.ascontiguousarray(ind["close"].T)
+        valid = numpy.ascontiguousarray((~numpy.isnan(candles.close)).T)
+        spread_on = numpy.ascontiguousarray((ind["volatility"] > self.params["volatility_threshold"]).T)
+        band_1 = numpy.ascontiguousarray(numpy.nan_to_num(ind["band_1"]).T)
+        band_2 = numpy.ascontiguousarray(numpy.nan_to_num(ind["band_2"]).T)
+
+        uses_spread = numpy.array([a.startswith("coinrule") for a in algorithms])[:, None]
+        is_top_gainers = numpy.array([a == "top_gainers_drop" for a in algorithms])[:, None]
+        default_trailling = str(s["trailling"]).lower() in ("true", "1")
+        so_factors, so_sizes = self._safety_orders()
+        base_size = float(s["base_order_size"])
+
+        shape = (n_algos, n_symbols)
+        position = numpy.zeros(shape, dtype=numpy.int8)
+        entry_price = numpy.zeros(shape)
+        first_price = numpy.zeros(shape)
+        size = numpy.zeros(shape)
+        entry_index = numpy.zeros(shape, dtype=numpy.int64)
+        tp_price = numpy.zeros(shape)
+        sl_price = numpy.zeros(shape)
+        trailling = numpy.zeros(shape, dtype=bool)
+        deviation = numpy.zeros(shape)
+        trail_active = numpy.zeros(shape, dtype=bool)
+        extreme = numpy.zeros(shape)
+        so_filled = numpy.zeros(shape + (len(so_factors),), dtype=bool)
+
+        records = []
+
+        def record(exits, price, reason, t):
+            a, sym = numpy.nonzero(exits)
+            if a.size == 0:
+                return
+            records.append(
+                (a, sym, entry_index[a, sym], numpy.full(a.size, t), position[a, sym],
+                 entry_price[a, sym], price[a, sym], numpy.full(a.size, EXIT_REASONS.index(reason)))
+            )
+
+        for t in range(length):
+            o, h, l, c = opens[t], highs[t], lows[t], closes[t]
+            long = position == 1
+            short = position == -1
+            live = (long | short) & valid[t]
+
+            # Safety orders lower the average entry price of longs
+            for k in range(len(so_factors)):
+                so_price = first_price * so_factors[k]
+                fill = live & long & ~so_filled[:, :, k] & (l <= so_price)
+                if fill.any():
+                    new_size = size + so_sizes[k]
+                    entry_price = numpy.where(fill, (entry_price * size + so_price * so_sizes[k]) / new_size, entry_price)
+                    size = numpy.where(fill, new_size, size)
+                    so_filled[:, :, k] |= fill
+
+            stop_loss = live & ((long & (l <= sl_price)) | (short & (h >= sl_price)))
+            stop_fill = numpy.where(long, numpy.minimum(o, sl_price), numpy.maximum(o, sl_price))
+
+            trail_stop = numpy.where(long, extreme * (1 - deviation / 100), extreme * (1 + deviation / 100))
+            trail_exit = live & trail_active & ~stop_loss & (
+                (long & (l <= trail_stop)) | (short & (h >= trail_stop))
+            )
+            trail_fill = numpy.where(long, numpy.minimum(o, trail_stop), numpy.maximum(o, trail_stop))
+
+            tp_reached = live & ~stop_loss & ~trail_exit & (
+                (long & (h >= tp_price)) | (short & (l <= tp_price))
+            )
+            take_profit = tp_reached & ~trailling
+            tp_fill = numpy.where(long, numpy.maximum(o, tp_price), numpy.minimum(o, tp_price))
+
+            # Trailling activates once take profit is hit, then follows highs (lows for shorts)
+            trail_active |= tp_reached & trailling
+            extreme = numpy.where(
+                trail_active & live,
+                numpy.where(long, numpy.maximum(extreme, h), numpy.minimum(extreme, l)),
+                extreme,
+            )
+
+            record(stop_loss, stop_fill, "stop_loss", t)
+            record(trail_exit, trail_fill, "trailling", t)
+            record(take_profit, tp_fill, "take_profit", t)
+            exits = stop_loss | trail_exit | take_profit
+            if exits.any():
+                position[exits] = 0
+                trail_active[exits] = False
+                so_filled[exits] = False
+
+            # New positions at candle close (exits of this candle wait for the next one)
+            direction = directions[t][:, None]
+            new = entries[t] & (position == 0) & ~exits & (direction != 0)
+            if new.any():
+                with_spread = uses_spread & spread_on[t]
+                tp = numpy.where(with_spread, band_1[t] * 100, float(s["take_profit"]))
+                sl = numpy.where(with_spread, band_1[t] + band_2[t], float(s["stop_loss"]))
+                dev = numpy.where(with_spread, band_1[t] * 100, float(s["trailling_deviation"]))
+                trail = with_spread | default_trailling
+                # Autotrade.set_margin_short_values override
+                sl = numpy.where(is_top_gainers, 5, sl)
+                dev = numpy.where(is_top_gainers, 3.2, dev)
+
+                side = numpy.broadcast_to(direction, shape)
+                position[new] = side[new]
+                entry_price[new] = numpy.broadcast_to(c, shape)[new]
+                first_price[new] = entry_price[new]
+                size[new] = base_size
+                entry_index[new] = t
+                tp_price[new] = (entry_price * (1 + side * tp / 100))[new]
+                sl_price[new] = (entry_price * (1 - side * sl / 100))[new]
+                trailling[new] = numpy.broadcast_to(trail, shape)[new]
+                deviation[new] = numpy.broadcast_to(dev, shape)[new]
+                extreme[new] = entry_price[new]
+
+        # Positions still open are marked to market
+        record(position != 0, numpy.broadcast_to(closes[-1], shape), "end", length - 1)
+
+        columns = ("algorithm", "symbol", "entry_index", "exit_index", "direction", "entry_price", "exit_price", "reason")
+        if records:
+            trades = {name: numpy.concatenate([r[i] for r in records]) for i, name in enumerate(columns)}
+        else:
+            trades = {name: numpy.array([]) for name in columns}
+
+        commission = float(s["commission"]) * 2
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            trades["pnl"] = (
+                (trades["exit_price"] - trades["entry_price"]) / trades["entry_price"] * 100 * trades["direction"]
+                - commission
+            )
+        trades["entry_time"] = candles.open_time[trades["entry_index"].astype(numpy.int64)]
+        trades["exit_time"] = candles.open_time[trades["exit_index"].astype(numpy.int64)]
+
+        return BacktestResult(trades, candles.symbols, algorithms, perf_counter() - started)
+
+
+if __name__ == "__main__":
+    candles = CandleArrays.load_npz(sys.argv[1])
+    started = perf_counter()
+    result = Backtest(candles).run()
+    print(json.dumps(result.summary(), indent=2))
+    print(
+        f"{len(candles.symbols)} symbols x {len(candles.open_time)} candles in {perf_counter() - started:.2f}s"
+    )
@@ -0,0 +1,241 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from time import perf_counter
+
+import numpy
+from backtesting.columnar import ColumnarWriter, read_columns
+from backtesting.engine import (
+    ALGORITHMS,
+    DEFAULT_PARAMS,
+    DEFAULT_SETTINGS,
+    Backtest,
+    CandleArrays,
+)
+
+"""
+Parallel parameter sweep of algorithm thresholds (and autotrade settings)
+
+Candles are placed in shared memory once and every worker process
+maps them read-only, so tasks only carry the parameter values.
+Results are appended to a columnar file as tasks finish,
+an interrupted sweep resumes from the tasks that are not in the file yet.
+
+Usage:
+python -m backtesting.sweep candles.npz results/ --space space.json --workers 8
+python -m backtesting.sweep candles.npz results/ --space space.json --random 500 --seed 1
+
+space.json:
+- grid: {"sd_threshold": [0.05, 0.09, 0.12], "rsi_threshold": [25, 30, 35]}
+- random: lists are sampled as choices, {"low": 0.5, "high": 1.5} uniformly
+"""
+
+METRICS = ("trades", "win_rate", "avg_pnl", "total_pnl", "max_drawdown")
+
+
+def grid(space: dict) -> list:
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+
+
+def random_search(space: dict, n: int, seed=None) -> list:
+    rng = random.Random(seed)
+    tasks = []
+    for _ in range(n):
+        task = {}
+        for key, values in space.items():
+            if isinstance(values, dict):
+                task[key] = rng.uniform(values["low"], values["high"])
+            else:
+                task[key] = rng.choice(values)
+        tasks.append(task)
+    return tasks
+
+
+def param_dtype(values):
+    """
+    Column dtype of a parameter from its values in all tasks: bool, int64, float64,
+    or fixed width strings for anything else (e.g. trailling "true"/"false")
+    """
+    flags = [isinstance(v, (bool, numpy.bool_)) for v in values]
+    if all(flags):
+        return numpy.bool_
+    if not any(flags) and all(isinstance(v, (int, float, numpy.number)) for v in values):
+        if all(isinstance(v, (int, numpy.integer)) for v in values):
+            return numpy.int64
+        return numpy.float64
+    return f"U{max(len(str(v)) for v in values)}"
+
+
+class SharedCandles:
+    """
+    Copy of CandleArrays in shared memory blocks
+    """
+
+    def __init__(self, candles: CandleArrays) -> None:
+        self.symbols = candles.symbols
+        self.blocks = []
+        self.spec = {}
+        for field in ("open_time",) + CandleArrays.fields:
+            array = getattr(candles, field)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared = numpy.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared[...] = array
+            self.blocks.append(block)
+            self.spec[field] = (block.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(spec: dict, symbols):
+        """
+        Map shared blocks as read-only arrays (no copy)
+        Returns candles and the blocks, which must be kept alive while candles are used
+        """
+        blocks = []
+        arrays = {}
+        for field, (name, shape, dtype) in spec.items():
+            try:
+                # Python >= 3.13, don't let the worker unlink blocks owned by the parent
+                block = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                block = shared_memory.SharedMemory(name=name)
+            array = numpy.ndarray(shape, dtype=numpy.dtype(dtype), buffer=block.buf)
+            array.flags.writeable = False
+            arrays[field] = array
+            blocks.append(block)
+        return CandleArrays(symbols, **arrays), blocks
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+
+# Worker process state, see _init_worker
+_worker = {}
+
+
+def _init_worker(spec, symbols, algorithms, window, settings):
+    candles, blocks = SharedCandles.attach(spec, symbols)
+    _worker["blocks"] = blocks
+    _worker["settings"] = settings
+    # Indicators are computed on the first task and reused for the rest
+    _worker["backtest"] = Backtest(candles, algorithms=algorithms, window=window)
+
+
+def _run_task(task_id, values: dict) -> dict:
+    started = perf_counter()
+    backtest = _worker["backtest"]
+    backtest.settings = {
+        **DEFAULT_SETTINGS,
+        **_worker["settings"],
+        **{k: v for k, v in values.items() if k in DEFAULT_SETTINGS},
+    }
+    backtest.params = {
+        **DEFAULT_PARAMS,
+        **{k: v for k, v in values.items() if k in DEFAULT_PARAMS},
+    }
+    summary = backtest.run().summary()
+
+    row = {"task": task_id, **values}
+    for algorithm, metrics in summary.items():
+        for metric in METRICS:
+            row[f"{algorithm}.{metric}"] = metrics[metric]
+    row["elapsed"] = perf_counter() - started
+    return row
+
+
+def sweep(
+    candles: CandleArrays,
+    directory,
+    tasks: list,
+    workers=None,
+    algorithms=ALGORITHMS,
+    window=500,
+    settings: dict | None = None,
+):
+    """
+    Run every task (dict of param -> value) and append results to `directory`
+    Tasks already in the results file are skipped (resume)
+    """
+    if not tasks:
+        return directory
+
+    unknown = set(tasks[0]) - set(DEFAULT_PARAMS) - set(DEFAULT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown parameters: {unknown}")
+
+    columns = {"task": numpy.int64}
+    columns.update({key: param_dtype([task[key] for task in tasks]) for key in tasks[0]})
+    columns.update(
+        {f"{a}.{m}": numpy.float64 for a in algorithms for m in METRICS}
+    )
+    columns["elapsed"] = numpy.float64
+
+    writer = ColumnarWriter(directory, columns)
+    # Resume only makes sense with the same task list (same grid or random seed)
+    tasks_path = os.path.join(directory, "tasks.json")
+    if os.path.exists(tasks_path):
+        with open(tasks_path) as f:
+            if json.load(f) != tasks:
+                writer.close()
+                raise ValueError(f"Tasks don't match the existing sweep in {directory}")
+    else:
+        with open(tasks_path, "w") as f:
+            json.dump(tasks, f)
+
+    done = set(read_columns(directory, ["task"])["task"].tolist())
+    pending = [(i, task) for i, task in enumerate(tasks) if i not in done]
+    logging.info(f"Sweep: {len(done)} tasks done, {len(pending)} pending")
+
+    shared = SharedCandles(candles)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(shared.spec, candles.symbols, tuple(algorithms), window, settings or {}),
+        ) as pool:
+            futures = [pool.submit(_run_task, i, task) for i, task in pending]
+            for count, future in enumerate(as_completed(futures), start=1):
+                writer.append(future.result())
+                if count % 100 == 0:
+                    logging.info(f"Sweep: {count}/{len(pending)} tasks finished")
+    finally:
+        writer.close()
+        shared.close()
+
+    return directory
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Backtest parameter sweep")
+    parser.add_argument("candles", help="CandleArrays .npz file")
+    parser.add_argument("results", help="Results directory (columnar)")
+    parser.add_argument("--space", required=True, help="JSON file with parameter space")
+    parser.add_argument("--random", type=int, default=0, help="Number of random samples, grid if not set")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--settings", help="JSON file with autotrade settings")
+    args = parser.parse_args()
+
+    with open(args.space) as f:
+        space = json.load(f)
+    settings = None
+    if args.settings:
+        with open(args.settings) as f:
+            settings = json.load(f)
+
+    tasks = random_search(space, args.random, args.seed) if args.random else grid(space)
+    sweep(
+        CandleArrays.load_npz(args.candles),
+        args.results,
+        tasks,
+        workers=args.workers,
+        settings=settings,
+    )
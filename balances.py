@@ -0,0 +1,101 @@
+import logging
+import threading
+
+import http_client
+from apis import BinbotApi
+from clock import get_clock
+from utils import handle_binance_errors
+
+
+class BalanceSnapshot(BinbotApi):
+    """
+    Short lived balance cache shared by signals and autotrade
+
+    Instead of hitting the balance endpoints on every signal,
+    balances are fetched once and reused until they are older than `ttl` seconds
+    or until a trade has gone through (invalidate).
+
+    Funds for bots that are being opened are reserved locally,
+    so two signals arriving at the same time can't spend the same balance.
+    """
+
+    def __init__(self, ttl: float = 30, asset: str = "USDT", clock=None) -> None:
+        self.ttl = ttl
+        self.clock = clock or get_clock()
+        self.asset = asset
+        self.lock = threading.RLock()
+        # name -> (fetched timestamp, response)
+        self.cache = {}
+        # reservation key (usually the pair) -> amount in self.asset
+        self.reserved = {}
+
+    def _is_fresh(self, name) -> bool:
+        return name in self.cache and (self.clock.time() - self.cache[name][0]) < self.ttl
+
+    def _fetch(self, name, url):
+        with self.lock:
+            if not self._is_fresh(name):
+                res = http_client.get(url=url)
+                data = handle_binance_errors(res)
+                self.cache[name] = (self.clock.time(), data)
+            return self.cache[name][1]
+
+    def balances(self):
+        """
+        Raw balances (same response as bb_balance_url)
+        """
+        return self._fetch("raw", self.bb_balance_url)
+
+    def estimate_free(self) -> float:
+        """
+        Free balance of self.asset as returned by bb_balance_estimate_url
+        """
+        response = self._fetch("estimate", self.bb_balance_estimate_url)
+        for balance in response["data"]["balances"]:
+            if balance["asset"] == self.asset:
+                return float(balance["free"])
+        return 0
+
+    def available(self, exclude=None) -> float:
+        """
+        Free balance minus funds already reserved for bots being opened
+
+        Args:
+        - exclude: reservation key to leave out, e.g. when the bot that made the reservation
+        wants to know what else is left
+        """
+        with self.lock:
+            reserved = sum(
+                amount for key, amount in self.reserved.items() if key != exclude
+            )
+            return self.estimate_free() - reserved
+
+    def reserve(self, key, amount: float) -> bool:
+        """
+        Set aside `amount` for a bot that is about to be opened
+
+        Returns False if there isn't enough balance left,
+        in which case nothing is reserved
+        """
+        with self.lock:
+            if self.available(exclude=key) < amount:
+                return False
+            self.reserved[key] = float(amount)
+            return True
+
+    def release(self, key, traded=False):
+        """
+        Release a reservation once the bot is opened (or failed to open)
+
+        If a trade went through, balances are no longer accurate
+        so the cache is invalidated
+        """
+        with self.lock:
+            self.reserved.pop(key, None)
+            if traded:
+                self.invalidate()
+
+    def invalidate(self):
+        with self.lock:
+            logging.debug("Balance snapshot invalidated")
+            self.cache.clear()
@@ -0,0 +1,107 @@
+import argparse
+import json
+import logging
+import sys
+import tracemalloc
+
+from time import perf_counter
+
+import numpy
+from candles import CandleStore
+
+"""
+Candle store memory per symbol, plain arrays vs compressed history
+
+The same random walk 1m candles (prices rounded to a tick, as Binance) are stored for every symbol:
+- plain: CandleStore(size=window), the whole window as float arrays
+- tiered: CandleStore(size=hot, history=window - hot), older candles in ColdBlocks
+
+Reports traced memory per symbol, append time per candle and time to read
+the whole window back (CandleStore.deep), which must equal the plain candles.
+
+Usage:
+python -m benchmarks.candle_memory --symbols 200 --window 8000 --hot 1000 --output candle_memory.json
+"""
+
+
+def random_rows(candles, seed, decimals=4) -> list:
+    rng = numpy.random.default_rng(seed)
+    close = numpy.round(100 * numpy.exp(numpy.cumsum(rng.normal(0, 0.001, candles))), decimals)
+    open = numpy.concatenate([close[:1], close[:-1]])
+    high = numpy.round(numpy.maximum(open, close) * (1 + numpy.abs(rng.normal(0, 0.001, candles))), decimals)
+    low = numpy.round(numpy.minimum(open, close) * (1 - numpy.abs(rng.normal(0, 0.001, candles))), decimals)
+    volume = numpy.round(rng.uniform(0, 1000, candles), 2)
+    open_time = 1_700_000_040_000 + numpy.arange(candles) * 60_000
+    return list(zip(open_time.tolist(), open, high, low, close, volume))
+
+
+def measure(store: CandleStore, symbols, candles) -> dict:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    elapsed = 0.0
+    for i in range(symbols):
+        rows = random_rows(candles, i)
+        started = perf_counter()
+        store.extend(f"SYM{i}USDT", "1m", rows)
+        elapsed += perf_counter() - started
+    traced = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    started = perf_counter()
+    for i in range(symbols):
+        store.deep(f"SYM{i}USDT")
+    deep_time = perf_counter() - started
+
+    return {
+        "kb_per_symbol": round(traced / 1024 / symbols, 1),
+        "append_us_per_candle": round(elapsed / (symbols * candles) * 1e6, 3),
+        "deep_ms_per_symbol": round(deep_time / symbols * 1000, 3),
+        "report": store.memory_report(),
+    }
+
+
+def run(symbols=200, window=8000, hot=1000) -> dict:
+    plain = CandleStore(size=window)
+    tiered = CandleStore(size=hot, history=window - hot)
+    result = {
+        "plain": measure(plain, symbols, window),
+        "tiered": measure(tiered, symbols, window),
+    }
+
+    # Deep history of the tiered store holds at least the plain window
+    result["equal"] = all(
+        numpy.array_equal(
+            tiered.deep(f"SYM{i}USDT", window).data[:, :window],
+            plain.get(f"SYM{i}USDT").data[:, plain.get(f"SYM{i}USDT").start : plain.get(f"SYM{i}USDT").end],
+        )
+        for i in range(symbols)
+    )
+    return result
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Candle store memory per symbol benchmark")
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--window", type=int, default=8000, help="Candles per symbol")
+    parser.add_argument("--hot", type=int, default=1000, help="Plain candles per symbol in the tiered store")
+    parser.add_argument("--output", help="Write results JSON here, otherwise stdout")
+    args = parser.parse_args()
+
+    report = {
+        "symbols": args.symbols,
+        "window": args.window,
+        "hot": args.hot,
+        **run(args.symbols, args.window, args.hot),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if not report["equal"]:
+        logging.error("Deep history doesn't match plain candles")
+        sys.exit(1)
@@ -0,0 +1,682 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import threading
+
+from collections import deque
+from time import time
+
+import aiohttp
+import numpy
+import indicators
+from aiohttp import web
+from streaming.recorder import frame_files, read_frames
+
+"""
+Local stand-in for Binance REST, Binance kline websocket and Binbot API
+
+Serves every URL used by BinanceApi and BinbotApi with synthetic (random walk) candles,
+so ResearchSignals can be load tested without hitting real services.
+
+- Binance REST: /api/v3/...
+- Binance websocket: /ws and /stream (SUBSCRIBE/UNSUBSCRIBE <symbol>@kline_<interval>)
+- Binbot: /binbot/...
+- Telegram Bot API: /telegram/bot<token>/sendMessage
+
+Point the research code to it before importing apis:
+BINANCE_API_URL=http://127.0.0.1:8090
+BINANCE_WS_URL=ws://127.0.0.1:8090
+FLASK_DOMAIN=http://127.0.0.1:8090/binbot
+TELEGRAM_API_URL=http://127.0.0.1:8090/telegram/bot
+
+Usage:
+python -m benchmarks.fake_exchange --symbols 200 --rate 500 --latency 0.01 --error-rate 0.01
+"""
+
+interval_ms = {
+    "1m": 60000,
+    "3m": 180000,
+    "5m": 300000,
+    "15m": 900000,
+    "30m": 1800000,
+    "1h": 3600000,
+    "2h": 7200000,
+    "4h": 14400000,
+    "6h": 21600000,
+    "8h": 28800000,
+    "12h": 43200000,
+    "1d": 86400000,
+}
+
+request_weights = {
+    "/api/v3/exchangeInfo": 20,
+    "/api/v3/ticker/24hr": 2,
+    "/api/v3/ticker/price": 2,
+    "/api/v3/klines": 2,
+}
+
+
+def _values(series) -> list:
+    """
+    Indicator values without the NaN warm up, as Binbot series
+    """
+    return series[~numpy.isnan(series)].tolist()
+
+
+class SymbolState:
+    """
+    Random walk candles of one symbol: closed history + current open candle
+    """
+
+    def __init__(self, symbol, price, interval, now_ms, history, rng: random.Random) -> None:
+        self.symbol = symbol
+        self.interval = interval
+        self.rng = rng
+        self.candles = deque(maxlen=max(history, 1000))
+        step = interval_ms[interval]
+        open_time = (now_ms // step) * step - history * step
+        for _ in range(history):
+            self.candles.append(self._random_candle(open_time, price))
+            price = self.candles[-1][4]
+            open_time += step
+        self.current = [open_time, price, price, price, price, 0.0]
+
+    def _random_candle(self, open_time, price):
+        close = price * (1 + self.rng.gauss(0, 0.01))
+        high = max(price, close) * (1 + abs(self.rng.gauss(0, 0.003)))
+        low = min(price, close) * (1 - abs(self.rng.gauss(0, 0.003)))
+        return [open_time, price, high, low, close, self.rng.uniform(10, 1000)]
+
+    def tick(self, now_ms) -> bool:
+        """
+        Move price, returns True if the current candle closed
+        """
+        step = interval_ms[self.interval]
+        candle = self.current
+        price = candle[4] * (1 + self.rng.gauss(0, 0.002))
+        candle[2] = max(candle[2], price)
+        candle[3] = min(candle[3], price)
+        candle[4] = price
+        candle[5] += self.rng.uniform(0, 10)
+        if now_ms >= candle[0] + step:
+            self.candles.append(list(candle))
+            open_time = (now_ms // step) * step
+            self.current = [open_time, price, price, price, price, 0.0]
+            return True
+        return False
+
+    def klines(self, start_time=None, end_time=None, limit=500):
+        rows = list(self.candles) + [self.current]
+        if start_time is not None:
+            rows = [r for r in rows if r[0] >= start_time]
+        if end_time is not None:
+            rows = [r for r in rows if r[0] <= end_time]
+        rows = rows[:limit] if start_time is not None else rows[-limit:]
+        step = interval_ms[self.interval]
+        return [
+            [r[0], f"{r[1]:.8f}", f"{r[2]:.8f}", f"{r[3]:.8f}", f"{r[4]:.8f}", f"{r[5]:.8f}",
+             r[0] + step - 1, "0", 100, "0", "0", "0"]
+            for r in rows
+        ]
+
+
+class FakeExchange:
+    def __init__(
+        self,
+        symbols=50,
+        interval="1m",
+        rate=100,
+        latency=0.0,
+        error_rate=0.0,
+        ws_drop_rate=0.0,
+        time_scale=1.0,
+        history=500,
+        recording=None,
+        autotrade=False,
+        seed=1,
+    ) -> None:
+        """
+        Args:
+        - symbols: number of USDT symbols (BTCUSDT included)
+        - interval: candle interval of synthetic data
+        - rate: websocket kline messages per second (all subscribed streams)
+        - latency: seconds added to every REST response
+        - error_rate: probability of HTTP 500/429 on REST requests
+        - ws_drop_rate: probability per second of closing websocket connections
+        - time_scale: simulated seconds per wall second (candles close faster)
+        - recording: streaming/recorder.py files to emit instead of synthetic klines
+        - autotrade: enable test autotrade (paper trading), without a limit of active bots
+        """
+        self.interval = interval
+        self.rate = rate
+        self.latency = latency
+        self.error_rate = error_rate
+        self.ws_drop_rate = ws_drop_rate
+        self.time_scale = time_scale
+        self.recording = recording
+        self.rng = random.Random(seed)
+        self.started_at = time()
+        now = self.now_ms()
+
+        names = ["BTCUSDT"] + [f"FAKE{i}USDT" for i in range(symbols - 1)]
+        self.symbols = {
+            name: SymbolState(name, 30000 if name == "BTCUSDT" else self.rng.uniform(0.01, 200), interval, now, history, self.rng)
+            for name in names
+        }
+        self.settings = {
+            "candlestick_interval": interval,
+            "max_request": 950,
+            "autotrade": 0,
+            "strategy": "long",
+            "balance_to_use": "USDT",
+            "base_order_size": "15",
+            "balance_size_to_use": "0",
+            "max_active_autotrade_bots": 1,
+            "take_profit": 2.3,
+            "trailling": "true",
+            "trailling_deviation": 0.63,
+            "stop_loss": 3,
+            "update_required": None,
+            "system_logs": [],
+        }
+        self.test_autotrade_settings = {**self.settings}
+        if autotrade:
+            self.test_autotrade_settings["autotrade"] = 1
+            self.test_autotrade_settings["max_active_autotrade_bots"] = 1000000
+        self.blacklist = []
+        self.subscribed = {}
+        self.bots = {}
+        self.paper_trading = {}
+        self.next_id = 1
+        self.requests = 0
+        self.errors = 0
+        self.messages = 0
+        self.telegram_messages = 0
+        self.used_weight = 0
+        self.weight_minute = None
+        self.connections = set()
+        self.loop = None
+        self.runner = None
+        self.thread = None
+
+    def now_ms(self) -> int:
+        return int((self.started_at + (time() - self.started_at) * self.time_scale) * 1000)
+
+    # --- helpers ---
+
+    def _json(self, data, status=200):
+        return web.json_response(data, status=status)
+
+    def _binbot(self, data=None, message="", error=0):
+        return self._json({"data": data, "message": message, "error": error})
+
+    def _state(self, request):
+        symbol = request.query.get("symbol") or request.match_info.get("symbol")
+        if symbol not in self.symbols:
+            raise web.HTTPBadRequest(
+                text=json.dumps({"code": -1121, "msg": "Invalid symbol."}),
+                content_type="application/json",
+            )
+        return self.symbols[symbol]
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if request.path not in ("/ws", "/stream") and self.rng.random() < self.error_rate:
+            self.errors += 1
+            status = self.rng.choice([429, 500])
+            return self._json({"code": -1, "msg": "Injected error"}, status=status)
+        response = await handler(request)
+        if request.path.startswith("/api/"):
+            response.headers["x-mbx-used-weight-1m"] = str(self._use_weight(request))
+        return response
+
+    def _use_weight(self, request) -> int:
+        """
+        Binance request weight used in the current minute
+        """
+        minute = int(time() // 60)
+        if minute != self.weight_minute:
+            self.weight_minute = minute
+            self.used_weight = 0
+        weight = request_weights.get(request.path, 1)
+        if request.path in ("/api/v3/ticker/24hr", "/api/v3/ticker/price") and "symbol" not in request.query:
+            weight *= 20
+        self.used_weight += weight
+        return self.used_weight
+
+    # --- Binance REST ---
+
+    async def server_time(self, request):
+        return self._json({"serverTime": self.now_ms()})
+
+    async def exchange_info(self, request):
+        names = [request.query["symbol"]] if "symbol" in request.query else list(self.symbols)
+        return self._json(
+            {
+                "symbols": [
+                    {
+                        "symbol": name,
+                        "status": "TRADING",
+                        "baseAsset": name[: -len("USDT")],
+                        "quoteAsset": "USDT",
+                        "filters": [
+                            {"filterType": "PRICE_FILTER", "tickSize": "0.00010000"},
+                            {"filterType": "NOTIONAL", "minNotional": "5.00000000"},
+                        ],
+                    }
+                    for name in names
+                ]
+            }
+        )
+
+    async def ticker_price(self, request):
+        if "symbol" in request.query:
+            state = self._state(request)
+            return self._json({"symbol": state.symbol, "price": f"{state.current[4]:.8f}"})
+        return self._json(
+            [{"symbol": s.symbol, "price": f"{s.current[4]:.8f}"} for s in self.symbols.values()]
+        )
+
+    def _ticker24(self, state: SymbolState):
+        day = list(state.candles)[-(86400000 // interval_ms[state.interval]):] + [state.current]
+        open_price = day[0][1]
+        last = state.current[4]
+        return {
+            "symbol": state.symbol,
+            "priceChangePercent": f"{(last - open_price) / open_price * 100:.3f}",
+            "openPrice": f"{open_price:.8f}",
+            "highPrice": f"{max(c[2] for c in day):.8f}",
+            "lowPrice": f"{min(c[3] for c in day):.8f}",
+            "lastPrice": f"{last:.8f}",
+            "volume": f"{sum(c[5] for c in day):.8f}",
+        }
+
+    async def ticker24(self, request):
+        if "symbol" in request.query:
+            return self._json(self._ticker24(self._state(request)))
+        return self._json([self._ticker24(s) for s in self.symbols.values()])
+
+    async def klines(self, request):
+        state = self._state(request)
+        query = request.query
+        return self._json(
+            state.klines(
+                start_time=int(query["startTime"]) if "startTime" in query else None,
+                end_time=int(query["endTime"]) if "endTime" in query else None,
+                limit=min(int(query.get("limit", 500)), 1000),
+            )
+        )
+
+    async def launchpool(self, request):
+        return self._json({"data": {"completed": {"list": []}}})
+
+    # --- Binbot ---
+
+    async def candlestick(self, request):
+        state = self._state(request)
+        rows = list(state.candles)[-500:] + [state.current]
+        close = numpy.array([r[4] for r in rows])
+        macd, macd_signal, _ = indicators.macd(close)
+        rsi = indicators.rsi(close)
+        btc = numpy.array([r[4] for r in list(self.symbols["BTCUSDT"].candles)[-500:]] + [self.symbols["BTCUSDT"].current[4]])
+        length = min(len(btc), len(close))
+        correlation = float(numpy.nan_to_num(numpy.corrcoef(close[-length:], btc[-length:])[0, 1]))
+        return self._json(
+            {
+                "trace": [
+                    {
+                        "x": [r[0] for r in rows],
+                        "open": [r[1] for r in rows],
+                        "high": [r[2] for r in rows],
+                        "low": [r[3] for r in rows],
+                        "close": close.tolist(),
+                        "volume": [r[5] for r in rows],
+                    },
+                    {"y": _values(indicators.sma(close, 100))},
+                    {"y": _values(indicators.sma(close, 25))},
+                    {"y": _values(indicators.sma(close, 7))},
+                ],
+                "macd": {str(i): v for i, v in enumerate(_values(macd))},
+                "macd_signal": {str(i): v for i, v in enumerate(_values(macd_signal))},
+                "rsi": {str(i): v for i, v in enumerate(_values(rsi))},
+                "btc_correlation": {"close_price": correlation},
+            }
+        )
+
+    async def bb_ticker24(self, request):
+        return self._binbot(self._ticker24(self._state(request)))
+
+    async def symbols_raw(self, request):
+        return self._binbot(list(self.symbols))
+
+    async def market_domination(self, request):
+        size = int(request.query.get("size", 7))
+        total = len(self.symbols)
+        gainers = [self.rng.randint(0, total) for _ in range(size)]
+        return self._binbot(
+            {"gainers_count": gainers, "losers_count": [total - g for g in gainers]}
+        )
+
+    async def gainers_losers(self, request):
+        tickers = sorted(
+            (self._ticker24(s) for s in self.symbols.values()),
+            key=lambda t: float(t["priceChangePercent"]),
+            reverse=True,
+        )
+        return self._binbot(tickers)
+
+    async def balance_raw(self, request):
+        return self._binbot([{"asset": "USDT", "free": 1000.0, "locked": 0.0}])
+
+    async def balance_estimate(self, request):
+        return self._binbot(
+            {"balances": [{"asset": "USDT", "free": 1000.0, "locked": 0.0}], "total_fiat": 1000.0}
+        )
+
+    async def get_settings(self, request):
+        settings = self.test_autotrade_settings if "paper-trading" in request.path else self.settings
+        return self._binbot(settings)
+
+    async def put_settings(self, request):
+        settings = self.test_autotrade_settings if "paper-trading" in request.path else self.settings
+        settings.update(await request.json())
+        return self._binbot(settings, message="Successfully updated settings")
+
+    async def get_blacklist(self, request):
+        return self._binbot(self.blacklist)
+
+    async def post_blacklist(self, request):
+        data = await request.json()
+        pair = data.get("pair") or data.get("symbol")
+        self.blacklist.append({"_id": pair, "pair": pair, "reason": data.get("reason")})
+        return self._binbot(message="Added to blacklist")
+
+    async def post_subscribed(self, request):
+        for item in await request.json():
+            self.subscribed[item["pair"]] = item
+        return self._binbot(message="Updated subscribed list")
+
+    def _bots(self, request):
+        return self.paper_trading if request.path.startswith("/binbot/paper-trading") else self.bots
+
+    async def list_bots(self, request):
+        status = request.query.get("status")
+        bots = [b for b in self._bots(request).values() if not status or b["status"] == status]
+        return self._binbot(bots)
+
+    async def create_bot(self, request):
+        bot = await request.json()
+        bot_id = str(self.next_id)
+        self.next_id += 1
+        bot["_id"] = bot_id
+        self._bots(request)[bot_id] = bot
+        return self._json({"botId": bot_id, "message": "Successfully created bot", "error": 0})
+
+    async def delete_bot(self, request):
+        self._bots(request).pop(request.query.get("id"), None)
+        return self._binbot(message="Deleted bot")
+
+    async def activate_bot(self, request):
+        bot = self._bots(request).get(request.match_info["id"])
+        if not bot:
+            return self._binbot(message="Bot not found", error=1)
+        bot["status"] = "active"
+        return self._binbot(bot, message="Successfully activated bot")
+
+    async def bot_errors(self, request):
+        return self._binbot(message="Errors posted")
+
+    async def liquidation(self, request):
+        return self._binbot(message="Liquidated")
+
+    # --- Telegram ---
+
+    async def telegram(self, request):
+        if request.content_type == "application/json":
+            data = await request.json()
+        else:
+            data = await request.post()
+        self.telegram_messages += 1
+        return self._json(
+            {
+                "ok": True,
+                "result": {
+                    "message_id": self.telegram_messages,
+                    "date": self.now_ms() // 1000,
+                    "chat": {"id": int(data.get("chat_id") or 0), "type": "private"},
+                    "text": data.get("text", ""),
+                },
+            }
+        )
+
+    # --- Binance websocket ---
+
+    async def websocket(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        streams = set()
+        self.connections.add(ws)
+        emitter = asyncio.ensure_future(self._emit(ws, streams))
+        try:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                data = json.loads(msg.data)
+                if data.get("method") == "SUBSCRIBE":
+                    streams.update(data["params"])
+                elif data.get("method") == "UNSUBSCRIBE":
+                    streams.difference_update(data["params"])
+                elif data.get("method") == "LIST_SUBSCRIPTIONS":
+                    await ws.send_str(json.dumps({"result": sorted(streams), "id": data.get("id")}))
+                    continue
+                await ws.send_str(json.dumps({"result": None, "id": data.get("id")}))
+        finally:
+            emitter.cancel()
+            self.connections.discard(ws)
+        return ws
+
+    def _kline_event(self, state: SymbolState, closed, now_ms):
+        candle = state.candles[-1] if closed else state.current
+        return json.dumps(
+            {
+                "e": "kline",
+                "E": now_ms,
+                "s": state.symbol,
+                "k": {
+                    "t": candle[0],
+                    "T": candle[0] + interval_ms[state.interval] - 1,
+                    "s": state.symbol,
+                    "i": state.interval,
+                    "o": f"{candle[1]:.8f}",
+                    "h": f"{candle[2]:.8f}",
+                    "l": f"{candle[3]:.8f}",
+                    "c": f"{candle[4]:.8f}",
+                    "v": f"{candle[5]:.8f}",
+                    "n": 100,
+                    "x": closed,
+                    "q": "0",
+                    "V": "0",
+                    "Q": "0",
+                    "B": "0",
+                },
+            }
+        )
+
+    async def _emit(self, ws, streams):
+        if self.recording:
+            await self._emit_recording(ws)
+            return
+
+        sent = 0
+        started = time()
+        position = 0
+        while not ws.closed:
+            await asyncio.sleep(0.005)
+            if self.ws_drop_rate and self.rng.random() < self.ws_drop_rate * 0.005:
+                await ws.close()
+                return
+
+            active = [
+                s.split("@")[0].upper() for s in streams if "@kline_" in s
+            ]
+            active = [s for s in active if s in self.symbols]
+            if not active:
+                started, sent = time(), 0
+                continue
+
+            due = int((time() - started) * self.rate) - sent
+            for _ in range(due):
+                state = self.symbols[active[position % len(active)]]
+                position += 1
+                now = self.now_ms()
+                closed = state.tick(now)
+                await ws.send_str(self._kline_event(state, closed, now))
+                sent += 1
+                self.messages += 1
+
+    async def _emit_recording(self, ws):
+        previous = None
+        for timestamp, frame in read_frames(frame_files(self.recording)):
+            if ws.closed:
+                return
+            if previous is not None and timestamp > previous:
+                await asyncio.sleep((timestamp - previous) / self.time_scale)
+            previous = timestamp
+            await ws.send_str(frame)
+            self.messages += 1
+
+    # --- server ---
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        b = "/binbot"
+        app.add_routes(
+            [
+                web.get("/api/v3/time", self.server_time),
+                web.get("/api/v3/exchangeInfo", self.exchange_info),
+                web.get("/api/v3/ticker/price", self.ticker_price),
+                web.get("/api/v3/ticker/24hr", self.ticker24),
+                web.get("/api/v3/klines", self.klines),
+                web.get("/gateway-api/v1/public/launchpool/project/list", self.launchpool),
+                web.get("/ws", self.websocket),
+                web.get("/stream", self.websocket),
+                web.get(f"{b}/charts/candlestick", self.candlestick),
+                web.get(f"{b}/account/ticker24/{{symbol}}", self.bb_ticker24),
+                web.get(f"{b}/account/symbols", self.symbols_raw),
+                web.get(f"{b}/account/gainers-losers", self.gainers_losers),
+                web.get(f"{b}/account/market-domination", self.market_domination),
+                web.get(f"{b}/account/balance/raw", self.balance_raw),
+                web.get(f"{b}/account/balance/estimate", self.balance_estimate),
+                web.get(f"{b}/account/one-click-liquidation/{{symbol}}", self.liquidation),
+                web.get(f"{b}/autotrade-settings/bots", self.get_settings),
+                web.put(f"{b}/autotrade-settings/bots", self.put_settings),
+                web.get(f"{b}/autotrade-settings/paper-trading", self.get_settings),
+                web.put(f"{b}/autotrade-settings/paper-trading", self.put_settings),
+                web.get(f"{b}/research/blacklist", self.get_blacklist),
+                web.post(f"{b}/research/blacklist", self.post_blacklist),
+                web.post(f"{b}/research/subscribed", self.post_subscribed),
+                web.get(f"{b}/bot", self.list_bots),
+                web.post(f"{b}/bot", self.create_bot),
+                web.delete(f"{b}/bot", self.delete_bot),
+                web.get(f"{b}/bot/activate/{{id}}", self.activate_bot),
+                web.post(f"{b}/bot/errors/{{id}}", self.bot_errors),
+                web.get(f"{b}/paper-trading", self.list_bots),
+                web.post(f"{b}/paper-trading", self.create_bot),
+                web.delete(f"{b}/paper-trading", self.delete_bot),
+                web.get(f"{b}/paper-trading/activate/{{id}}", self.activate_bot),
+                web.post("/telegram/{method:.*}", self.telegram),
+            ]
+        )
+        return app
+
+    @staticmethod
+    def urls(host, port) -> dict:
+        """
+        Environment variables to point the research code to this server
+        """
+        return {
+            "BINANCE_API_URL": f"http://{host}:{port}",
+            "BINANCE_WS_URL": f"ws://{host}:{port}",
+            "FLASK_DOMAIN": f"http://{host}:{port}/binbot",
+            "TELEGRAM_API_URL": f"http://{host}:{port}/telegram/bot",
+        }
+
+    async def _start(self, host, port):
+        self.runner = web.AppRunner(self.app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+
+    def start(self, host="127.0.0.1", port=8090) -> dict:
+        """
+        Run server in a background thread, returns urls (see urls)
+        """
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self._start(host, port))
+            ready.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, name="fake-exchange", daemon=True)
+        self.thread.start()
+        ready.wait()
+        return self.urls(host, port)
+
+    def stop(self):
+        if self.loop:
+            async def shutdown():
+                for ws in list(self.connections):
+                    await ws.close()
+                await self.runner.cleanup()
+
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout=10)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=10)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "messages": self.messages,
+            "telegram_messages": self.telegram_messages,
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Local fake Binance + Binbot server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--interval", default="1m", choices=list(interval_ms))
+    parser.add_argument("--rate", type=float, default=100, help="Kline messages per second")
+    parser.add_argument("--latency", type=float, default=0, help="Seconds added to REST responses")
+    parser.add_argument("--error-rate", type=float, default=0, help="Probability of REST errors")
+    parser.add_argument("--ws-drop-rate", type=float, default=0, help="Probability per second of dropping websockets")
+    parser.add_argument("--time-scale", type=float, default=1, help="Simulated seconds per second")
+    parser.add_argument("--recording", help="Recorded frames to emit instead of synthetic klines")
+    parser.add_argument("--autotrade", action="store_true", help="Enable test autotrade")
+    args = parser.parse_args()
+
+    exchange = FakeExchange(
+        symbols=args.symbols,
+        interval=args.interval,
+        rate=args.rate,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        ws_drop_rate=args.ws_drop_rate,
+        time_scale=args.time_scale,
+        recording=args.recording,
+        autotrade=args.autotrade,
+    )
+    for key, value in exchange.urls(args.host, args.port).items():
+        print(f"{key}={value}")
+    web.run_app(exchange.app(), host=args.host, port=args.port, print=None)
@@ -0,0 +1,312 @@
+import argparse
+import json
+import logging
+import sys
+
+from time import perf_counter
+
+import numpy
+import pandas as pd
+import indicators
+
+try:
+    import talib
+except ImportError:
+    talib = None
+
+"""
+Equality check and benchmark of indicators.py
+
+On random walk candles (symbols x candles):
+- batch functions are compared with the streaming classes, updated candle by candle for every symbol
+- both are compared with pandas (and ta-lib if installed) implementations of the same definitions
+- batch time over the whole matrix, streaming time per update, pandas and ta-lib time (one call per symbol)
+
+ta-lib seeds MACD and other EMA based indicators slightly differently, so only the second half
+of the series (where seeding has faded) is compared with it.
+
+Usage:
+python -m benchmarks.indicators --symbols 200 --candles 1000 --output indicators.json
+Exits with 1 if any comparison fails.
+"""
+
+RTOL = 1e-8
+
+
+def random_candles(symbols, candles, seed=1) -> dict:
+    rng = numpy.random.default_rng(seed)
+    close = 100 * numpy.exp(numpy.cumsum(rng.normal(0, 0.01, (symbols, candles)), axis=1))
+    open = numpy.concatenate([close[:, :1], close[:, :-1]], axis=1)
+    return {
+        "open": open,
+        "high": numpy.maximum(open, close) * (1 + numpy.abs(rng.normal(0, 0.003, close.shape))),
+        "low": numpy.minimum(open, close) * (1 - numpy.abs(rng.normal(0, 0.003, close.shape))),
+        "close": close,
+        "volume": rng.uniform(1, 1000, close.shape),
+    }
+
+
+def _pd_ema(series, period, alpha=None):
+    # SMA seed, as indicators.ema and ta-lib
+    seeded = series.copy()
+    seeded.iloc[: period - 1] = numpy.nan
+    seeded.iloc[period - 1] = series.iloc[:period].mean()
+    if alpha is None:
+        return seeded.ewm(span=period, adjust=False, ignore_na=True).mean()
+    return seeded.ewm(alpha=alpha, adjust=False, ignore_na=True).mean()
+
+
+def _pd_rsi(close, period=14):
+    change = close.diff().iloc[1:]
+    gain = _pd_ema(change.clip(lower=0), period, alpha=1 / period)
+    loss = _pd_ema((-change).clip(lower=0), period, alpha=1 / period)
+    total = gain + loss
+    result = 100 * gain / total
+    result[total == 0] = 0.0
+    return result.reindex(close.index)
+
+
+def _pd_macd(close):
+    line = _pd_ema(close, 12) - _pd_ema(close, 26)
+    signal = _pd_ema(line.iloc[25:], 9).reindex(line.index)
+    return line, signal, line - signal
+
+
+def _pd_atr(high, low, close, period=14):
+    previous = close.shift()
+    ranges = pd.concat(
+        [high - low, (high - previous).abs(), (low - previous).abs()], axis=1
+    ).max(axis=1)
+    return _pd_ema(ranges.iloc[1:], period, alpha=1 / period).reindex(close.index)
+
+
+def _pd_adosc(high, low, close, volume):
+    multiplier = ((close - low) - (high - close)) / (high - low)
+    ad = (multiplier.fillna(0) * volume).cumsum()
+    result = ad.ewm(span=3, adjust=False).mean() - ad.ewm(span=10, adjust=False).mean()
+    result.iloc[:9] = numpy.nan
+    return result
+
+
+def _pd_obv(close, volume):
+    return (numpy.sign(close.diff()).fillna(1) * volume).cumsum()
+
+
+# name: (inputs, batch, streaming factory, streaming output, pandas, ta-lib)
+INDICATORS = {
+    "sma": (
+        ("close",),
+        lambda c: indicators.sma(c, 20),
+        lambda: indicators.SMA(20),
+        None,
+        lambda c: c.rolling(20).mean(),
+        lambda c: talib.SMA(c, 20),
+    ),
+    "ema": (
+        ("close",),
+        lambda c: indicators.ema(c, 20),
+        lambda: indicators.EMA(20),
+        None,
+        lambda c: _pd_ema(c, 20),
+        lambda c: talib.EMA(c, 20),
+    ),
+    "macd": (
+        ("close",),
+        lambda c: indicators.macd(c, 12, 26, 9),
+        lambda: indicators.MACD(12, 26, 9),
+        None,
+        _pd_macd,
+        lambda c: talib.MACD(c, 12, 26, 9),
+    ),
+    "rsi": (
+        ("close",),
+        lambda c: indicators.rsi(c, 14),
+        lambda: indicators.RSI(14),
+        None,
+        _pd_rsi,
+        lambda c: talib.RSI(c, 14),
+    ),
+    "bollinger_bands": (
+        ("close",),
+        lambda c: indicators.bollinger_bands(c, 20, 2),
+        lambda: indicators.BollingerBands(20, 2),
+        None,
+        lambda c: (
+            c.rolling(20).mean() + 2 * c.rolling(20).std(ddof=0),
+            c.rolling(20).mean(),
+            c.rolling(20).mean() - 2 * c.rolling(20).std(ddof=0),
+        ),
+        lambda c: talib.BBANDS(c, 20, 2, 2),
+    ),
+    "rolling_std": (
+        ("close",),
+        lambda c: indicators.rolling_std(c, 20),
+        lambda: indicators.RollingStd(20),
+        None,
+        lambda c: c.rolling(20).std(ddof=0),
+        lambda c: talib.STDDEV(c, 20),
+    ),
+    "log_volatility": (
+        ("close",),
+        lambda c: indicators.log_volatility(c, 100),
+        lambda: indicators.LogVolatility(100),
+        None,
+        lambda c: numpy.log(c / c.shift()).rolling(100).std(ddof=0),
+        None,
+    ),
+    "rolling_min": (
+        ("close",),
+        lambda c: indicators.rolling_min(c, 100),
+        lambda: indicators.RollingMin(100),
+        None,
+        lambda c: c.rolling(100).min(),
+        lambda c: talib.MIN(c, 100),
+    ),
+    "atr": (
+        ("high", "low", "close"),
+        lambda h, l, c: indicators.atr(h, l, c, 14),
+        lambda: indicators.ATR(14),
+        None,
+        _pd_atr,
+        lambda h, l, c: talib.ATR(h, l, c, 14),
+    ),
+    "chaikin_oscillator": (
+        ("high", "low", "close", "volume"),
+        lambda h, l, c, v: indicators.chaikin_oscillator(h, l, c, v, 3, 10),
+        lambda: indicators.VolumeIndicators(3, 10),
+        "adosc",
+        _pd_adosc,
+        lambda h, l, c, v: talib.ADOSC(h, l, c, v, 3, 10),
+    ),
+    "on_balance_volume": (
+        ("high", "low", "close", "volume"),
+        lambda h, l, c, v: indicators.on_balance_volume(c, v),
+        lambda: indicators.VolumeIndicators(3, 10),
+        "obv",
+        lambda h, l, c, v: _pd_obv(c, v),
+        lambda h, l, c, v: talib.OBV(c, v),
+    ),
+}
+
+
+def _outputs(result) -> list:
+    return [numpy.asarray(r, dtype=numpy.float64) for r in (result if isinstance(result, tuple) else (result,))]
+
+
+def max_error(actual, expected, tail=None) -> float | None:
+    """
+    Largest error relative to the magnitude of expected values, None if NaN positions differ
+    """
+    errors = []
+    for a, e in zip(_outputs(actual), _outputs(expected)):
+        if tail:
+            a, e = a[..., -tail:], e[..., -tail:]
+        if not numpy.array_equal(numpy.isnan(a), numpy.isnan(e)):
+            return None
+        valid = ~numpy.isnan(e)
+        if valid.any():
+            scale = max(numpy.max(numpy.abs(e[valid])), 1e-12)
+            errors.append(float(numpy.max(numpy.abs(a[valid] - e[valid])) / scale))
+    return max(errors, default=0.0)
+
+
+def _stream(factory, attribute, arrays) -> tuple:
+    symbols, candles = arrays[0].shape
+    rows = [list(zip(*(array[i].tolist() for array in arrays))) for i in range(symbols)]
+    values = []
+    started = perf_counter()
+    for symbol_rows in rows:
+        indicator = factory()
+        if attribute:
+            for row in symbol_rows:
+                indicator.update(*row)
+                values.append(getattr(indicator, attribute))
+        else:
+            for row in symbol_rows:
+                values.append(indicator.update(*row))
+    elapsed = perf_counter() - started
+
+    result = numpy.array(values, dtype=numpy.float64)
+    if result.ndim == 2:
+        # Tuples: (symbols x candles, outputs) -> outputs of (symbols x candles)
+        result = tuple(result[:, i].reshape(symbols, candles) for i in range(result.shape[1]))
+    else:
+        result = result.reshape(symbols, candles)
+    return result, elapsed
+
+
+def run(symbols=200, candles=1000) -> dict:
+    data = random_candles(symbols, candles)
+    report = {}
+    for name, (inputs, batch, streaming, attribute, pandas_fn, talib_fn) in INDICATORS.items():
+        arrays = [data[field] for field in inputs]
+
+        started = perf_counter()
+        expected = batch(*arrays)
+        batch_time = perf_counter() - started
+
+        streamed, streaming_time = _stream(streaming, attribute, arrays)
+
+        started = perf_counter()
+        pandas_results = [
+            pandas_fn(*(pd.Series(array[i]) for array in arrays)) for i in range(symbols)
+        ]
+        pandas_time = perf_counter() - started
+        pandas_result = tuple(
+            numpy.vstack([numpy.asarray(_outputs(r)[j]) for r in pandas_results])
+            for j in range(len(_outputs(expected)))
+        )
+
+        entry = {
+            "batch_ms": round(batch_time * 1000, 3),
+            "streaming_us_per_update": round(streaming_time / (symbols * candles) * 1e6, 3),
+            "pandas_ms": round(pandas_time * 1000, 3),
+            "streaming_error": max_error(streamed, expected),
+            "pandas_error": max_error(expected, pandas_result),
+        }
+
+        if talib and talib_fn:
+            started = perf_counter()
+            talib_results = [talib_fn(*(array[i] for array in arrays)) for i in range(symbols)]
+            entry["talib_ms"] = round((perf_counter() - started) * 1000, 3)
+            talib_result = tuple(
+                numpy.vstack([_outputs(r)[j] for r in talib_results])
+                for j in range(len(_outputs(expected)))
+            )
+            entry["talib_error"] = max_error(expected, talib_result, tail=candles // 2)
+
+        entry["passed"] = all(
+            entry[key] is not None and entry[key] <= RTOL
+            for key in ("streaming_error", "pandas_error", "talib_error")
+            if key in entry
+        )
+        logging.info(f"{name}: {entry}")
+        report[name] = entry
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Indicators batch/streaming equality check and benchmark")
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--candles", type=int, default=1000)
+    parser.add_argument("--output", help="Write results JSON here, otherwise stdout")
+    args = parser.parse_args()
+
+    report = {
+        "symbols": args.symbols,
+        "candles": args.candles,
+        "talib": talib is not None,
+        "indicators": run(args.symbols, args.candles),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    failed = [name for name, entry in report["indicators"].items() if not entry["passed"]]
+    if failed:
+        logging.error(f"Indicators not matching: {failed}")
+        sys.exit(1)
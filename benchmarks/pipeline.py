@@ -0,0 +1,288 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+from time import monotonic, sleep, time
+
+import numpy
+import requests
+from benchmarks.fake_exchange import FakeExchange
+from memory import rss_mb
+
+"""
+End-to-end throughput and latency benchmark of the signal pipeline
+
+Every scenario runs ResearchSignals in its own process against benchmarks/fake_exchange.py
+(also in its own process, so CPU and RSS only account for the pipeline).
+Klines go through the real websocket client, process_kline_stream and algorithms,
+REST calls go to the fake.
+
+Reported per scenario:
+- msgs_per_second: kline messages processed per second (offered rate is rate)
+- latency_p50/p99: exchange event time (E) to end of processing, in ms
+- cpu_percent: process CPU time / wall time
+- rss_mb: resident memory at the end of the run
+
+Results are compared against a baseline file, regressions make the command exit with 1.
+
+Usage:
+python -m benchmarks.pipeline --symbols 50 500 2000 --rates 100 1000 --algorithms 1 7 --output results.json
+python -m benchmarks.pipeline --baseline benchmarks/baseline.json
+python -m benchmarks.pipeline --save-baseline benchmarks/baseline.json
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_exchange(port, symbols, rate, interval="1m", *options) -> subprocess.Popen:
+    """
+    Fake exchange in a subprocess, options are extra CLI arguments (see benchmarks/fake_exchange.py)
+    """
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.fake_exchange",
+            "--port",
+            str(port),
+            "--symbols",
+            str(symbols),
+            "--rate",
+            str(rate),
+            "--interval",
+            interval,
+            *options,
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/api/v3/time"
+    deadline = monotonic() + 30
+    while monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return process
+        except requests.ConnectionError:
+            sleep(0.2)
+    process.kill()
+    raise RuntimeError("Fake exchange did not start")
+
+
+def run_scenario(symbols, rate, algorithms, duration=30, warmup=10, full_analysis=False) -> dict:
+    """
+    Run one scenario in this process. Must be called before signals is imported,
+    because API urls are read from the environment at import time.
+
+    Args:
+    - symbols: number of subscribed symbols
+    - rate: kline messages per second sent by the fake exchange
+    - algorithms: number of algorithms to run (first n of signals.ALGORITHMS)
+    - full_analysis: clear per-symbol cooldown so every kline runs the algorithms (worst case),
+    otherwise a symbol is only analysed once per cooldown, as in production
+    """
+    port = free_port()
+    fake = start_fake_exchange(port, symbols, rate)
+    os.environ.update(FakeExchange.urls("127.0.0.1", port))
+    os.environ.update(
+        {"TELEGRAM_BOT_KEY": "123456:benchmark", "TELEGRAM_USER_ID": "1", "ENV": "benchmark"}
+    )
+
+    from http_client import request_stats
+    from metrics import get_metrics
+    from signals import ALGORITHMS, ResearchSignals
+
+    class BenchmarkSignals(ResearchSignals):
+        def __init__(self, *args, **kwargs) -> None:
+            self.measuring = False
+            self.processed = 0
+            self.latencies = []
+            super().__init__(*args, **kwargs)
+
+        def handle_close(self, message):
+            # Don't reconnect when the fake exchange is stopped
+            pass
+
+        def process_kline_stream(self, result):
+            super().process_kline_stream(result)
+            if full_analysis:
+                self.last_processed_kline.pop(result["k"]["s"], None)
+            if self.measuring:
+                self.processed += 1
+                self.latencies.append(time() * 1000 - result["E"])
+
+    try:
+        research = BenchmarkSignals(algorithms=ALGORITHMS[:algorithms])
+        research.start_stream()
+        sleep(warmup)
+
+        research.measuring = True
+        cpu_start = os.times()
+        started = monotonic()
+        sleep(duration)
+        research.measuring = False
+        elapsed = monotonic() - started
+        cpu_end = os.times()
+
+        latencies = numpy.array(research.latencies)
+        cpu = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+        return {
+            "symbols": symbols,
+            "rate": rate,
+            "algorithms": algorithms,
+            "full_analysis": full_analysis,
+            "duration": round(elapsed, 3),
+            "messages": research.processed,
+            "msgs_per_second": round(research.processed / elapsed, 2),
+            "latency_p50": round(float(numpy.percentile(latencies, 50)), 3) if latencies.size else None,
+            "latency_p99": round(float(numpy.percentile(latencies, 99)), 3) if latencies.size else None,
+            "cpu_percent": round(cpu / elapsed * 100, 1),
+            "rss_mb": rss_mb(),
+            "threads": threading.active_count(),
+            # Per stage/algorithm latency histograms (includes warmup)
+            "stages": get_metrics().snapshot(),
+            "requests": request_stats.top(minutes=int((warmup + duration) // 60) + 1),
+        }
+    finally:
+        fake.kill()
+        fake.wait()
+
+
+def scenario_key(result) -> tuple:
+    return (result["symbols"], result["rate"], result["algorithms"], result["full_analysis"])
+
+
+def compare(results, baseline, tolerance=0.2) -> list:
+    """
+    Regressions of results against baseline results (same scenario):
+    throughput lower or p99 latency higher than baseline by more than tolerance
+    """
+    previous = {scenario_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = previous.get(scenario_key(result))
+        if not base:
+            continue
+        if result["msgs_per_second"] < base["msgs_per_second"] * (1 - tolerance):
+            regressions.append(
+                {
+                    "scenario": scenario_key(result),
+                    "metric": "msgs_per_second",
+                    "baseline": base["msgs_per_second"],
+                    "current": result["msgs_per_second"],
+                }
+            )
+        if (
+            result["latency_p99"] is not None
+            and base["latency_p99"] is not None
+            and result["latency_p99"] > base["latency_p99"] * (1 + tolerance)
+        ):
+            regressions.append(
+                {
+                    "scenario": scenario_key(result),
+                    "metric": "latency_p99",
+                    "baseline": base["latency_p99"],
+                    "current": result["latency_p99"],
+                }
+            )
+    return regressions
+
+
+def git_version() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(symbols, rates, algorithms, duration, warmup, full_analysis) -> list:
+    """
+    Run every combination in a fresh process, so scenarios don't share threads and memory
+    """
+    results = []
+    for n_symbols, rate, n_algorithms in itertools.product(symbols, rates, algorithms):
+        scenario = {
+            "symbols": n_symbols,
+            "rate": rate,
+            "algorithms": n_algorithms,
+            "duration": duration,
+            "warmup": warmup,
+            "full_analysis": full_analysis,
+        }
+        logging.info(f"Running scenario {scenario}")
+        process = subprocess.run(
+            [sys.executable, "-m", "benchmarks.pipeline", "--scenario", json.dumps(scenario)],
+            capture_output=True,
+            text=True,
+            timeout=duration + warmup + 300,
+        )
+        lines = process.stdout.strip().splitlines()
+        if process.returncode != 0 or not lines:
+            logging.error(f"Scenario {scenario} failed: {process.stderr[-2000:]}")
+            continue
+        result = json.loads(lines[-1])
+        logging.info(f"Result {result}")
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Signal pipeline throughput and latency benchmark")
+    parser.add_argument("--symbols", type=int, nargs="+", default=[50, 500, 2000])
+    parser.add_argument("--rates", type=float, nargs="+", default=[100, 1000])
+    parser.add_argument("--algorithms", type=int, nargs="+", default=[1, 7], help="Number of algorithms enabled")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=10, help="Seconds before measuring (subscriptions, first analyses)")
+    parser.add_argument("--full-analysis", action="store_true", help="Run algorithms on every kline, ignoring cooldowns")
+    parser.add_argument("--output", help="Write results JSON here, otherwise stdout")
+    parser.add_argument("--baseline", help="Baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--save-baseline", help="Write results as the new baseline")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        # Child process, see run_suite
+        scenario = json.loads(args.scenario)
+        result = run_scenario(**scenario)
+        print(json.dumps(result), flush=True)
+        # websocket and settings threads are not meant to be stopped
+        os._exit(0)
+
+    results = run_suite(
+        args.symbols, args.rates, args.algorithms, args.duration, args.warmup, args.full_analysis
+    )
+    report = {"version": git_version(), "python": sys.version.split()[0], "results": results}
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["baseline_version"] = baseline.get("version")
+        report["regressions"] = compare(results, baseline, args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(output)
+
+    if report.get("regressions"):
+        logging.error(f"{len(report['regressions'])} regressions against baseline")
+        sys.exit(1)
@@ -0,0 +1,181 @@
+import argparse
+import json
+import logging
+import os
+import sys
+
+from time import monotonic, time
+
+from benchmarks.fake_exchange import FakeExchange
+from benchmarks.pipeline import free_port, start_fake_exchange
+from clock import SimulatedClock, set_clock
+from memory import memory_snapshot, start_tracemalloc
+
+"""
+Long run leak benchmark
+
+Runs ResearchSignals for hours/days of simulated time against benchmarks/fake_exchange.py.
+Klines are generated in process and fed to on_message as fast as possible, a SimulatedClock
+moves `message_interval / symbols` seconds per message, so cooldowns, market domination
+and the daily pause run as they would live. The websocket connection is closed
+every `reconnect_every` simulated seconds to exercise handle_close reconnections.
+
+Every `sample_every` simulated seconds RSS, threads, tracemalloc top allocators/growth
+and per symbol state sizes are recorded (see memory.py).
+Fails (exit code 1) if RSS grows more than --max-growth MB per simulated day
+or threads keep growing, measured after --warmup-hours.
+
+Usage:
+python -m benchmarks.soak --symbols 200 --hours 48 --output soak.json
+"""
+
+
+def run_soak(
+    symbols=200,
+    hours=24,
+    message_interval=60,
+    sample_every=3600,
+    reconnect_every=6 * 3600,
+    autotrade=True,
+    top=10,
+) -> dict:
+    port = free_port()
+    options = ["--autotrade"] if autotrade else []
+    # Klines come from this process, the fake only serves REST and websocket control
+    fake = start_fake_exchange(port, symbols, 0, "1m", *options)
+    os.environ.update(FakeExchange.urls("127.0.0.1", port))
+    os.environ.update(
+        {"TELEGRAM_BOT_KEY": "123456:benchmark", "TELEGRAM_USER_ID": "1", "ENV": "benchmark"}
+    )
+
+    clock = SimulatedClock(time())
+    set_clock(clock)
+    start_tracemalloc()
+
+    from signals import ResearchSignals
+
+    # Same seed and symbols as the fake exchange
+    generator = FakeExchange(symbols=symbols, history=1)
+    states = list(generator.symbols.values())
+
+    try:
+        research = ResearchSignals(clock=clock)
+        research.start_stream()
+
+        started = clock.time()
+        wall_started = monotonic()
+        step = message_interval / symbols
+        next_sample = started + sample_every
+        # Baseline for allocator growth
+        memory_snapshot(top)
+        next_reconnect = started + reconnect_every
+        samples = []
+        messages = 0
+        errors = 0
+
+        while clock.time() - started < hours * 3600:
+            for state in states:
+                now_ms = int(clock.time() * 1000)
+                closed = state.tick(now_ms)
+                # Generator only needs the last closed candle
+                while len(state.candles) > 1:
+                    state.candles.popleft()
+                try:
+                    research.on_message(None, generator._kline_event(state, closed, now_ms))
+                except Exception as error:
+                    errors += 1
+                    logging.error(f"Error processing kline: {error}")
+                messages += 1
+                clock.advance(step)
+
+            if clock.time() >= next_reconnect:
+                # on_close -> handle_close creates a new client, as when Binance drops the connection
+                research.client.stop()
+                next_reconnect += reconnect_every
+
+            if clock.time() >= next_sample:
+                snapshot = memory_snapshot(top)
+                snapshot.update(
+                    {
+                        "simulated_hours": round((clock.time() - started) / 3600, 2),
+                        "wall_seconds": round(monotonic() - wall_started, 1),
+                        "messages": messages,
+                        "errors": errors,
+                        "last_processed_kline": len(research.last_processed_kline),
+                        "subscribed_symbols": len(research.subscribed_symbols),
+                        "autotrade_jobs": len(research.autotrade_queue.jobs),
+                        "candles": research.candles.memory_report(),
+                    }
+                )
+                logging.info(
+                    f"Soak {snapshot['simulated_hours']}h: rss {snapshot['rss_mb']}MB, threads {snapshot['threads']}"
+                )
+                samples.append(snapshot)
+                next_sample += sample_every
+
+        return {"symbols": symbols, "hours": hours, "samples": samples}
+    finally:
+        fake.kill()
+        fake.wait()
+
+
+def evaluate(result, max_growth=20.0, max_thread_growth=2, warmup_hours=2) -> dict:
+    """
+    RSS growth per simulated day and thread growth between the first sample after
+    warmup_hours (caches filled, thread pools started) and the last sample
+    """
+    samples = [s for s in result["samples"] if s["simulated_hours"] >= warmup_hours]
+    if len(samples) < 2:
+        return {"passed": False, "reason": "Not enough samples after warm up, increase --hours"}
+
+    first, last = samples[0], samples[-1]
+    days = (last["simulated_hours"] - first["simulated_hours"]) / 24
+    growth = (last["rss_mb"] - first["rss_mb"]) / days
+    thread_growth = last["threads"] - first["threads"]
+    passed = growth <= max_growth and thread_growth <= max_thread_growth
+    return {
+        "passed": passed,
+        "rss_growth_mb_per_day": round(growth, 2),
+        "thread_growth": thread_growth,
+        "max_growth": max_growth,
+        "max_thread_growth": max_thread_growth,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Long run memory and thread leak benchmark")
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--hours", type=float, default=24, help="Simulated hours")
+    parser.add_argument("--message-interval", type=float, default=60, help="Simulated seconds between klines of a symbol")
+    parser.add_argument("--sample-every", type=float, default=3600, help="Simulated seconds between memory samples")
+    parser.add_argument("--reconnect-every", type=float, default=6 * 3600, help="Simulated seconds between websocket reconnections")
+    parser.add_argument("--no-autotrade", action="store_true", help="Don't open paper trading bots")
+    parser.add_argument("--max-growth", type=float, default=20, help="Allowed RSS growth, MB per simulated day")
+    parser.add_argument("--max-thread-growth", type=int, default=2)
+    parser.add_argument("--warmup-hours", type=float, default=2, help="Simulated hours excluded from growth")
+    parser.add_argument("--output", help="Write samples and verdict JSON here, otherwise stdout")
+    args = parser.parse_args()
+
+    result = run_soak(
+        symbols=args.symbols,
+        hours=args.hours,
+        message_interval=args.message_interval,
+        sample_every=args.sample_every,
+        reconnect_every=args.reconnect_every,
+        autotrade=not args.no_autotrade,
+    )
+    result["verdict"] = evaluate(
+        result, args.max_growth, args.max_thread_growth, args.warmup_hours
+    )
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    logging.info(f"Soak verdict: {result['verdict']}")
+    # websocket and settings threads are not meant to be stopped
+    sys.stdout.flush()
+    os._exit(0 if result["verdict"]["passed"] else 1)
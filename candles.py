@@ -0,0 +1,483 @@
+import threading
+import zlib
+
+from collections import deque
+
+import numpy
+
+"""
+Local candle store
+
+Closed klines from the websocket are kept per symbol, so indicators can be updated
+from local data on every closed candle instead of fetching the whole series again.
+History (e.g. Binbot candlestick trace) can be merged in to warm up a symbol, see CandleStore.seed.
+
+Listeners subscribed with CandleStore.subscribe are called with (symbol, CandleBuffer)
+after each new closed candle.
+
+Higher timeframes are resampled from the stored (base) interval, see resample,
+so e.g. 5m, 15m and 1h candles are available from a single 1m stream without
+new sockets or REST history.
+
+Only a recent (hot) window is kept as plain arrays. Older candles, up to `history`,
+are kept in compressed blocks (ColdBlock) and decoded only when deep history is requested,
+see CandleBuffer.deep. Memory per symbol is served at /candles on the metrics server.
+"""
+
+FIELDS = ("open_time", "open", "high", "low", "close", "volume")
+
+MINUTE = 60 * 1000
+DAY = 24 * 60 * MINUTE
+
+# Fixed length intervals in ms (EnumDefinitions.chart_intervals), 1M follows calendar months
+INTERVALS = {
+    "1m": MINUTE,
+    "3m": 3 * MINUTE,
+    "5m": 5 * MINUTE,
+    "15m": 15 * MINUTE,
+    "30m": 30 * MINUTE,
+    "1h": 60 * MINUTE,
+    "2h": 120 * MINUTE,
+    "4h": 240 * MINUTE,
+    "6h": 360 * MINUTE,
+    "8h": 480 * MINUTE,
+    "12h": 720 * MINUTE,
+    "1d": DAY,
+    "3d": 3 * DAY,
+    "1w": 7 * DAY,
+}
+
+# Decimal places tried for exact integer encoding of prices and volumes (Binance uses up to 8)
+MAX_DECIMALS = 8
+
+# Candles open at multiples of the interval since epoch (UTC),
+# except weeks, which open on Monday (epoch was a Thursday)
+OFFSETS = {"1w": 3 * DAY}
+
+
+def _shuffle(words) -> bytes:
+    # Byte planes of 8 byte words, so the (mostly zero) high bytes compress together
+    return words.view(numpy.uint8).reshape(-1, 8).T.tobytes()
+
+
+def _unshuffle(data, count) -> numpy.ndarray:
+    planes = numpy.frombuffer(data, dtype=numpy.uint8).reshape(8, count)
+    return numpy.ascontiguousarray(planes.T).view(numpy.uint64).reshape(-1)
+
+
+def _zigzag(values) -> numpy.ndarray:
+    # Small negative deltas as small unsigned words
+    return ((values << 1) ^ (values >> 63)).view(numpy.uint64)
+
+
+def _unzigzag(words) -> numpy.ndarray:
+    return (words >> numpy.uint64(1)).view(numpy.int64) ^ -(words & numpy.uint64(1)).view(numpy.int64)
+
+
+def _encode_values(values) -> tuple[int, numpy.ndarray]:
+    """
+    Decimal places and delta of the values as integers if they round trip exactly
+    (prices and quantities have a tick size), otherwise -1 and XOR of the float bits
+    """
+    for decimals in range(MAX_DECIMALS + 1):
+        scaled = numpy.round(values * 10**decimals)
+        if numpy.abs(scaled).max(initial=0) < 2**53 and numpy.array_equal(scaled / 10**decimals, values):
+            return decimals, _zigzag(numpy.diff(scaled.astype(numpy.int64), prepend=0))
+    bits = numpy.ascontiguousarray(values).view(numpy.uint64)
+    return -1, bits ^ numpy.concatenate((numpy.zeros(1, numpy.uint64), bits[:-1]))
+
+
+def _decode_values(decimals, words) -> numpy.ndarray:
+    if decimals < 0:
+        return numpy.bitwise_xor.accumulate(words).view(numpy.float64)
+    return numpy.cumsum(_unzigzag(words)) / 10**decimals
+
+
+class ColdBlock:
+    """
+    Closed candles compressed with zlib after encoding:
+    - open times as delta of delta (zeros for consecutive candles)
+    - prices and volumes as delta of integers (value x 10^decimals) when exact,
+    otherwise XOR the previous value (float bits, Gorilla style)
+    """
+
+    def __init__(self, data: numpy.ndarray) -> None:
+        """
+        Args:
+        - data: (len(FIELDS), candles) array, as CandleBuffer.data
+        """
+        self.count = data.shape[1]
+        open_time = data[0].astype(numpy.int64)
+        self.first_open_time = int(open_time[0])
+        self.last_open_time = int(open_time[-1])
+
+        encoded = [_zigzag(numpy.diff(open_time, n=2, prepend=(0, 0)))]
+        self.decimals = []
+        for values in data[1:]:
+            decimals, words = _encode_values(values)
+            self.decimals.append(decimals)
+            encoded.append(words)
+        self.payload = zlib.compress(b"".join(_shuffle(words) for words in encoded))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.payload)
+
+    def decode(self) -> numpy.ndarray:
+        payload = zlib.decompress(self.payload)
+        step = 8 * self.count
+        words = [_unshuffle(payload[i * step : (i + 1) * step], self.count) for i in range(len(FIELDS))]
+
+        data = numpy.empty((len(FIELDS), self.count))
+        data[0] = numpy.cumsum(numpy.cumsum(_unzigzag(words[0])))
+        for row, (decimals, values) in enumerate(zip(self.decimals, words[1:]), start=1):
+            data[row] = _decode_values(decimals, values)
+        return data
+
+
+class CandleBuffer:
+    """
+    Last `size` closed candles of a symbol, oldest first
+
+    Columns live in one array with room for 2 x size candles. When it is full
+    the last candles are moved to the front, so appends are amortized O(1)
+    and columns are views, not copies.
+
+    With history, the candles dropped at that point become a ColdBlock,
+    and the oldest blocks are dropped once they hold more than `history` candles.
+    """
+
+    def __init__(self, size=1000, interval=None, history=0) -> None:
+        self.size = size
+        self.interval = interval
+        self.history = history
+        self.data = numpy.zeros((len(FIELDS), 2 * size))
+        self.start = 0
+        self.end = 0
+        self.cold: deque[ColdBlock] = deque()
+        self.cold_count = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    @property
+    def last_open_time(self) -> int | None:
+        if self.end == self.start:
+            return None
+        return int(self.data[0, self.end - 1])
+
+    @property
+    def first_open_time(self) -> int | None:
+        if self.cold:
+            return self.cold[0].first_open_time
+        if self.end == self._history_start:
+            return None
+        return int(self.data[0, self._history_start])
+
+    @property
+    def _history_start(self) -> int:
+        # Candles out of the window stay in data until the next move to the front
+        return 0 if self.history else self.start
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + sum(block.nbytes for block in self.cold)
+
+    def _freeze(self, data):
+        self.cold.append(ColdBlock(data))
+        self.cold_count += data.shape[1]
+        while self.cold_count > self.history:
+            self.cold_count -= self.cold.popleft().count
+
+    def append(self, open_time, open, high, low, close, volume) -> bool:
+        """
+        Add a candle newer than the last one, returns False for duplicates and older candles
+        """
+        last_open_time = self.last_open_time
+        if last_open_time is not None and open_time <= last_open_time:
+            return False
+
+        if self.end == self.data.shape[1]:
+            if self.history and self.start:
+                self._freeze(self.data[:, : self.start])
+            length = len(self)
+            self.data[:, :length] = self.data[:, self.start : self.end]
+            self.start = 0
+            self.end = length
+
+        self.data[:, self.end] = (open_time, open, high, low, close, volume)
+        self.end += 1
+        if len(self) > self.size:
+            self.start += 1
+        return True
+
+    def column(self, name) -> numpy.ndarray:
+        return self.data[FIELDS.index(name), self.start : self.end]
+
+    def deep(self, count=None) -> "CandleBuffer":
+        """
+        Last `count` candles (all if None) including compressed history, as a new buffer.
+        Only the blocks needed are decoded
+        """
+        start = self._history_start
+        if count is None:
+            count = self.cold_count + self.end - start
+        parts = [self.data[:, start : self.end]]
+        available = self.end - start
+        for block in reversed(self.cold):
+            if available >= count:
+                break
+            parts.insert(0, block.decode())
+            available += block.count
+
+        data = numpy.concatenate(parts, axis=1)[:, max(available - count, 0) :]
+        candles = CandleBuffer(max(data.shape[1], 1), self.interval)
+        candles.data[:, : data.shape[1]] = data
+        candles.end = data.shape[1]
+        return candles
+
+    @property
+    def open_time(self) -> numpy.ndarray:
+        return self.column("open_time").astype(numpy.int64)
+
+    @property
+    def open(self) -> numpy.ndarray:
+        return self.column("open")
+
+    @property
+    def high(self) -> numpy.ndarray:
+        return self.column("high")
+
+    @property
+    def low(self) -> numpy.ndarray:
+        return self.column("low")
+
+    @property
+    def close(self) -> numpy.ndarray:
+        return self.column("close")
+
+    @property
+    def volume(self) -> numpy.ndarray:
+        return self.column("volume")
+
+
+def _bucket_open_times(open_time, interval) -> numpy.ndarray:
+    if interval == "1M":
+        months = open_time.astype("datetime64[ms]").astype("datetime64[M]")
+        return months.astype("datetime64[ms]").astype(numpy.int64)
+    length = INTERVALS[interval]
+    offset = OFFSETS.get(interval, 0)
+    return (open_time + offset) // length * length - offset
+
+
+def _bucket_close_times(bucket_open, interval) -> numpy.ndarray:
+    if interval == "1M":
+        months = bucket_open.astype("datetime64[ms]").astype("datetime64[M]") + 1
+        return months.astype("datetime64[ms]").astype(numpy.int64)
+    return bucket_open + INTERVALS[interval]
+
+
+def next_open_time(open_time, interval) -> int:
+    """
+    Open time of the candle after the one opened at open_time
+    """
+    return int(_bucket_close_times(numpy.array([open_time], dtype=numpy.int64), interval)[0])
+
+
+def can_resample(base, interval) -> bool:
+    """
+    Whether every interval candle is made of whole base candles
+    """
+    if base not in INTERVALS or (interval != "1M" and interval not in INTERVALS):
+        return False
+    if interval == "1M":
+        return DAY % INTERVALS[base] == 0
+    length = INTERVALS[interval]
+    return (
+        length % INTERVALS[base] == 0
+        and OFFSETS.get(interval, 0) % INTERVALS[base] == 0
+    )
+
+
+def resample(candles: CandleBuffer, interval, partial=False) -> CandleBuffer:
+    """
+    Aggregate candles into a higher interval (open first, high max, low min,
+    close last, volume sum), aligned as Binance candles of that interval
+
+    Only complete candles are returned: the first one is dropped if history starts
+    after its open time, the last one if its base candles haven't closed yet.
+
+    Args:
+    - candles: base candles, their interval must divide interval (see can_resample)
+    - interval: one of EnumDefinitions.chart_intervals
+    - partial: keep the last candle even if it is still open, as the websocket kline
+    """
+    if not can_resample(candles.interval, interval):
+        raise ValueError(f"Can't resample {candles.interval} candles into {interval}")
+
+    open_time = candles.open_time
+    if not len(open_time):
+        return CandleBuffer(1, interval)
+
+    buckets = _bucket_open_times(open_time, interval)
+    starts = numpy.flatnonzero(numpy.r_[True, buckets[1:] != buckets[:-1]])
+    lasts = numpy.r_[starts[1:], len(open_time)] - 1
+    bucket_open = buckets[starts]
+
+    complete = open_time[lasts] + INTERVALS[candles.interval] >= _bucket_close_times(
+        bucket_open, interval
+    )
+    if partial:
+        complete[-1] = True
+    complete[0] &= open_time[0] == bucket_open[0]
+
+    rows = numpy.vstack(
+        (
+            bucket_open,
+            candles.open[starts],
+            numpy.maximum.reduceat(candles.high, starts),
+            numpy.minimum.reduceat(candles.low, starts),
+            candles.close[lasts],
+            numpy.add.reduceat(candles.volume, starts),
+        )
+    )[:, complete]
+
+    resampled = CandleBuffer(max(rows.shape[1], 1), interval)
+    resampled.data[:, : rows.shape[1]] = rows
+    resampled.end = rows.shape[1]
+    return resampled
+
+
+class CandleStore:
+    def __init__(self, size=1000, history=0) -> None:
+        """
+        Args:
+        - size: candles per symbol kept as plain arrays (hot window)
+        - history: older candles per symbol kept compressed, see ColdBlock
+        """
+        self.size = size
+        self.history = history
+        self.lock = threading.Lock()
+        self.candles: dict[str, CandleBuffer] = {}
+        self.listeners = []
+
+    def subscribe(self, listener):
+        """
+        Call listener(symbol, candles) after each new closed candle
+        """
+        self.listeners.append(listener)
+
+    def get(self, symbol) -> CandleBuffer | None:
+        return self.candles.get(symbol)
+
+    def resample(self, symbol, interval, partial=False, deep=False) -> CandleBuffer | None:
+        """
+        Candles of symbol in interval, from the stored candles (see resample),
+        including compressed history if deep
+
+        Returns None if there are no candles for symbol or they can't be
+        resampled into interval (e.g. 15m from a 1h stream)
+        """
+        with self.lock:
+            candles = self.candles.get(symbol)
+            if candles is None or not can_resample(candles.interval, interval):
+                return None
+            if deep:
+                candles = candles.deep()
+            # New arrays, stored columns change with new candles
+            return resample(candles, interval, partial)
+
+    def deep(self, symbol, count=None) -> CandleBuffer | None:
+        """
+        Last `count` candles of symbol including compressed history, see CandleBuffer.deep
+        """
+        with self.lock:
+            candles = self.candles.get(symbol)
+            return candles.deep(count) if candles is not None else None
+
+    def memory_report(self) -> dict:
+        """
+        Candles and bytes per symbol of the hot window and compressed history
+        """
+        with self.lock:
+            buffers = list(self.candles.values())
+        symbols = len(buffers)
+        hot_candles = sum(len(candles) for candles in buffers)
+        cold_candles = sum(candles.cold_count for candles in buffers)
+        hot_bytes = sum(candles.data.nbytes for candles in buffers)
+        cold_bytes = sum(candles.nbytes - candles.data.nbytes for candles in buffers)
+        # Same candles as plain float64 columns
+        plain_cold_bytes = cold_candles * len(FIELDS) * 8
+        return {
+            "symbols": symbols,
+            "size": self.size,
+            "history": self.history,
+            "hot_candles": hot_candles,
+            "cold_candles": cold_candles,
+            "hot_kb": round(hot_bytes / 1024, 1),
+            "cold_kb": round(cold_bytes / 1024, 1),
+            "kb_per_symbol": round((hot_bytes + cold_bytes) / 1024 / symbols, 1) if symbols else 0,
+            "cold_compression": round(plain_cold_bytes / cold_bytes, 2) if cold_bytes else None,
+        }
+
+    def update(self, kline: dict) -> bool:
+        """
+        Store a websocket kline payload (the "k" object) if the candle is closed
+
+        Returns True if it is a new closed candle, see extend
+        """
+        if not kline.get("x"):
+            return False
+
+        row = (kline["t"], kline["o"], kline["h"], kline["l"], kline["c"], kline["v"])
+        return self.extend(kline["s"], kline["i"], [row]) == 1
+
+    def extend(self, symbol, interval, rows) -> int:
+        """
+        Append closed candles (open_time, open, high, low, close, volume), oldest first,
+        calling listeners after each new one. Candles of a different interval
+        (e.g. after resubscribing) replace the stored ones
+
+        Returns the number of new candles
+        """
+        added = 0
+        for row in rows:
+            with self.lock:
+                candles = self.candles.get(symbol)
+                if candles is None or candles.interval != interval:
+                    candles = self.candles[symbol] = CandleBuffer(
+                        self.size, interval, self.history
+                    )
+                if not candles.append(int(row[0]), *(float(value) for value in row[1:6])):
+                    continue
+
+            added += 1
+            for listener in self.listeners:
+                listener(symbol, candles)
+        return added
+
+    def seed(self, symbol, interval, open_time, open, high, low, close, volume) -> CandleBuffer:
+        """
+        Merge closed candles history (oldest first) with the candles already stored,
+        stored candles win for the same open time
+        """
+        with self.lock:
+            current = self.candles.get(symbol)
+            if current is not None and current.interval != interval:
+                current = None
+            first_stored = current.first_open_time if current is not None else None
+            candles = CandleBuffer(self.size, interval, self.history)
+            for row in zip(open_time, open, high, low, close, volume):
+                if first_stored is not None and row[0] >= first_stored:
+                    break
+                candles.append(int(row[0]), *(float(value) for value in row[1:]))
+            if current is not None:
+                stored = current.deep()
+                for row in stored.data[:, stored.start : stored.end].T:
+                    candles.append(int(row[0]), *row[1:])
+            self.candles[symbol] = candles
+        return candles
+
+    def evict(self, symbol):
+        with self.lock:
+            self.candles.pop(symbol, None)
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from datetime import datetime
+
+
+"""
+Clock service for all time-dependent code (cooldowns, market momentum, pauses)
+
+Classes take an optional clock, otherwise they use the process default (get_clock).
+Simulations and benchmarks call set_clock(SimulatedClock(...)) so that
+everything created afterwards runs on simulated time and sleeps return instantly.
+
+Background I/O loops (settings refresh, telegram rate limits) deliberately stay on wall time.
+"""
+
+
+class WallClock:
+    """
+    Real time, default clock
+    """
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class SimulatedClock:
+    """
+    Clock driven by replays and simulations
+
+    Time only moves when set/advanced, sleeps advance time instantly
+    """
+
+    def __init__(self, start: float = 0) -> None:
+        self.lock = threading.Lock()
+        self._time = float(start)
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self._time)
+
+    def time(self) -> float:
+        return self._time
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        with self.lock:
+            self._time += max(float(seconds), 0)
+
+    def set(self, timestamp: float):
+        """
+        Move clock forward to timestamp, never backwards
+        """
+        with self.lock:
+            self._time = max(self._time, float(timestamp))
+
+
+_default_clock = WallClock()
+
+
+def get_clock():
+    return _default_clock
+
+
+def set_clock(clock):
+    """
+    Replace process default clock, e.g. with SimulatedClock for simulations
+    """
+    global _default_clock
+    _default_clock = clock
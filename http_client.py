@@ -0,0 +1,335 @@
+import json
+import os
+import sys
+import threading
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import perf_counter, time
+from urllib.parse import urlsplit
+
+import requests
+from metrics import get_metrics, register_report
+
+"""
+Outbound HTTP requests with per caller accounting
+
+Drop-in for requests.get/post/put/delete. Every request is attributed to a caller:
+- the innermost request_caller("name") block, if any
+- otherwise the function that made the call, e.g. rally_or_pullback, Autotrade.__init__
+(frames in this module and apis.py are skipped, so BinbotApi/BinanceApi helpers
+are attributed to whoever called them)
+
+Count, errors, bytes, latency and Binance weight are aggregated per service, caller and minute.
+Binance weight is the increase of the x-mbx-used-weight-1m header between responses,
+which is exact for sequential requests and approximate when requests overlap.
+
+See request_stats.top() or /requests on the metrics server (metrics.py).
+
+Concurrent identical GETs (same url, params and headers) are coalesced: the first one
+makes the request and the others wait for its response (see Coalescer).
+Endpoints are excluded by path with Coalescer.configure or COALESCE_EXCLUDE
+(comma separated paths). GETs with side effects (bot activation, liquidation) are excluded by default.
+Per endpoint requests, hits and wait times are at /coalescing on the metrics server.
+"""
+
+_local = threading.local()
+# Wrappers, attributed to their callers
+_skip_modules = {__name__, "apis"}
+
+
+@contextmanager
+def request_caller(name):
+    """
+    Attribute requests made inside this block to name
+    """
+    previous = getattr(_local, "caller", None)
+    _local.caller = name
+    try:
+        yield
+    finally:
+        _local.caller = previous
+
+
+def current_caller() -> str:
+    caller = getattr(_local, "caller", None)
+    if caller:
+        return caller
+
+    frame = sys._getframe(1)
+    while frame:
+        if frame.f_globals.get("__name__") not in _skip_modules:
+            name = frame.f_code.co_name
+            instance = frame.f_locals.get("self")
+            if instance is not None and not name.startswith("<"):
+                name = f"{type(instance).__name__}.{name}"
+            return name
+        frame = frame.f_back
+    return "unknown"
+
+
+def service_name(url) -> str:
+    for service, base_url in (
+        ("binbot", os.getenv("FLASK_DOMAIN")),
+        ("binance", os.getenv("BINANCE_API_URL")),
+    ):
+        if base_url and url.startswith(base_url):
+            return service
+    host = urlsplit(url).hostname or ""
+    return "binance" if host.endswith("binance.com") else host
+
+
+class RequestStats:
+    """
+    Per minute totals by (service, caller)
+    """
+
+    def __init__(self, minutes=60) -> None:
+        self.minutes = minutes
+        self.lock = threading.Lock()
+        # minute -> {(service, caller): [count, errors, bytes, latency, max latency, weight]}
+        self.data: OrderedDict[int, dict] = OrderedDict()
+        self.last_weight = 0
+        self.last_weight_minute = None
+
+    def _weight_delta(self, minute, used_weight) -> int:
+        # Header is cumulative for the current minute (per IP)
+        if self.last_weight_minute != minute or used_weight < self.last_weight:
+            self.last_weight = 0
+        delta = max(used_weight - self.last_weight, 0)
+        self.last_weight = used_weight
+        self.last_weight_minute = minute
+        return delta
+
+    def record(self, service, caller, elapsed, size=0, error=False, used_weight=None, now=None):
+        minute = int((now or time()) // 60)
+        with self.lock:
+            weight = self._weight_delta(minute, used_weight) if used_weight is not None else 0
+            if minute not in self.data:
+                self.data[minute] = {}
+                while len(self.data) > self.minutes:
+                    self.data.popitem(last=False)
+            entry = self.data[minute].setdefault((service, caller), [0, 0, 0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += int(error)
+            entry[2] += size
+            entry[3] += elapsed
+            entry[4] = max(entry[4], elapsed)
+            entry[5] += weight
+
+    def _row(self, service, caller, entry) -> dict:
+        return {
+            "service": service,
+            "caller": caller,
+            "count": entry[0],
+            "errors": entry[1],
+            "bytes": entry[2],
+            "mean_ms": round(entry[3] / entry[0] * 1000, 3) if entry[0] else 0,
+            "max_ms": round(entry[4] * 1000, 3),
+            "weight": entry[5],
+        }
+
+    def by_minute(self) -> dict:
+        """
+        {minute start (unix seconds): [rows]}
+        """
+        with self.lock:
+            return {
+                minute * 60: [self._row(s, c, e) for (s, c), e in entries.items()]
+                for minute, entries in self.data.items()
+            }
+
+    def top(self, minutes=5) -> list:
+        """
+        Totals of the last `minutes` by caller, heaviest first (weight, then count)
+        """
+        oldest = int(time() // 60) - minutes + 1
+        totals = {}
+        with self.lock:
+            for minute, entries in self.data.items():
+                if minute < oldest:
+                    continue
+                for key, entry in entries.items():
+                    total = totals.setdefault(key, [0, 0, 0, 0.0, 0.0, 0])
+                    for i in (0, 1, 2, 3, 5):
+                        total[i] += entry[i]
+                    total[4] = max(total[4], entry[4])
+
+        rows = [self._row(s, c, e) for (s, c), e in totals.items()]
+        for row in rows:
+            row["per_minute"] = round(row["count"] / minutes, 2)
+            row["weight_per_minute"] = round(row["weight"] / minutes, 2)
+        return sorted(rows, key=lambda r: (r["weight"], r["count"]), reverse=True)
+
+
+request_stats = RequestStats()
+register_report("requests", request_stats.top)
+
+
+class InFlight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        self.followers = 0
+
+
+class Coalescer:
+    """
+    Single flight for identical GETs
+
+    Followers get the same requests.Response as the request in flight (or its exception).
+    Its content is already read, so each .json() call parses its own copy.
+    """
+
+    def __init__(self, exclude=()) -> None:
+        self.lock = threading.Lock()
+        self.in_flight: dict[str, InFlight] = {}
+        # path substring -> enabled, the last matching wins
+        self.endpoints: dict[str, bool] = {path: False for path in exclude}
+        # path -> [requests, hits, requests with followers, request seconds, wait seconds]
+        self.stats: dict[str, list] = {}
+
+    def configure(self, path, enabled=True):
+        """
+        Enable or disable coalescing for urls containing path
+        """
+        with self.lock:
+            self.endpoints.pop(path, None)
+            self.endpoints[path] = enabled
+
+    def enabled(self, path) -> bool:
+        with self.lock:
+            enabled = True
+            for endpoint, value in self.endpoints.items():
+                if endpoint in path:
+                    enabled = value
+            return enabled
+
+    def _stats(self, path) -> list:
+        return self.stats.setdefault(path, [0, 0, 0, 0.0, 0.0])
+
+    def get(self, url, params, headers, fetch) -> requests.Response:
+        """
+        Return fetch() of the request in flight with the same url, params and headers,
+        or call it if there is none
+        """
+        path = urlsplit(url).path
+        key = json.dumps([url, params, headers], sort_keys=True, default=str)
+        with self.lock:
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[key] = InFlight()
+            else:
+                flight.followers += 1
+
+        started = perf_counter()
+        if not leader:
+            flight.done.wait()
+            elapsed = perf_counter() - started
+            with self.lock:
+                stats = self._stats(path)
+                stats[1] += 1
+                stats[4] += elapsed
+            get_metrics().observe("request.coalesced", elapsed)
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+        try:
+            flight.response = fetch()
+            return flight.response
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+                stats = self._stats(path)
+                stats[0] += 1
+                stats[2] += int(flight.followers > 0)
+                stats[3] += perf_counter() - started
+            flight.done.set()
+
+    def report(self) -> list:
+        """
+        Per endpoint: requests made, hits (requests served by one in flight),
+        requests with followers and mean request/wait times, most hits first
+        """
+        with self.lock:
+            rows = [
+                {
+                    "path": path,
+                    "requests": entry[0],
+                    "hits": entry[1],
+                    "coalesced": entry[2],
+                    "mean_ms": round(entry[3] / entry[0] * 1000, 3) if entry[0] else 0,
+                    "mean_wait_ms": round(entry[4] / entry[1] * 1000, 3) if entry[1] else 0,
+                }
+                for path, entry in self.stats.items()
+            ]
+        return sorted(rows, key=lambda r: (r["hits"], r["requests"]), reverse=True)
+
+
+coalescer = Coalescer(
+    exclude=[
+        "/bot/activate",
+        "/paper-trading/activate",
+        "/account/one-click-liquidation",
+        *filter(None, os.getenv("COALESCE_EXCLUDE", "").split(",")),
+    ]
+)
+register_report("coalescing", coalescer.report)
+
+
+def request(method, url, session=None, caller=None, **kwargs) -> requests.Response:
+    """
+    Same as requests.request (or session.request), recording the call in request_stats
+    """
+    caller = caller or current_caller()
+    service = service_name(url)
+    started = perf_counter()
+    try:
+        response = (session or requests).request(method, url=url, **kwargs)
+    except requests.RequestException:
+        elapsed = perf_counter() - started
+        request_stats.record(service, caller, elapsed, error=True)
+        get_metrics().observe(f"request.{service}", elapsed)
+        raise
+
+    elapsed = perf_counter() - started
+    used_weight = response.headers.get("x-mbx-used-weight-1m")
+    request_stats.record(
+        service,
+        caller,
+        elapsed,
+        size=len(response.content),
+        error=response.status_code >= 400,
+        used_weight=int(used_weight) if used_weight else None,
+    )
+    get_metrics().observe(f"request.{service}", elapsed)
+    return response
+
+
+def get(url, params=None, **kwargs) -> requests.Response:
+    if kwargs.get("session") or kwargs.get("stream") or not coalescer.enabled(urlsplit(url).path):
+        return request("GET", url, params=params, **kwargs)
+    return coalescer.get(
+        url,
+        params,
+        kwargs.get("headers"),
+        lambda: request("GET", url, params=params, **kwargs),
+    )
+
+
+def post(url, data=None, json=None, **kwargs) -> requests.Response:
+    return request("POST", url, data=data, json=json, **kwargs)
+
+
+def put(url, data=None, **kwargs) -> requests.Response:
+    return request("PUT", url, data=data, **kwargs)
+
+
+def delete(url, **kwargs) -> requests.Response:
+    return request("DELETE", url, **kwargs)
@@ -0,0 +1,536 @@
+import math
+
+from collections import deque
+
+import numpy
+from scipy.ndimage import minimum_filter1d
+from scipy.signal import lfilter
+
+"""
+Technical indicators computed locally with numpy (no ta-lib)
+
+Each indicator has two APIs that give the same values:
+- batch: function over (time) or (symbols x time) arrays, computed over the last axis,
+for backtests and warm up
+- streaming: class updated with one closed candle at a time in O(1), for live klines
+
+| batch                     | streaming        |
+|---------------------------|------------------|
+| sma                       | SMA              |
+| ema                       | EMA              |
+| macd                      | MACD             |
+| rsi                       | RSI              |
+| bollinger_bands           | BollingerBands   |
+| atr                       | ATR              |
+| rolling_std               | RollingStd       |
+| log_volatility            | LogVolatility    |
+| rolling_min               | RollingMin       |
+| accumulation_distribution | VolumeIndicators |
+| chaikin_oscillator        | VolumeIndicators |
+| on_balance_volume         | VolumeIndicators |
+
+Like ta-lib, values are NaN until there are enough candles: EMA is seeded with the SMA
+of the first `period` values, RSI and ATR with the mean of the first `period` changes/ranges
+then smoothed with Wilder's method. Standard deviations are population (numpy.std) ones.
+Batch inputs must not contain NaN (see backtesting.engine._fill_missing).
+
+See benchmarks/indicators.py for the batch/streaming equality check and the
+comparison with pandas and ta-lib.
+"""
+
+
+def _ema(values, period):
+    """
+    Exponential moving average seeded with the first value (ta-lib ADOSC)
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    if not values.shape[-1]:
+        return values.copy()
+    alpha = 2 / (period + 1)
+    result, _ = lfilter(
+        [alpha], [1, alpha - 1], values, axis=-1, zi=(1 - alpha) * values[..., :1]
+    )
+    return result
+
+
+def _money_flow_volume(high, low, close, volume):
+    high_low = high - low
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        multiplier = numpy.where(
+            high_low > 0, ((close - low) - (high - close)) / high_low, 0.0
+        )
+    return multiplier * volume
+
+
+def accumulation_distribution(high, low, close, volume) -> numpy.ndarray:
+    """
+    Chaikin A/D line: cumulative volume weighted by where the close is in the candle range
+    """
+    arrays = [numpy.asarray(v, dtype=numpy.float64) for v in (high, low, close, volume)]
+    return numpy.cumsum(_money_flow_volume(*arrays), axis=-1)
+
+
+def chaikin_oscillator(high, low, close, volume, fast=3, slow=10) -> numpy.ndarray:
+    """
+    ADOSC: fast EMA - slow EMA of the A/D line
+    """
+    ad = accumulation_distribution(high, low, close, volume)
+    result = _ema(ad, fast) - _ema(ad, slow)
+    result[..., : slow - 1] = numpy.nan
+    return result
+
+
+def on_balance_volume(close, volume) -> numpy.ndarray:
+    """
+    OBV: volume added on up closes and subtracted on down closes
+    """
+    close = numpy.asarray(close, dtype=numpy.float64)
+    volume = numpy.asarray(volume, dtype=numpy.float64)
+    signed = volume.copy()
+    signed[..., 1:] *= numpy.sign(numpy.diff(close, axis=-1))
+    return numpy.cumsum(signed, axis=-1)
+
+
+class VolumeIndicators:
+    """
+    Streaming A/D line, ADOSC(fast, slow) and OBV of one symbol
+    """
+
+    def __init__(self, fast=3, slow=10) -> None:
+        self.fast = fast
+        self.slow = slow
+        self.fast_alpha = 2 / (fast + 1)
+        self.slow_alpha = 2 / (slow + 1)
+        self.count = 0
+        self.ad = 0.0
+        self.fast_ema = 0.0
+        self.slow_ema = 0.0
+        self.obv = 0.0
+        self.previous_close = None
+        self.adosc = math.nan
+        self.previous_adosc = math.nan
+
+    @classmethod
+    def from_candles(cls, high, low, close, volume, fast=3, slow=10) -> "VolumeIndicators":
+        indicators = cls(fast, slow)
+        for row in zip(high, low, close, volume):
+            indicators.update(*row)
+        return indicators
+
+    def update(self, high, low, close, volume):
+        high_low = high - low
+        if high_low > 0:
+            self.ad += ((close - low) - (high - close)) / high_low * volume
+
+        if self.count:
+            self.fast_ema += self.fast_alpha * (self.ad - self.fast_ema)
+            self.slow_ema += self.slow_alpha * (self.ad - self.slow_ema)
+            if close > self.previous_close:
+                self.obv += volume
+            elif close < self.previous_close:
+                self.obv -= volume
+        else:
+            self.fast_ema = self.slow_ema = self.ad
+            self.obv = volume
+
+        self.count += 1
+        self.previous_close = close
+        self.previous_adosc = self.adosc
+        if self.count >= self.slow:
+            self.adosc = self.fast_ema - self.slow_ema
+
+    @property
+    def adosc_diff(self) -> float:
+        """
+        Change of ADOSC since the previous candle, positive when volume is on the up
+        """
+        return self.adosc - self.previous_adosc
+
+
+def _smooth(values, seed, alpha):
+    """
+    seed, then y = y + alpha * (value - y) for each value
+    """
+    result, _ = lfilter([alpha], [1, alpha - 1], values, axis=-1, zi=(1 - alpha) * seed)
+    return result
+
+
+def _window_sums(values, period):
+    """
+    Sum of each window of `period` values, window i ends at value period - 1 + i
+    """
+    cumsum = numpy.cumsum(values, axis=-1)
+    sums = cumsum[..., period - 1 :].copy()
+    sums[..., 1:] -= cumsum[..., :-period]
+    return sums
+
+
+def _empty(values):
+    return numpy.full(values.shape, numpy.nan)
+
+
+def sma(values, period) -> numpy.ndarray:
+    values = numpy.asarray(values, dtype=numpy.float64)
+    result = _empty(values)
+    if values.shape[-1] >= period:
+        # Shift by first value to reduce cancellation errors
+        first = values[..., :1]
+        result[..., period - 1 :] = _window_sums(values - first, period) / period + first
+    return result
+
+
+def ema(values, period) -> numpy.ndarray:
+    values = numpy.asarray(values, dtype=numpy.float64)
+    result = _empty(values)
+    if values.shape[-1] >= period:
+        seed = values[..., :period].mean(axis=-1, keepdims=True)
+        result[..., period - 1 : period] = seed
+        result[..., period:] = _smooth(values[..., period:], seed, 2 / (period + 1))
+    return result
+
+
+def macd(values, fast=12, slow=26, signal=9) -> tuple:
+    """
+    Returns (macd, signal, histogram), macd = EMA(fast) - EMA(slow), signal = EMA(signal) of macd
+    """
+    line = ema(values, fast) - ema(values, slow)
+    signal_line = _empty(line)
+    signal_line[..., slow - 1 :] = ema(line[..., slow - 1 :], signal)
+    return line, signal_line, line - signal_line
+
+
+def rsi(values, period=14) -> numpy.ndarray:
+    """
+    Wilder's RSI
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    result = _empty(values)
+    if values.shape[-1] <= period:
+        return result
+
+    change = numpy.diff(values, axis=-1)
+    gains = numpy.maximum(change, 0)
+    losses = numpy.maximum(-change, 0)
+    average_gain = numpy.empty(change.shape)
+    average_loss = numpy.empty(change.shape)
+    for average, moves in ((average_gain, gains), (average_loss, losses)):
+        seed = moves[..., :period].mean(axis=-1, keepdims=True)
+        average[..., period - 1 : period] = seed
+        average[..., period:] = _smooth(moves[..., period:], seed, 1 / period)
+
+    total = average_gain + average_loss
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        strength = numpy.where(total > 0, 100 * average_gain / total, 0.0)
+    result[..., period:] = strength[..., period - 1 :]
+    return result
+
+
+def rolling_std(values, period, expanding=False) -> numpy.ndarray:
+    """
+    Population standard deviation of the last `period` values,
+    of all values so far while the window fills up if expanding (RollingStd.expanding)
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    result = _empty(values)
+    # Shift by first value to reduce cancellation errors
+    shifted = values - values[..., :1]
+    if values.shape[-1] >= period:
+        mean = _window_sums(shifted, period) / period
+        variance = _window_sums(shifted**2, period) / period - mean**2
+        result[..., period - 1 :] = numpy.sqrt(numpy.maximum(variance, 0))
+    if expanding:
+        head = shifted[..., : period - 1]
+        count = numpy.arange(1, head.shape[-1] + 1)
+        mean = numpy.cumsum(head, axis=-1) / count
+        variance = numpy.cumsum(head**2, axis=-1) / count - mean**2
+        result[..., : head.shape[-1]] = numpy.sqrt(numpy.maximum(variance, 0))
+    return result
+
+
+def bollinger_bands(values, period=20, deviations=2.0) -> tuple:
+    """
+    Returns (upper, middle, lower)
+    """
+    middle = sma(values, period)
+    width = deviations * rolling_std(values, period)
+    return middle + width, middle, middle - width
+
+
+def log_volatility(close, period, expanding=False) -> numpy.ndarray:
+    """
+    Population standard deviation of the last `period` log returns, see rolling_std for expanding
+    """
+    close = numpy.asarray(close, dtype=numpy.float64)
+    result = _empty(close)
+    result[..., 1:] = rolling_std(
+        numpy.log(close[..., 1:] / close[..., :-1]), period, expanding=expanding
+    )
+    return result
+
+
+def rolling_min(values, period, expanding=False) -> numpy.ndarray:
+    """
+    Lowest of the last `period` values,
+    of all values so far while the window fills up if expanding (RollingMin.expanding)
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    result = minimum_filter1d(
+        values, size=period, axis=-1, origin=(period - 1) // 2, mode="nearest"
+    )
+    if expanding:
+        result[..., : period - 1] = numpy.minimum.accumulate(values[..., : period - 1], axis=-1)
+    else:
+        result[..., : period - 1] = numpy.nan
+    return result
+
+
+def true_range(high, low, close) -> numpy.ndarray:
+    """
+    Range including the gap with the previous close, NaN for the first candle
+    """
+    high = numpy.asarray(high, dtype=numpy.float64)
+    low = numpy.asarray(low, dtype=numpy.float64)
+    close = numpy.asarray(close, dtype=numpy.float64)
+    result = _empty(close)
+    previous = close[..., :-1]
+    result[..., 1:] = numpy.maximum(
+        high[..., 1:] - low[..., 1:],
+        numpy.maximum(numpy.abs(high[..., 1:] - previous), numpy.abs(low[..., 1:] - previous)),
+    )
+    return result
+
+
+def atr(high, low, close, period=14) -> numpy.ndarray:
+    """
+    Wilder's average true range
+    """
+    ranges = true_range(high, low, close)
+    result = _empty(ranges)
+    if ranges.shape[-1] > period:
+        seed = ranges[..., 1 : period + 1].mean(axis=-1, keepdims=True)
+        result[..., period : period + 1] = seed
+        result[..., period + 1 :] = _smooth(ranges[..., period + 1 :], seed, 1 / period)
+    return result
+
+
+class SMA:
+    def __init__(self, period) -> None:
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+        self.value = math.nan
+
+    def update(self, value) -> float:
+        self.window.append(value)
+        self.total += value
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+        return self.value
+
+
+class EMA:
+    def __init__(self, period, alpha=None) -> None:
+        self.period = period
+        self.alpha = alpha or 2 / (period + 1)
+        self.count = 0
+        # Sum of the first period values, for the SMA seed
+        self.total = 0.0
+        self.value = math.nan
+
+    def update(self, value) -> float:
+        self.count += 1
+        if self.count < self.period:
+            self.total += value
+        elif self.count == self.period:
+            self.value = (self.total + value) / self.period
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class MACD:
+    def __init__(self, fast=12, slow=26, signal=9) -> None:
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+        self.value = (math.nan, math.nan, math.nan)
+
+    def update(self, value) -> tuple:
+        """
+        Returns (macd, signal, histogram)
+        """
+        line = self.fast.update(value) - self.slow.update(value)
+        if math.isnan(line):
+            return self.value
+        signal = self.signal.update(line)
+        self.value = (line, signal, line - signal)
+        return self.value
+
+
+class RSI:
+    def __init__(self, period=14) -> None:
+        self.period = period
+        self.previous = None
+        self.average_gain = EMA(period, alpha=1 / period)
+        self.average_loss = EMA(period, alpha=1 / period)
+        self.value = math.nan
+
+    def update(self, value) -> float:
+        previous, self.previous = self.previous, value
+        if previous is None:
+            return self.value
+
+        change = value - previous
+        gain = self.average_gain.update(max(change, 0.0))
+        loss = self.average_loss.update(max(-change, 0.0))
+        if not math.isnan(gain):
+            total = gain + loss
+            self.value = 100 * gain / total if total > 0 else 0.0
+        return self.value
+
+
+class RollingStd:
+    """
+    Population standard deviation of the last `period` values,
+    mean and squared deviations are updated in place (Welford) when values enter and leave the window
+    """
+
+    def __init__(self, period) -> None:
+        self.period = period
+        self.window = deque()
+        self.mean = 0.0
+        # Sum of squared deviations from the mean
+        self.m2 = 0.0
+        self.value = math.nan
+
+    def update(self, value) -> float:
+        self.window.append(value)
+        if len(self.window) <= self.period:
+            delta = value - self.mean
+            self.mean += delta / len(self.window)
+            self.m2 += delta * (value - self.mean)
+        else:
+            removed = self.window.popleft()
+            previous_mean = self.mean
+            self.mean += (value - removed) / self.period
+            self.m2 += (value - removed) * (value - self.mean + removed - previous_mean)
+
+        if len(self.window) == self.period:
+            self.value = math.sqrt(max(self.m2, 0.0) / self.period)
+        return self.value
+
+    @property
+    def expanding(self) -> float:
+        """
+        Standard deviation of the values so far while the window fills up, then same as value
+        """
+        if not self.window:
+            return math.nan
+        return math.sqrt(max(self.m2, 0.0) / len(self.window))
+
+
+class BollingerBands:
+    def __init__(self, period=20, deviations=2.0) -> None:
+        self.deviations = deviations
+        self.middle = SMA(period)
+        self.std = RollingStd(period)
+        self.value = (math.nan, math.nan, math.nan)
+
+    def update(self, value) -> tuple:
+        """
+        Returns (upper, middle, lower)
+        """
+        middle = self.middle.update(value)
+        width = self.deviations * self.std.update(value)
+        self.value = (middle + width, middle, middle - width)
+        return self.value
+
+
+class LogVolatility:
+    def __init__(self, period) -> None:
+        self.previous = None
+        self.std = RollingStd(period)
+        self.value = math.nan
+
+    def update(self, close) -> float:
+        previous, self.previous = self.previous, close
+        if previous is not None:
+            self.value = self.std.update(math.log(close / previous))
+        return self.value
+
+
+class ATR:
+    def __init__(self, period=14) -> None:
+        self.previous_close = None
+        self.average = EMA(period, alpha=1 / period)
+        self.value = math.nan
+
+    def update(self, high, low, close) -> float:
+        previous, self.previous_close = self.previous_close, close
+        if previous is not None:
+            self.value = self.average.update(
+                max(high - low, abs(high - previous), abs(low - previous))
+            )
+        return self.value
+
+
+class RollingMin:
+    """
+    Lowest of the last `period` values, with a monotonic deque:
+    candidates are kept in increasing order, values that can't be the minimum anymore are dropped,
+    so each value enters and leaves the deque once
+    """
+
+    def __init__(self, period) -> None:
+        self.period = period
+        self.count = 0
+        # (position, value), values increasing
+        self.candidates = deque()
+        self.value = math.nan
+
+    def update(self, value) -> float:
+        while self.candidates and self.candidates[-1][1] >= value:
+            self.candidates.pop()
+        self.candidates.append((self.count, value))
+        self.count += 1
+        if self.candidates[0][0] <= self.count - 1 - self.period:
+            self.candidates.popleft()
+
+        if self.count >= self.period:
+            self.value = self.candidates[0][1]
+        return self.value
+
+    @property
+    def expanding(self) -> float:
+        """
+        Lowest value so far while the window fills up, then same as value
+        """
+        return self.candidates[0][1] if self.candidates else math.nan
+
+
+class CandleIndicators:
+    """
+    Streaming state of one symbol updated on each closed candle (see ResearchSignals.on_candle_close):
+    volume indicators and rolling close statistics over the last `window` candles
+    """
+
+    def __init__(self, window=500) -> None:
+        self.volume = VolumeIndicators()
+        self.volatility = LogVolatility(window)
+        self.std = RollingStd(window)
+        self.lowest = RollingMin(window)
+
+    @classmethod
+    def from_candles(cls, high, low, close, volume, window=500) -> "CandleIndicators":
+        indicators = cls(window)
+        for row in zip(high.tolist(), low.tolist(), close.tolist(), volume.tolist()):
+            indicators.update(*row)
+        return indicators
+
+    def update(self, high, low, close, volume):
+        self.volume.update(high, low, close, volume)
+        self.volatility.update(close)
+        self.std.update(close)
+        self.lowest.update(close)
@@ -0,0 +1,131 @@
+import logging
+
+from apis import BinanceApi
+from candles import CandleStore, next_open_time
+from clock import get_clock
+from metrics import get_metrics
+
+"""
+Incremental kline sync
+
+Catches up the local candle store (candles.py) with the REST klines endpoint,
+requesting only candles newer than the last stored one (startTime) instead of
+the latest 500 again. After a short disconnection this costs one request for a few candles.
+
+Synced candles go through CandleStore.extend, so listeners (e.g. streaming indicators)
+see them in order, as if they had come from the websocket.
+"""
+
+
+class KlineSync:
+    def __init__(self, candles: CandleStore, api=None, clock=None, limit=1000) -> None:
+        """
+        Args:
+        - candles: store to merge candles into, the last stored open time of each symbol
+        (and its interval) is where the next sync starts
+        - api: BinanceApi (or subclass) used for _get_raw_klines
+        - clock: see clock.py, used to skip the kline still open
+        - limit: candles per request, max 1000 (same weight as 500)
+        """
+        self.candles = candles
+        self.api = api or BinanceApi()
+        self.clock = clock or get_clock()
+        self.limit = limit
+        self.metrics = get_metrics()
+        # Missing candles found in the exchange data, by symbol
+        self.gaps = {}
+
+    def _fetch(self, symbol, interval, limit, start_time=None, end_time=None) -> list:
+        with self.metrics.span("kline_sync"):
+            rows = self.api._get_raw_klines(
+                symbol, limit=limit, interval=interval, start_time=start_time, end_time=end_time
+            )
+        # Close time in the future: still open
+        now = self.clock.time() * 1000
+        return [row for row in rows if row[6] < now]
+
+    def _check_continuity(self, symbol, interval, previous, rows):
+        """
+        Log (and count in gaps) candles missing between previous open time and rows
+        """
+        for row in rows:
+            if previous is not None:
+                expected = next_open_time(previous, interval)
+                if row[0] != expected:
+                    self.gaps[symbol] = self.gaps.get(symbol, 0) + 1
+                    logging.warning(
+                        f"Kline gap in {symbol} {interval}: expected {expected}, got {row[0]}"
+                    )
+            previous = row[0]
+
+    def sync(self, symbol, interval, end_time=None) -> int:
+        """
+        Fetch and store closed candles of symbol newer than the last stored one
+
+        Symbols without candles (or stored with a different interval) get the latest
+        candles that fit in the store. So do symbols that are too far behind,
+        older candles would be dropped anyway.
+
+        Args:
+        - end_time: ms, only candles opened before, e.g. the websocket kline that revealed the gap
+
+        Returns the number of new candles
+        """
+        stored = self.candles.get(symbol)
+        last = None
+        if stored is not None and stored.interval == interval:
+            last = stored.last_open_time
+
+        if last is not None:
+            start_time = next_open_time(last, interval)
+            now = end_time if end_time is not None else self.clock.time() * 1000
+            step = next_open_time(start_time, interval) - start_time
+            if (now - start_time) // step >= self.candles.size:
+                logging.warning(f"{symbol} {interval} candles too old to catch up, replacing them")
+                self.candles.evict(symbol)
+                last = None
+
+        if last is None:
+            rows = self._fetch(
+                symbol, interval, min(self.candles.size, 1000), end_time=end_time
+            )
+            self._check_continuity(symbol, interval, None, rows)
+            return self.candles.extend(symbol, interval, rows)
+
+        added = 0
+        while True:
+            rows = self._fetch(symbol, interval, self.limit, start_time, end_time)
+            self._check_continuity(symbol, interval, last, rows)
+            added += self.candles.extend(symbol, interval, rows)
+            if len(rows) < self.limit:
+                break
+            last = rows[-1][0]
+            start_time = next_open_time(last, interval)
+        return added
+
+    def catch_up(self, kline: dict) -> int:
+        """
+        Before storing a closed websocket kline (the "k" object), sync the candles
+        missed since the last stored one, e.g. during a reconnection
+
+        Returns the number of candles fetched
+        """
+        if not kline.get("x"):
+            return 0
+
+        stored = self.candles.get(kline["s"])
+        if stored is None or stored.interval != kline["i"] or not len(stored):
+            return 0
+        if kline["t"] <= next_open_time(stored.last_open_time, kline["i"]):
+            return 0
+
+        try:
+            added = self.sync(kline["s"], kline["i"], end_time=kline["t"] - 1)
+        except Exception as error:
+            logging.error(f"Kline sync failed for {kline['s']}: {error}")
+            return 0
+        logging.info(f"Synced {added} {kline['i']} candles of {kline['s']}")
+        return added
+
+    def evict(self, symbol):
+        self.gaps.pop(symbol, None)
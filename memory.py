@@ -0,0 +1,111 @@
+import gc
+import logging
+import os
+import resource
+import signal
+import threading
+import tracemalloc
+
+from collections import Counter
+
+from metrics import register_report
+
+"""
+Memory snapshots: RSS, threads and top allocators (tracemalloc)
+
+On demand in production:
+- /memory on the metrics server (METRICS_PORT, see metrics.py)
+- kill -USR2 <pid> logs a snapshot
+- TRACEMALLOC_FRAMES=N traces allocations from start (N frames per traceback),
+needed for allocators. Tracing has a noticeable CPU and memory cost, only enable when hunting leaks.
+
+Allocator growth is reported against the first snapshot taken after tracing started.
+See benchmarks/soak.py for the long run leak benchmark.
+"""
+
+_baseline = None
+_baseline_lock = threading.Lock()
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # Peak, not current, where /proc is not available
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def start_tracemalloc(frames=1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def _statistics(stats, top) -> list:
+    return [
+        {
+            "location": str(stat.traceback[0]) if stat.traceback else "?",
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+            **(
+                {"size_diff_kb": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff}
+                if hasattr(stat, "size_diff")
+                else {}
+            ),
+        }
+        for stat in stats[:top]
+    ]
+
+
+def memory_snapshot(top=10) -> dict:
+    """
+    RSS, thread count (by name prefix), gc objects and, if tracing, top allocators
+    and top growth since the first snapshot
+    """
+    global _baseline
+    threads = threading.enumerate()
+    snapshot = {
+        "rss_mb": rss_mb(),
+        "threads": len(threads),
+        "thread_names": dict(
+            Counter(t.name.rstrip("0123456789_-") for t in threads).most_common()
+        ),
+        "gc_objects": len(gc.get_objects()),
+    }
+
+    if tracemalloc.is_tracing():
+        current = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        with _baseline_lock:
+            if _baseline is None:
+                _baseline = current
+        traced, peak = tracemalloc.get_traced_memory()
+        snapshot["traced_mb"] = round(traced / 1024 / 1024, 1)
+        snapshot["traced_peak_mb"] = round(peak / 1024 / 1024, 1)
+        snapshot["top_allocators"] = _statistics(current.statistics("lineno"), top)
+        snapshot["top_growth"] = _statistics(current.compare_to(_baseline, "lineno"), top)
+
+    return snapshot
+
+
+def install_memory_report():
+    """
+    Serve snapshots at /memory, log them on SIGUSR2 and start tracing if TRACEMALLOC_FRAMES is set.
+    Must be called from the main thread
+    """
+    frames = os.getenv("TRACEMALLOC_FRAMES")
+    if frames:
+        start_tracemalloc(int(frames))
+        # First snapshot is the baseline for growth
+        memory_snapshot()
+
+    register_report("memory", memory_snapshot)
+    if hasattr(signal, "SIGUSR2"):
+        signal.signal(
+            signal.SIGUSR2,
+            lambda signum, frame: logging.info(f"Memory snapshot: {memory_snapshot()}"),
+        )
@@ -0,0 +1,246 @@
+import json
+import logging
+import math
+import os
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic, perf_counter, sleep
+
+"""
+Latency spans and rolling histograms
+
+Usage:
+with get_metrics().span("candlestick"):
+    ...
+
+Durations go into log-scale buckets (~12% wide, 1µs to ~10min) of the current time slice.
+Only the last `slots` slices are kept, so percentiles cover a rolling window (default 10 min).
+Recording a span is a couple of perf_counter calls and a lock, cheap enough to stay on in production.
+
+Exposed with environment variables (see start_metrics):
+- METRICS_PORT: JSON at http://localhost:<port>/metrics (and registered reports, e.g. /requests)
+- METRICS_LOG_INTERVAL: log all histograms every N seconds
+"""
+
+MIN_SECONDS = 1e-6
+BUCKET_GROWTH = 1.12
+BUCKETS = 180
+_log_growth = math.log(BUCKET_GROWTH)
+
+
+def bucket_index(seconds) -> int:
+    if seconds <= MIN_SECONDS:
+        return 0
+    return min(int(math.log(seconds / MIN_SECONDS) / _log_growth) + 1, BUCKETS - 1)
+
+
+def bucket_upper(index) -> float:
+    """
+    Upper bound (seconds) of bucket, used as its value for percentiles
+    """
+    return MIN_SECONDS * BUCKET_GROWTH**index
+
+
+class RollingHistogram:
+    def __init__(self, slot_seconds=60, slots=10) -> None:
+        self.slot_seconds = slot_seconds
+        self.slots = slots
+        self.lock = threading.Lock()
+        # ring of slots: [slot id, bucket counts, count, sum, max]
+        self.ring = [[None, [0] * BUCKETS, 0, 0.0, 0.0] for _ in range(slots)]
+
+    def _slot(self, now):
+        slot_id = int(now // self.slot_seconds)
+        slot = self.ring[slot_id % self.slots]
+        if slot[0] != slot_id:
+            slot[0] = slot_id
+            slot[1] = [0] * BUCKETS
+            slot[2] = 0
+            slot[3] = 0.0
+            slot[4] = 0.0
+        return slot
+
+    def observe(self, seconds, now=None):
+        if now is None:
+            now = monotonic()
+        with self.lock:
+            slot = self._slot(now)
+            slot[1][bucket_index(seconds)] += 1
+            slot[2] += 1
+            slot[3] += seconds
+            if seconds > slot[4]:
+                slot[4] = seconds
+
+    def summary(self, now=None) -> dict:
+        """
+        Count, rate and percentiles (ms) of the rolling window
+        """
+        if now is None:
+            now = monotonic()
+        oldest = int(now // self.slot_seconds) - self.slots + 1
+        counts = [0] * BUCKETS
+        count = 0
+        total = 0.0
+        maximum = 0.0
+        with self.lock:
+            for slot_id, buckets, slot_count, slot_sum, slot_max in self.ring:
+                if slot_id is None or slot_id < oldest:
+                    continue
+                for i, c in enumerate(buckets):
+                    if c:
+                        counts[i] += c
+                count += slot_count
+                total += slot_sum
+                maximum = max(maximum, slot_max)
+
+        summary = {"count": count}
+        if not count:
+            return summary
+
+        window = self.slot_seconds * self.slots
+        summary["per_second"] = round(count / window, 3)
+        summary["mean_ms"] = round(total / count * 1000, 3)
+        for p in (50, 90, 99):
+            rank = math.ceil(count * p / 100)
+            seen = 0
+            for i, c in enumerate(counts):
+                seen += c
+                if seen >= rank:
+                    # Bucket bound can't be above the actual max
+                    summary[f"p{p}_ms"] = round(min(bucket_upper(i), maximum) * 1000, 3)
+                    break
+        summary["max_ms"] = round(maximum * 1000, 3)
+        return summary
+
+
+class Span:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: RollingHistogram) -> None:
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    """
+    Named rolling histograms, created on first use
+    """
+
+    def __init__(self, slot_seconds=60, slots=10) -> None:
+        self.slot_seconds = slot_seconds
+        self.slots = slots
+        self.lock = threading.Lock()
+        self.histograms: dict[str, RollingHistogram] = {}
+
+    def histogram(self, name) -> RollingHistogram:
+        histogram = self.histograms.get(name)
+        if not histogram:
+            with self.lock:
+                histogram = self.histograms.setdefault(
+                    name, RollingHistogram(self.slot_seconds, self.slots)
+                )
+        return histogram
+
+    def span(self, name) -> Span:
+        """
+        Context manager that records the duration of its block
+        """
+        return Span(self.histogram(name))
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    def snapshot(self) -> dict:
+        now = monotonic()
+        return {
+            name: histogram.summary(now)
+            for name, histogram in sorted(self.histograms.items())
+        }
+
+    def log(self):
+        for name, summary in self.snapshot().items():
+            if summary["count"]:
+                logging.info(f"Metrics {name}: {summary}")
+
+
+# Other reports served at /<name> and logged with the metrics, see register_report
+_reports = {}
+
+
+def register_report(name, report):
+    """
+    Serve report() as JSON at /<name> on the metrics server
+    """
+    _reports[name] = report
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    metrics: Metrics = None
+
+    def do_GET(self):
+        path = self.path.strip("/")
+        if path == "metrics":
+            report = self.metrics.snapshot()
+        elif path in _reports:
+            report = _reports[path]()
+        else:
+            self.send_error(404)
+            return
+        body = json.dumps(report).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(metrics: Metrics, port: int, host="127.0.0.1") -> ThreadingHTTPServer:
+    handler = type("Handler", (MetricsHandler,), {"metrics": metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    logging.info(f"Metrics available at http://{host}:{port}/metrics")
+    return server
+
+
+def log_metrics(metrics: Metrics, interval: float):
+    def run():
+        while True:
+            sleep(interval)
+            metrics.log()
+            for name, report in _reports.items():
+                logging.info(f"Report {name}: {report()}")
+
+    threading.Thread(target=run, name="metrics-log", daemon=True).start()
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def start_metrics():
+    """
+    Start exporters enabled by METRICS_PORT and METRICS_LOG_INTERVAL
+    """
+    port = os.getenv("METRICS_PORT")
+    if port:
+        serve_metrics(_metrics, int(port), os.getenv("METRICS_HOST", "127.0.0.1"))
+
+    interval = os.getenv("METRICS_LOG_INTERVAL")
+    if interval:
+        log_metrics(_metrics, float(interval))
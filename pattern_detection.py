@@ -1,11 +1,33 @@
-# import talib
-# import numpy
+import numpy
+import indicators
 
+"""
+Candlestick pattern recognition, vectorized with numpy (no ta-lib, which does not compile in the docker image)
 
-# patterns don't really work so decomissioned
+Same pattern names and output convention as ta-lib CDL* functions:
++100 bullish, -100 bearish, 0 no pattern (hikkake confirmations are +200/-200).
+Candle sizes are compared with averages of the previous candles, like ta-lib candle settings:
+- long/short body: real body above/below the average real body of the last 10 candles
+- doji: real body under 10% of the average range (high - low) of the last 10 candles
+- very short shadow: under 10% of the average range of the last 10 candles
+- near/far/equal: 20%/60%/5% of the average range of the last 5 candles
 
-# Detecting the shape of two or three candles does not determine the entire trend
-# ta-lib does not compile when installed in the dockerfile
+Body, range and shadows are computed once for all patterns. Inputs can be 1-D (time)
+or 2-D (symbols x time), patterns are computed over the last axis:
+
+detect_patterns(open, high, low, close, last=3)
+
+With last=N (streaming, e.g. on every closed candle) only the last N bars are evaluated,
+using the LOOKBACK candles before them for the averages.
+
+Detecting the shape of two or three candles does not determine the entire trend,
+use them as confirmations.
+"""
+
+AVERAGE_PERIOD = 10
+NEAR_PERIOD = 5
+# Candles needed before an evaluated bar: averages of the first candle of 5 candle patterns
+LOOKBACK = AVERAGE_PERIOD + 5 + 3
 
 # Except morning star and engulfing - these are pattern confirmations
 patterns = {
@@ -56,7 +78,7 @@ patterns = {
     "CDLUNIQUE3RIVER": "Unique 3 River",
     "CDLUPSIDEGAP2CROWS": "Upside Gap Two Crows",
     "CDLXSIDEGAP3METHODS": "Upside/Downside Gap Three Methods",
-    "CDLTAKURI": "Takuri (Dragonfly Doji with very long lower shadow)", 
+    "CDLTAKURI": "Takuri (Dragonfly Doji with very long lower shadow)",
 }
 
 test_patterns = {
@@ -93,130 +115,921 @@ test_patterns = {
     "CDLUPSIDEGAP2CROWS": "Upside Gap Two Crows",
 }
 
+reversal_patterns = {
+    "CDLSHORTLINE": "Short Line Candle",
+    "CDLLONGLINE": "Long Line Candle",
+    "CDLDOJI": "Doji",
+    "CDLDOJISTAR": "Doji Star",
+    "CDLDRAGONFLYDOJI": "Dragonfly Doji",
+    "CDLEVENINGDOJISTAR": "Evening Doji Star",
+    "CDLHAMMER": "Hammer",
+    "CDLINVERTEDHAMMER": "Inverted Hammer",
+    "CDLSEPARATINGLINES": "Separating Lines",
+    "CDLMATCHINGLOW": "Matching Low",
+    "CDLSPINNINGTOP": "Spinning Top",
+    "CDLHIGHWAVE": "High-Wave Candle",
+    "CDLRICKSHAWMAN": "Rickshaw Man",
+    "CDLLONGLEGGEDDOJI": "Long Legged Doji",
+    "CDL3OUTSIDE": "Three Outside Up/Down",
+    "CDLSTICKSANDWICH": "Stick Sandwich",
+}
 
-def reversal_signals(data):
+bearish_patterns = {
+    "CDLHARAMI": "Harami Pattern",
+    "CDLHARAMICROSS": "Harami Cross Pattern",
+    "CDLHIKKAKE": "Hikkake Pattern",
+    "CDLBELTHOLD": "Belt-hold",
+    "CDLEVENINGSTAR": "Evening Star", # Possibly down reversal confirmation
+    "CDLGRAVESTONEDOJI": "Gravestone Doji",
+    "CDLTAKURI": "Takuri (Dragonfly Doji with very long lower shadow)",
+}
+
+
+def _lag(values, periods, fill=numpy.nan):
     """
-    Reversal signals that still require confirmation
+    Value `periods` candles before, along the time (last) axis
     """
-    reversal_patterns = {
-        "CDLSHORTLINE": "Short Line Candle",
-        "CDLLONGLINE": "Long Line Candle",
-        "CDLDOJI": "Doji",
-        "CDLDOJISTAR": "Doji Star",
-        "CDLDRAGONFLYDOJI": "Dragonfly Doji",
-        "CDLEVENINGDOJISTAR": "Evening Doji Star",
-        "CDLHAMMER": "Hammer",
-        "CDLINVERTEDHAMMER": "Inverted Hammer",
-        "CDLSEPARATINGLINES": "Separating Lines",
-        "CDLMATCHINGLOW": "Matching Low",
-        "CDLSPINNINGTOP": "Spinning Top",
-        "CDLHIGHWAVE": "High-Wave Candle",
-        "CDLRICKSHAWMAN": "Rickshaw Man",
-        "CDLLONGLEGGEDDOJI": "Long Legged Doji",
-        "CDL3OUTSIDE": "Three Outside Up/Down",
-        "CDLSTICKSANDWICH": "Stick Sandwich",
-    }
-
-    open = numpy.asarray(data["open"], dtype='f8')
-    high = numpy.asarray(data["high"], dtype='f8')
-    low = numpy.asarray(data["low"], dtype='f8')
-    close = numpy.asarray(data["close"], dtype='f8')
-
-    detected_patterns = []
-
-    for pattern in reversal_patterns:
-        pattern_function = getattr(talib, pattern)
-        results = pattern_function(open, high, low, close)
-        if results[len(results) - 1] > 0:
-            detected_patterns.append(reversal_patterns[pattern])
-    
-    return detected_patterns
+    if not periods:
+        return values
+    result = numpy.full(values.shape, fill, dtype=values.dtype)
+    result[..., periods:] = values[..., :-periods]
+    return result
 
-def reversal_confirmation(data):
-    # Detect morning star pattern (price reversal)
-    open = numpy.asarray(data["open"], dtype='f8')
-    high = numpy.asarray(data["high"], dtype='f8')
-    low = numpy.asarray(data["low"], dtype='f8')
-    close = numpy.asarray(data["close"], dtype='f8')
 
-    morning_doji_star = talib.CDLMORNINGDOJISTAR(open=open, high=high, low=low, close=close)
-    mds_check = bool(numpy.any(morning_doji_star[-3:]))
+def _trailing_mean(values, period):
+    """
+    Mean of the `period` values before each one (current excluded, as ta-lib), NaN candles skipped
+    """
+    valid = ~numpy.isnan(values)
+    shape = values.shape[:-1] + (values.shape[-1] + 1,)
+    sums = numpy.zeros(shape)
+    counts = numpy.zeros(shape)
+    numpy.cumsum(numpy.where(valid, values, 0), axis=-1, out=sums[..., 1:])
+    numpy.cumsum(valid, axis=-1, out=counts[..., 1:])
+    result = numpy.full(values.shape, numpy.nan)
+    total = sums[..., period:-1] - sums[..., : -period - 1]
+    count = counts[..., period:-1] - counts[..., : -period - 1]
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        result[..., period:] = numpy.where(count > 0, total / count, numpy.nan)
+    return result
+
+
+class CandleFeatures:
+    """
+    Body, range, shadows and the averages patterns compare them to, for all candles at once
+    """
+
+    def __init__(self, open, high, low, close) -> None:
+        self.open = numpy.asarray(open, dtype=numpy.float64)
+        self.high = numpy.asarray(high, dtype=numpy.float64)
+        self.low = numpy.asarray(low, dtype=numpy.float64)
+        self.close = numpy.asarray(close, dtype=numpy.float64)
+
+        self.top = numpy.maximum(self.open, self.close)
+        self.bottom = numpy.minimum(self.open, self.close)
+        self.body = self.top - self.bottom
+        self.range = self.high - self.low
+        self.upper = self.high - self.top
+        self.lower = self.bottom - self.low
+        # White (1) if close >= open, black (-1), NaN if there is no candle
+        self.color = numpy.where(self.close >= self.open, 1.0, -1.0)
+        self.color[numpy.isnan(self.close)] = numpy.nan
+
+        range_average = _trailing_mean(self.range, AVERAGE_PERIOD)
+        range_near = _trailing_mean(self.range, NEAR_PERIOD)
+        self.body_average = _trailing_mean(self.body, AVERAGE_PERIOD)
+        self.body_doji = 0.1 * range_average
+        self.shadow_very_short = 0.1 * range_average
+        self.shadow_short = _trailing_mean(self.upper + self.lower, AVERAGE_PERIOD) / 2
+        self.near = 0.2 * range_near
+        self.far = 0.6 * range_near
+        self.equal = 0.05 * range_near
+
+        self._bars = {}
+
+    def bar(self, periods) -> "Bar":
+        """
+        Features of the candle `periods` candles before each one
+        """
+        bar = self._bars.get(periods)
+        if bar is None:
+            bar = self._bars[periods] = Bar(self, periods)
+        return bar
+
+
+class Bar:
+    """
+    Lagged view of CandleFeatures, arrays are shifted on first access
+    """
+
+    def __init__(self, features: CandleFeatures, periods) -> None:
+        self.features = features
+        self.periods = periods
+
+    def __getattr__(self, name):
+        value = _lag(getattr(self.features, name), self.periods)
+        setattr(self, name, value)
+        return value
+
+    @property
+    def white(self):
+        return self.color == 1
+
+    @property
+    def black(self):
+        return self.color == -1
+
+    @property
+    def long(self):
+        return self.body > self.body_average
+
+    @property
+    def short(self):
+        return self.body < self.body_average
+
+    @property
+    def doji(self):
+        return self.body <= self.body_doji
+
+    @property
+    def marubozu(self):
+        return (
+            self.long
+            & (self.upper < self.shadow_very_short)
+            & (self.lower < self.shadow_very_short)
+        )
+
+
+def _signal(bullish, bearish=None):
+    """
+    +100 where bullish, -100 where bearish, either can be None
+    """
+    result = numpy.where(bullish, 100, 0) if bullish is not None else 0
+    if bearish is not None:
+        result = numpy.where(bearish, -100, result)
+    return numpy.asarray(result, dtype=numpy.int32)
+
+
+def _colored(condition, color):
+    """
+    +100 where condition and white candle, -100 where condition and black candle
+    """
+    return _signal(condition & (color == 1), condition & (color == -1))
+
+
+# One candle
+
+
+def _cdl_doji(x):
+    return _signal(x.bar(0).doji)
+
+
+def _cdl_dragonflydoji(x):
+    b = x.bar(0)
+    return _signal(
+        b.doji & (b.upper < b.shadow_very_short) & (b.lower > b.shadow_very_short)
+    )
+
+
+def _cdl_gravestonedoji(x):
+    b = x.bar(0)
+    return _signal(
+        b.doji & (b.lower < b.shadow_very_short) & (b.upper > b.shadow_very_short)
+    )
+
+
+def _cdl_longleggeddoji(x):
+    b = x.bar(0)
+    return _signal(b.doji & ((b.lower > b.body) | (b.upper > b.body)))
+
+
+def _cdl_rickshawman(x):
+    b = x.bar(0)
+    middle = b.low + b.range / 2
+    return _signal(
+        b.doji
+        & (b.lower > b.body)
+        & (b.upper > b.body)
+        & (b.bottom <= middle + b.near)
+        & (b.top >= middle - b.near)
+    )
+
+
+def _cdl_spinningtop(x):
+    b = x.bar(0)
+    return _colored(b.short & (b.upper > b.body) & (b.lower > b.body), b.color)
+
+
+def _cdl_highwave(x):
+    b = x.bar(0)
+    return _colored(
+        b.short & (b.upper > 2 * b.body) & (b.lower > 2 * b.body), b.color
+    )
+
+
+def _cdl_marubozu(x):
+    b = x.bar(0)
+    return _colored(b.marubozu, b.color)
+
+
+def _cdl_closingmarubozu(x):
+    b = x.bar(0)
+    closing_shadow = numpy.where(b.white, b.upper, b.lower)
+    return _colored(b.long & (closing_shadow < b.shadow_very_short), b.color)
+
+
+def _cdl_belthold(x):
+    b = x.bar(0)
+    opening_shadow = numpy.where(b.white, b.lower, b.upper)
+    return _colored(b.long & (opening_shadow < b.shadow_very_short), b.color)
+
+
+def _cdl_longline(x):
+    b = x.bar(0)
+    return _colored(
+        b.long & (b.upper < b.shadow_short) & (b.lower < b.shadow_short), b.color
+    )
+
+
+def _cdl_shortline(x):
+    b = x.bar(0)
+    return _colored(
+        b.short & (b.upper < b.shadow_short) & (b.lower < b.shadow_short), b.color
+    )
+
+
+def _hammer_shape(b):
+    return b.short & (b.lower > b.body) & (b.upper < b.shadow_very_short)
+
+
+def _inverted_hammer_shape(b):
+    return b.short & (b.upper > b.body) & (b.lower < b.shadow_very_short)
+
+
+def _cdl_hammer(x):
+    a, b = x.bar(1), x.bar(0)
+    # Body below or near the previous low
+    return _signal(_hammer_shape(b) & (b.bottom <= a.low + a.near))
+
+
+def _cdl_hangingman(x):
+    a, b = x.bar(1), x.bar(0)
+    # Body above or near the previous high
+    return _signal(None, _hammer_shape(b) & (b.bottom >= a.high - a.near))
+
+
+def _cdl_invertedhammer(x):
+    a, b = x.bar(1), x.bar(0)
+    return _signal(_inverted_hammer_shape(b) & (b.top < a.bottom))
+
+
+def _cdl_shootingstar(x):
+    a, b = x.bar(1), x.bar(0)
+    return _signal(None, _inverted_hammer_shape(b) & (b.bottom > a.top))
+
+
+def _cdl_takuri(x):
+    b = x.bar(0)
+    return _signal(
+        b.doji & (b.upper < b.shadow_very_short) & (b.lower > 2 * b.body)
+    )
+
+
+# Two candles
+
+
+def _cdl_engulfing(x):
+    a, b = x.bar(1), x.bar(0)
+    bullish = (
+        b.white & a.black & (b.close >= a.open) & (b.open <= a.close)
+        & ((b.close > a.open) | (b.open < a.close))
+    )
+    bearish = (
+        b.black & a.white & (b.open >= a.close) & (b.close <= a.open)
+        & ((b.open > a.close) | (b.close < a.open))
+    )
+    return _signal(bullish, bearish)
+
+
+def _inside_body(a, b):
+    # Body of b within body of a
+    return (b.top < a.top) & (b.bottom > a.bottom)
+
+
+def _cdl_harami(x):
+    a, b = x.bar(1), x.bar(0)
+    return _colored(a.long & b.short & _inside_body(a, b), -a.color)
+
+
+def _cdl_haramicross(x):
+    a, b = x.bar(1), x.bar(0)
+    return _colored(a.long & b.doji & _inside_body(a, b), -a.color)
+
+
+def _cdl_dojistar(x):
+    a, b = x.bar(1), x.bar(0)
+    return _signal(
+        a.long & a.black & b.doji & (b.top < a.bottom),
+        a.long & a.white & b.doji & (b.bottom > a.top),
+    )
+
+
+def _cdl_piercing(x):
+    a, b = x.bar(1), x.bar(0)
+    return _signal(
+        a.long & a.black & b.long & b.white
+        & (b.open < a.low) & (b.close > a.close + a.body * 0.5) & (b.close < a.open)
+    )
+
+
+def _cdl_darkcloudcover(x):
+    a, b = x.bar(1), x.bar(0)
+    return _signal(
+        None,
+        a.long & a.white & b.black
+        & (b.open > a.high) & (b.close > a.open) & (b.close < a.close - a.body * 0.5),
+    )
+
+
+def _cdl_kicking(x):
+    a, b = x.bar(1), x.bar(0)
+    kick = a.marubozu & b.marubozu
+    return _signal(
+        kick & a.black & b.white & (b.low > a.high),
+        kick & a.white & b.black & (b.high < a.low),
+    )
+
 
-    morning_star_detection = talib.CDLMORNINGSTAR(open=open, high=high, low=low, close=close)
-    ms_check = bool(numpy.any(morning_star_detection[-3:]))
+def _cdl_kickingbylength(x):
+    a, b = x.bar(1), x.bar(0)
+    kick = a.marubozu & b.marubozu & (
+        (a.black & b.white & (b.low > a.high)) | (a.white & b.black & (b.high < a.low))
+    )
+    return _colored(kick, numpy.where(b.body > a.body, b.color, a.color))
 
-    # Reversal confirmation
-    engulfing_detection = talib.CDLENGULFING(open=open, high=high, low=low, close=close)
-    e_check = bool(numpy.any(engulfing_detection[-3:]))
 
-    return (ms_check) and e_check
+def _cdl_matchinglow(x):
+    a, b = x.bar(1), x.bar(0)
+    return _signal(a.black & b.black & (numpy.abs(b.close - a.close) <= a.equal))
+
+
+def _cdl_homingpigeon(x):
+    a, b = x.bar(1), x.bar(0)
+    return _signal(a.long & a.black & b.short & b.black & _inside_body(a, b))
+
+
+def _neck(a, b):
+    # White candle opening under the low of a long black candle
+    return a.long & a.black & b.white & (b.open < a.low)
+
+
+def _cdl_inneck(x):
+    a, b = x.bar(1), x.bar(0)
+    return _signal(
+        None, _neck(a, b) & (b.close <= a.close + a.equal) & (b.close >= a.close)
+    )
+
+
+def _cdl_onneck(x):
+    a, b = x.bar(1), x.bar(0)
+    return _signal(None, _neck(a, b) & (numpy.abs(b.close - a.low) <= a.equal))
+
+
+def _cdl_thrusting(x):
+    a, b = x.bar(1), x.bar(0)
+    return _signal(
+        None,
+        _neck(a, b) & (b.close > a.close + a.equal) & (b.close <= a.close + a.body * 0.5),
+    )
+
+
+def _cdl_separatinglines(x):
+    a, b = x.bar(1), x.bar(0)
+    opening_shadow = numpy.where(b.white, b.lower, b.upper)
+    return _colored(
+        (a.color == -b.color)
+        & (numpy.abs(b.open - a.open) <= a.equal)
+        & b.long
+        & (opening_shadow < b.shadow_very_short),
+        b.color,
+    )
+
+
+def _cdl_counterattack(x):
+    a, b = x.bar(1), x.bar(0)
+    return _colored(
+        (a.color == -b.color) & a.long & b.long & (numpy.abs(b.close - a.close) <= a.equal),
+        b.color,
+    )
+
+
+# Three candles
+
+
+def _star(x, middle_doji):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    middle = s.doji if middle_doji else s.short
+    penetration = 0.3
+    morning = (
+        a.long & a.black & middle & (s.top < a.bottom)
+        & b.white & (b.body > b.body_average) & (b.close > a.close + a.body * penetration)
+    )
+    evening = (
+        a.long & a.white & middle & (s.bottom > a.top)
+        & b.black & (b.body > b.body_average) & (b.close < a.close - a.body * penetration)
+    )
+    return morning, evening
+
+
+def _cdl_morningstar(x):
+    return _signal(_star(x, False)[0])
+
+
+def _cdl_eveningstar(x):
+    return _signal(None, _star(x, False)[1])
+
+
+def _cdl_morningdojistar(x):
+    return _signal(_star(x, True)[0])
+
+
+def _cdl_eveningdojistar(x):
+    return _signal(None, _star(x, True)[1])
+
+
+def _cdl_abandonedbaby(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    penetration = 0.3
+    return _signal(
+        a.long & a.black & s.doji & (s.high < a.low)
+        & b.white & (b.low > s.high) & (b.close > a.close + a.body * penetration),
+        a.long & a.white & s.doji & (s.low > a.high)
+        & b.black & (b.high < s.low) & (b.close < a.close - a.body * penetration),
+    )
+
+
+def _cdl_3blackcrows(x):
+    w, a, s, b = x.bar(3), x.bar(2), x.bar(1), x.bar(0)
+    crows = a.black & s.black & b.black
+    short_shadows = (
+        (a.lower < a.shadow_very_short)
+        & (s.lower < s.shadow_very_short)
+        & (b.lower < b.shadow_very_short)
+    )
+    # Each opens within the previous body and closes lower
+    opens = (s.open < a.open) & (s.open > a.close) & (b.open < s.open) & (b.open > s.close)
+    return _signal(
+        None,
+        w.white & crows & short_shadows & opens
+        & (w.high > a.close) & (a.close > s.close) & (s.close > b.close),
+    )
+
+
+def _cdl_3whitesoldiers(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    soldiers = a.white & s.white & b.white
+    short_shadows = (
+        (a.upper < a.shadow_very_short)
+        & (s.upper < s.shadow_very_short)
+        & (b.upper < b.shadow_very_short)
+    )
+    opens = (
+        (s.open > a.open) & (s.open <= a.close + a.near)
+        & (b.open > s.open) & (b.open <= s.close + s.near)
+    )
+    # Not short and not far smaller than the previous one
+    sizes = (
+        (a.body > a.body_average) & (s.body > s.body_average) & (b.body > b.body_average)
+        & (s.body > a.body - a.far) & (b.body > s.body - s.far)
+    )
+    return _signal(
+        soldiers & short_shadows & opens & sizes & (s.close > a.close) & (b.close > s.close)
+    )
+
+
+def _cdl_identical3crows(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    return _signal(
+        None,
+        a.black & s.black & b.black
+        & (a.lower < a.shadow_very_short)
+        & (s.lower < s.shadow_very_short)
+        & (b.lower < b.shadow_very_short)
+        & (numpy.abs(s.open - a.close) <= a.equal)
+        & (numpy.abs(b.open - s.close) <= s.equal)
+        & (a.close > s.close) & (s.close > b.close),
+    )
+
+
+def _cdl_3inside(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    harami = a.long & s.short & _inside_body(a, s)
+    return _signal(
+        harami & a.black & b.white & (b.close > a.open),
+        harami & a.white & b.black & (b.close < a.open),
+    )
+
+
+def _cdl_3outside(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    return _signal(
+        a.black & s.white & (s.close > a.open) & (s.open < a.close) & (b.close > s.close),
+        a.white & s.black & (s.open > a.close) & (s.close < a.open) & (b.close < s.close),
+    )
+
+
+def _cdl_2crows(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    return _signal(
+        None,
+        a.long & a.white & s.black & (s.bottom > a.top)
+        & b.black & (b.open < s.open) & (b.open > s.close)
+        & (b.close > a.open) & (b.close < a.close),
+    )
+
+
+def _cdl_upsidegap2crows(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    return _signal(
+        None,
+        a.long & a.white & s.short & s.black & (s.bottom > a.top)
+        & b.black & (b.open > s.open) & (b.close < s.close) & (b.close > a.close),
+    )
+
+
+def _cdl_tristar(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    dojis = a.doji & s.doji & b.doji
+    return _signal(
+        dojis & (s.top < a.bottom) & (b.bottom > s.bottom),
+        dojis & (s.bottom > a.top) & (b.top < s.top),
+    )
+
+
+def _cdl_sticksandwich(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    return _signal(
+        a.black & s.white & (s.low > a.close) & b.black
+        & (numpy.abs(b.close - a.close) <= a.equal)
+    )
+
+
+def _rising_whites(a, s, b):
+    # Three white candles with higher closes, each opening within or near the previous body
+    return (
+        a.white & s.white & b.white
+        & (s.close > a.close) & (b.close > s.close)
+        & (s.open > a.open) & (s.open <= a.close + a.near)
+        & (b.open > s.open) & (b.open <= s.close + s.near)
+    )
+
+
+def _cdl_advanceblock(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    # Bodies getting smaller or upper shadows getting longer
+    weakening = ((b.body < s.body) & (s.body < a.body)) | (
+        (s.upper > s.shadow_short) & (b.upper > b.shadow_short)
+    )
+    return _signal(None, _rising_whites(a, s, b) & a.long & weakening)
+
+
+def _cdl_stalledpattern(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    return _signal(
+        None,
+        _rising_whites(a, s, b) & a.long & s.long
+        & (s.upper < s.shadow_very_short)
+        & b.short & (b.open >= s.close - b.body - s.near),
+    )
+
+
+def _cdl_unique3river(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    return _signal(
+        a.long & a.black & s.black
+        & (s.close > a.close) & (s.open <= a.open) & (s.low < a.low)
+        & b.short & b.white & (b.close < s.close) & (b.open > s.low)
+    )
+
+
+def _cdl_tasukigap(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    equal_bodies = numpy.abs(s.body - b.body) < s.near
+    return _signal(
+        (s.bottom > a.top) & s.white & b.black
+        & (b.open < s.close) & (b.open > s.open)
+        & (b.close < s.open) & (b.close > a.top) & equal_bodies,
+        (s.top < a.bottom) & s.black & b.white
+        & (b.open < s.open) & (b.open > s.close)
+        & (b.close > s.open) & (b.close < a.bottom) & equal_bodies,
+    )
+
+
+def _cdl_gapsidesidewhite(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    side_by_side = (
+        s.white & b.white
+        & (numpy.abs(b.body - s.body) < s.near)
+        & (numpy.abs(b.open - s.open) < s.equal)
+    )
+    return _signal(
+        side_by_side & (s.bottom > a.top) & (b.bottom > a.top),
+        side_by_side & (s.top < a.bottom) & (b.top < a.bottom),
+    )
+
+
+def _cdl_xsidegap3methods(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    # Third opens within the second body and closes within the first, filling the gap
+    fill = (
+        (b.open < s.top) & (b.open > s.bottom) & (b.close < a.top) & (b.close > a.bottom)
+    )
+    return _signal(
+        fill & a.white & s.white & b.black & (s.bottom > a.top),
+        fill & a.black & s.black & b.white & (s.top < a.bottom),
+    )
+
+
+def _cdl_hikkake(x):
+    m, i, b = x.bar(2), x.bar(1), x.bar(0)
+    inside = (i.high < m.high) & (i.low > m.low)
+    pattern = _signal(
+        inside & (b.high < i.high) & (b.low < i.low),
+        inside & (b.high > i.high) & (b.low > i.low),
+    )
+    # Confirmation in the next 3 candles: close above the inside candle high (bullish)
+    # or below its low (bearish)
+    result = pattern.copy()
+    for periods in (1, 2, 3):
+        previous = _lag(pattern, periods, fill=0)
+        inside_bar = x.bar(periods + 1)
+        confirmed = _signal(
+            (previous == 100) & (x.close > inside_bar.high),
+            (previous == -100) & (x.close < inside_bar.low),
+        )
+        result = numpy.where((result == 0) & (confirmed != 0), confirmed * 2, result)
+    return result.astype(numpy.int32)
+
+
+# Four and five candles
+
+
+def _cdl_hikkakemod(x):
+    m, s, i, b = x.bar(3), x.bar(2), x.bar(1), x.bar(0)
+    inside = (
+        (s.high < m.high) & (s.low > m.low) & (i.high < s.high) & (i.low > s.low)
+    )
+    return _signal(
+        inside & (i.close <= i.low + i.near) & (b.high < i.high) & (b.low < i.low),
+        inside & (i.close >= i.high - i.near) & (b.high > i.high) & (b.low > i.low),
+    )
+
+
+def _cdl_3linestrike(x):
+    a, s, t, b = x.bar(3), x.bar(2), x.bar(1), x.bar(0)
+
+    def opens_near(previous, candle):
+        return (candle.open >= previous.bottom - previous.near) & (
+            candle.open <= previous.top + previous.near
+        )
+
+    three = (a.color == s.color) & (s.color == t.color) & opens_near(a, s) & opens_near(s, t)
+    return _signal(
+        three & a.white & (s.close > a.close) & (t.close > s.close)
+        & b.black & (b.open > t.close) & (b.close < a.open),
+        three & a.black & (s.close < a.close) & (t.close < s.close)
+        & b.white & (b.open < t.close) & (b.close > a.open),
+    )
+
+
+def _cdl_3starsinsouth(x):
+    a, s, b = x.bar(2), x.bar(1), x.bar(0)
+    return _signal(
+        a.long & a.black & (a.lower > a.body)
+        & s.black & (s.body < a.body) & (s.open > a.close) & (s.open <= a.high)
+        & (s.low > a.low) & (s.lower > s.shadow_very_short)
+        & b.black & b.short
+        & (b.upper < b.shadow_very_short) & (b.lower < b.shadow_very_short)
+        & (b.low > s.low) & (b.high < s.high)
+    )
+
+
+def _cdl_concealbabyswall(x):
+    a, s, t, b = x.bar(3), x.bar(2), x.bar(1), x.bar(0)
+    return _signal(
+        a.marubozu & a.black & s.marubozu & s.black
+        & t.black & (t.open < s.close) & (t.high > s.close)
+        & b.black & (b.open > t.high) & (b.close < t.low)
+    )
+
+
+def _cdl_ladderbottom(x):
+    a, s, t, u, b = x.bar(4), x.bar(3), x.bar(2), x.bar(1), x.bar(0)
+    return _signal(
+        a.black & s.black & t.black
+        & (s.open < a.open) & (t.open < s.open)
+        & (s.close < a.close) & (t.close < s.close)
+        & u.black & (u.upper > u.shadow_very_short)
+        & b.white & (b.open > u.open) & (b.close > u.high)
+    )
+
+
+def _cdl_breakaway(x):
+    a, s, t, u, b = x.bar(4), x.bar(3), x.bar(2), x.bar(1), x.bar(0)
+    return _signal(
+        a.long & a.black & s.black & (s.top < a.bottom)
+        & (t.high < s.high) & (t.low < s.low) & (u.high < t.high) & (u.low < t.low)
+        & u.black & b.white & (b.close > s.open) & (b.close < a.close),
+        a.long & a.white & s.white & (s.bottom > a.top)
+        & (t.high > s.high) & (t.low > s.low) & (u.high > t.high) & (u.low > t.low)
+        & u.white & b.black & (b.close < s.open) & (b.close > a.close),
+    )
+
+
+def _cdl_risefall3methods(x):
+    a, s, t, u, b = x.bar(4), x.bar(3), x.bar(2), x.bar(1), x.bar(0)
+    # Three small candles held within the range of the first
+    held = (
+        s.short & t.short & u.short
+        & (s.top < a.high) & (s.bottom > a.low)
+        & (t.top < a.high) & (t.bottom > a.low)
+        & (u.top < a.high) & (u.bottom > a.low)
+    )
+    return _signal(
+        held & a.long & a.white & s.black & (t.close < s.close) & (u.close < t.close)
+        & b.long & b.white & (b.open > u.close) & (b.close > a.close),
+        held & a.long & a.black & s.white & (t.close > s.close) & (u.close > t.close)
+        & b.long & b.black & (b.open < u.close) & (b.close < a.close),
+    )
+
+
+def _cdl_mathold(x):
+    a, s, t, u, b = x.bar(4), x.bar(3), x.bar(2), x.bar(1), x.bar(0)
+    penetration = 0.5
+    return _signal(
+        a.long & a.white
+        & s.short & s.black & (s.bottom > a.top)
+        & t.short & u.short
+        # Reaction holds within the upper part of the first body
+        & (t.bottom > a.close - a.body * penetration)
+        & (u.bottom > a.close - a.body * penetration)
+        & (t.top < s.top) & (u.top < t.top)
+        & b.white & (b.open > u.close)
+        & (b.close > numpy.maximum(numpy.maximum(s.high, t.high), u.high))
+    )
+
+
+PATTERNS = {
+    "CDL2CROWS": _cdl_2crows,
+    "CDL3BLACKCROWS": _cdl_3blackcrows,
+    "CDL3INSIDE": _cdl_3inside,
+    "CDL3LINESTRIKE": _cdl_3linestrike,
+    "CDL3OUTSIDE": _cdl_3outside,
+    "CDL3STARSINSOUTH": _cdl_3starsinsouth,
+    "CDL3WHITESOLDIERS": _cdl_3whitesoldiers,
+    "CDLABANDONEDBABY": _cdl_abandonedbaby,
+    "CDLADVANCEBLOCK": _cdl_advanceblock,
+    "CDLBELTHOLD": _cdl_belthold,
+    "CDLBREAKAWAY": _cdl_breakaway,
+    "CDLCLOSINGMARUBOZU": _cdl_closingmarubozu,
+    "CDLCONCEALBABYSWALL": _cdl_concealbabyswall,
+    "CDLCOUNTERATTACK": _cdl_counterattack,
+    "CDLDARKCLOUDCOVER": _cdl_darkcloudcover,
+    "CDLDOJI": _cdl_doji,
+    "CDLDOJISTAR": _cdl_dojistar,
+    "CDLDRAGONFLYDOJI": _cdl_dragonflydoji,
+    "CDLENGULFING": _cdl_engulfing,
+    "CDLEVENINGDOJISTAR": _cdl_eveningdojistar,
+    "CDLEVENINGSTAR": _cdl_eveningstar,
+    "CDLGAPSIDESIDEWHITE": _cdl_gapsidesidewhite,
+    "CDLGRAVESTONEDOJI": _cdl_gravestonedoji,
+    "CDLHAMMER": _cdl_hammer,
+    "CDLHANGINGMAN": _cdl_hangingman,
+    "CDLHARAMI": _cdl_harami,
+    "CDLHARAMICROSS": _cdl_haramicross,
+    "CDLHIGHWAVE": _cdl_highwave,
+    "CDLHIKKAKE": _cdl_hikkake,
+    "CDLHIKKAKEMOD": _cdl_hikkakemod,
+    "CDLHOMINGPIGEON": _cdl_homingpigeon,
+    "CDLIDENTICAL3CROWS": _cdl_identical3crows,
+    "CDLINNECK": _cdl_inneck,
+    "CDLINVERTEDHAMMER": _cdl_invertedhammer,
+    "CDLKICKING": _cdl_kicking,
+    "CDLKICKINGBYLENGTH": _cdl_kickingbylength,
+    "CDLLADDERBOTTOM": _cdl_ladderbottom,
+    "CDLLONGLEGGEDDOJI": _cdl_longleggeddoji,
+    "CDLLONGLINE": _cdl_longline,
+    "CDLMARUBOZU": _cdl_marubozu,
+    "CDLMATCHINGLOW": _cdl_matchinglow,
+    "CDLMATHOLD": _cdl_mathold,
+    "CDLMORNINGDOJISTAR": _cdl_morningdojistar,
+    "CDLMORNINGSTAR": _cdl_morningstar,
+    "CDLONNECK": _cdl_onneck,
+    "CDLPIERCING": _cdl_piercing,
+    "CDLRICKSHAWMAN": _cdl_rickshawman,
+    "CDLRISEFALL3METHODS": _cdl_risefall3methods,
+    "CDLSEPARATINGLINES": _cdl_separatinglines,
+    "CDLSHOOTINGSTAR": _cdl_shootingstar,
+    "CDLSHORTLINE": _cdl_shortline,
+    "CDLSPINNINGTOP": _cdl_spinningtop,
+    "CDLSTALLEDPATTERN": _cdl_stalledpattern,
+    "CDLSTICKSANDWICH": _cdl_sticksandwich,
+    "CDLTAKURI": _cdl_takuri,
+    "CDLTASUKIGAP": _cdl_tasukigap,
+    "CDLTHRUSTING": _cdl_thrusting,
+    "CDLTRISTAR": _cdl_tristar,
+    "CDLUNIQUE3RIVER": _cdl_unique3river,
+    "CDLUPSIDEGAP2CROWS": _cdl_upsidegap2crows,
+    "CDLXSIDEGAP3METHODS": _cdl_xsidegap3methods,
+}
+
+
+def detect_patterns(open, high, low, close, names=None, last=None) -> dict:
+    """
+    Compute candlestick patterns over the last axis of (time) or (symbols x time) arrays
+
+    Args:
+    - names: pattern names (PATTERNS keys), all by default
+    - last: only evaluate the last N candles (streaming), results have N columns
+
+    Returns {name: int32 array}, +100 bullish, -100 bearish, 0 none
+    """
+    arrays = [numpy.asarray(values, dtype=numpy.float64) for values in (open, high, low, close)]
+    if last:
+        arrays = [values[..., -(last + LOOKBACK):] for values in arrays]
+
+    features = CandleFeatures(*arrays)
+    results = {}
+    for name in names or PATTERNS:
+        result = PATTERNS[name](features)
+        results[name] = result[..., -last:] if last else result
+    return results
+
+
+def _detected(data, descriptions, last=1) -> list:
+    """
+    Descriptions of bullish patterns in any of the last candles of a single symbol
+    """
+    results = detect_patterns(
+        data["open"], data["high"], data["low"], data["close"], names=descriptions, last=last
+    )
+    return [
+        descriptions[name] for name, result in results.items() if numpy.any(result > 0)
+    ]
+
+
+def reversal_signals(data):
+    """
+    Reversal signals that still require confirmation
+    """
+    return _detected(data, reversal_patterns)
+
+
+def reversal_confirmation(data):
+    # Detect morning star pattern (price reversal) and engulfing (reversal confirmation)
+    # in the last 3 candles
+    results = detect_patterns(
+        data["open"],
+        data["high"],
+        data["low"],
+        data["close"],
+        names=("CDLMORNINGSTAR", "CDLENGULFING"),
+        last=3,
+    )
+    ms_check = bool(numpy.any(results["CDLMORNINGSTAR"]))
+    e_check = bool(numpy.any(results["CDLENGULFING"]))
+    return ms_check and e_check
+
 
 def downtrend_patterns(data):
     """
     Downtrend patterns that I've found quite accurate
     """
-    bearish_patterns = {
-        "CDLHARAMI": "Harami Pattern",
-        "CDLHARAMICROSS": "Harami Cross Pattern",
-        "CDLHIKKAKE": "Hikkake Pattern",
-        "CDLBELTHOLD": "Belt-hold",
-        "CDLEVENINGSTAR": "Evening Star", # Possibly down reversal confirmation
-        "CDLGRAVESTONEDOJI": "Gravestone Doji",
-        "CDLTAKURI": "Takuri (Dragonfly Doji with very long lower shadow)",
-    }
-    
-    open = numpy.asarray(data["open"], dtype='f8')
-    high = numpy.asarray(data["high"], dtype='f8')
-    low = numpy.asarray(data["low"], dtype='f8')
-    close = numpy.asarray(data["close"], dtype='f8')
-
-    detected_patterns = []
-
-    for pattern in bearish_patterns:
-        pattern_function = getattr(talib, pattern)
-        results = pattern_function(open, high, low, close)
-        if results[len(results) - 1] > 0:
-            detected_patterns.append(bearish_patterns[pattern])
-    
-    return detected_patterns
+    return _detected(data, bearish_patterns)
+
 
 def test_pattern_recognition(data):
     """
     Detect all patterns, not just reversal
     """
-    # Detect morning star pattern (price reversal)
-    open = numpy.asarray(data["open"], dtype='f8')
-    high = numpy.asarray(data["high"], dtype='f8')
-    low = numpy.asarray(data["low"], dtype='f8')
-    close = numpy.asarray(data["close"], dtype='f8')
-
-    detected_patterns = []
-
-    for pattern in test_patterns:
-        pattern_function = getattr(talib, pattern)
-        results = pattern_function(open, high, low, close)
-        if results[len(results) - 1] > 0:
-            detected_patterns.append(test_patterns[pattern])
-
-    return detected_patterns
+    return _detected(data, test_patterns)
 
 
 def chaikin_oscillator(data, volume):
     """
-    On-balance volume.
-    Describes trading volume https://www.investopedia.com/terms/o/onbalancevolume.asp
+    Chaikin oscillator, ADOSC(3, 10) of the accumulation/distribution line.
+    Describes trading volume https://www.investopedia.com/terms/c/chaikinoscillator.asp
     @params
     data: Candlestick data (Open, High, Low, Close)
     @returns
-    - check: boolean. True = positive chaikin, volume is on the up, False = negative chaikin, market 
-    """
-    open = numpy.asarray(data["open"], dtype='f8')
-    high = numpy.asarray(data["high"], dtype='f8')
-    low = numpy.asarray(data["low"], dtype='f8')
-    close = numpy.asarray(data["close"], dtype='f8')
-    volume = numpy.asarray(volume, dtype='f8')
+    - difference with the previous value: positive = volume is on the up, negative = volume is going down
+    - last value
 
-    real = talib.ADOSC(high, low, close, volume, fastperiod=3, slowperiod=10)
+    Live signals keep it up to date per symbol, see ResearchSignals.candle_features
+    """
+    real = indicators.chaikin_oscillator(
+        data["high"], data["low"], data["close"], volume, fast=3, slow=10
+    )
     last_value = real[len(real) - 1]
     previous_last = real[len(real) - 2]
     return last_value - (previous_last), last_value
@@ -0,0 +1,98 @@
+import os
+import threading
+
+from clock import get_clock
+from metrics import register_report
+
+"""
+Last price of every symbol seen in the websocket streams
+
+Kline (close of the current candle) and ticker messages (24hrTicker, 24hrMiniTicker,
+single or arrays) update the table, BinanceApi.ticker_price reads it before making a REST call.
+Prices older than PRICE_CACHE_MAX_AGE seconds (default 10) are stale and fall back to REST,
+as do symbols not in the streams.
+
+Hits, misses and stale reads are served at /prices on the metrics server (metrics.py).
+"""
+
+TICKER_EVENTS = ("24hrTicker", "24hrMiniTicker")
+
+
+class LivePriceCache:
+    def __init__(self, max_age=None, clock=None) -> None:
+        """
+        Args:
+        - max_age: seconds a price is valid, defaults to PRICE_CACHE_MAX_AGE or 10
+        - clock: see clock.py, defaults to the process clock at the time of each read/write
+        """
+        self.max_age = float(max_age if max_age is not None else os.getenv("PRICE_CACHE_MAX_AGE", 10))
+        self.clock = clock
+        self.lock = threading.Lock()
+        # symbol -> (price as received, receipt time)
+        self.prices: dict[str, tuple[str, float]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _now(self) -> float:
+        return (self.clock or get_clock()).time()
+
+    def update(self, symbol, price):
+        now = self._now()
+        with self.lock:
+            self.prices[symbol] = (price, now)
+
+    def update_from_message(self, message):
+        """
+        Update from a decoded stream message, other events are ignored
+        """
+        if isinstance(message, list):
+            for item in message:
+                self.update_from_message(item)
+            return
+        if not isinstance(message, dict):
+            return
+
+        event = message.get("e")
+        if event == "kline":
+            self.update(message["k"]["s"], message["k"]["c"])
+        elif event in TICKER_EVENTS:
+            self.update(message["s"], message["c"])
+
+    def get(self, symbol) -> str | None:
+        """
+        Last price of symbol, None if not in the streams or older than max_age
+        """
+        now = self._now()
+        with self.lock:
+            entry = self.prices.get(symbol)
+            if entry is None:
+                self.misses += 1
+                return None
+            if now - entry[1] > self.max_age:
+                self.stale += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def evict(self, symbol):
+        with self.lock:
+            self.prices.pop(symbol, None)
+
+    def report(self) -> dict:
+        with self.lock:
+            return {
+                "symbols": len(self.prices),
+                "max_age": self.max_age,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+            }
+
+
+_price_cache = LivePriceCache()
+register_report("prices", _price_cache.report)
+
+
+def get_price_cache() -> LivePriceCache:
+    return _price_cache
@@ -0,0 +1,123 @@
+import logging
+import os
+import signal
+import sys
+import threading
+
+from collections import Counter
+from time import perf_counter, sleep, strftime
+
+"""
+Built-in sampling profiler
+
+Samples the stacks of all threads (websocket readers, autotrade workers, background loops)
+with sys._current_frames at a fixed interval, for a limited time, then writes
+collapsed stacks (one "thread;frame;frame count" line per stack) that flame graph tools read:
+flamegraph.pl profile.collapsed > profile.svg, or speedscope.
+
+Threads that are waiting (sockets, sleeps) are sampled too, filter them by their root frame.
+
+Toggle (see install_profiler):
+- PROFILE_SECONDS=N: profile the first N seconds after start
+- kill -USR1 <pid>: profile the next PROFILE_SECONDS (default 30) seconds
+- PROFILE_INTERVAL: seconds between samples (default 0.01)
+- PROFILE_DIR: output directory (default ./profiles)
+"""
+
+
+class SamplingProfiler:
+    def __init__(self, duration=30, interval=0.01, directory="profiles") -> None:
+        self.duration = duration
+        self.interval = interval
+        self.directory = directory
+        self.stacks = Counter()
+        self.samples = 0
+        # Time spent sampling, to report overhead
+        self.sampling_time = 0.0
+        self.labels = {}
+        self.thread = None
+        self.output = None
+
+    def _label(self, code) -> str:
+        label = self.labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self.labels[code] = label
+        return label
+
+    def sample(self):
+        started = perf_counter()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+        self.sampling_time += perf_counter() - started
+
+    def run(self):
+        started = perf_counter()
+        deadline = started + self.duration
+        while perf_counter() < deadline:
+            self.sample()
+            sleep(self.interval)
+        self.write(perf_counter() - started)
+
+    def write(self, elapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        self.output = os.path.join(self.directory, f"profile-{strftime('%Y%m%d-%H%M%S')}.collapsed")
+        with open(self.output, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logging.info(
+            f"Profile written to {self.output}: {self.samples} samples, "
+            f"sampling overhead {self.sampling_time / elapsed * 100:.2f}%"
+        )
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="profiler", daemon=True)
+        self.thread.start()
+        return self
+
+    @property
+    def running(self) -> bool:
+        return bool(self.thread and self.thread.is_alive())
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def start_profiler(duration=None) -> SamplingProfiler | None:
+    """
+    Start a profile unless one is already running
+    """
+    global _profiler
+    with _profiler_lock:
+        if _profiler and _profiler.running:
+            logging.info("Profiler already running")
+            return None
+        _profiler = SamplingProfiler(
+            duration=duration or float(os.getenv("PROFILE_SECONDS") or 30),
+            interval=float(os.getenv("PROFILE_INTERVAL") or 0.01),
+            directory=os.getenv("PROFILE_DIR", "profiles"),
+        ).start()
+        logging.info(f"Profiling all threads for {_profiler.duration}s")
+        return _profiler
+
+
+def install_profiler():
+    """
+    Profile on start (PROFILE_SECONDS) and on SIGUSR1. Must be called from the main thread
+    """
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: start_profiler())
+
+    if os.getenv("PROFILE_SECONDS"):
+        start_profiler()
@@ -1,19 +1,28 @@
 import asyncio
 import os
 import re
-import requests
+import http_client
 import logging
 import numpy
 
 from signals import SetupSignals
 from utils import round_numbers
-from time import time
 from scipy.stats import linregress
 from streaming.socket_client import SpotWebsocketStreamClient
 
 class QFL_signals(SetupSignals):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, clock=None, candles=None):
+        """
+        Args:
+        - clock: see clock.py, defaults to wall clock
+        - candles: CandleStore fed by a kline stream that divides 15m
+        (e.g. ResearchSignals.base_candles), stats are resampled from it instead of requesting 15m candles
+        """
+        super().__init__(clock=clock)
+        self.candles = candles
+        # Local 15m candles needed for stats (1 day), as many as the candlestick series are used
+        self.min_stats_candles = 96
+        self.stats_window = 500
         self.client = SpotWebsocketStreamClient(on_message=self.on_message, is_combined=True)
         self.exchanges = ["Binance"]
         self.quotes = ["USDT", "BUSD", "USD", "BTC", "ETH"]
@@ -30,7 +39,7 @@ class QFL_signals(SetupSignals):
 
     def check_asset(self, asset):
         # Check if pair works with USDT, is availabee in the binance
-        request_crypto = requests.get(
+        request_crypto = http_client.get(
             f"https://min-api.cryptocompare.com/data/v4/all/exchanges?fsym={asset}&e=Binance"
         ).json()
         logging.info(f"Checking {asset} existence in Binance...")
@@ -40,10 +49,46 @@ class QFL_signals(SetupSignals):
         symbol = asset + "USDT"
         return symbol
 
+    def local_stats(self, symbol):
+        """
+        get_stats from 15m candles resampled from the candle store,
+        None if there are not enough candles of symbol or BTCUSDT
+        """
+        if self.candles is None:
+            return None
+
+        candles = self.candles.resample(symbol, "15m", deep=True)
+        btc = self.candles.resample("BTCUSDT", "15m", deep=True)
+        if (
+            candles is None
+            or btc is None
+            or len(candles) < self.min_stats_candles
+            or len(btc) < self.min_stats_candles
+        ):
+            return None
+
+        dates = candles.open_time[-self.stats_window :]
+        list_prices = candles.close[-self.stats_window :].astype(numpy.single)
+        sd = round_numbers(numpy.std(list_prices), 2)
+        lowest_price = numpy.min(list_prices)
+        slope, intercept, rvalue, pvalue, stderr = linregress(dates, list_prices)
+
+        common, index, btc_index = numpy.intersect1d(dates, btc.open_time, return_indices=True)
+        if len(common) < self.min_stats_candles:
+            return None
+        correlation = numpy.corrcoef(
+            candles.close[-self.stats_window :][index], btc.close[btc_index]
+        )[0, 1]
+        return sd, lowest_price, slope, {"close_price": float(correlation)}
+
     def get_stats(self, symbol):
         """
-        Get standard deviation and lowest price
+        Get standard deviation, lowest price, slope and correlation with BTC
+        of the 15m candles, from local candles if possible (see local_stats)
         """
+        stats = self.local_stats(symbol)
+        if stats:
+            return stats
 
         data = self._get_candlestick(symbol, "15m")
         if "error" in data and data["error"] == 1:
@@ -144,7 +189,7 @@ class QFL_signals(SetupSignals):
                         f'\n- <a href="{hodloo_url}">Hodloo</a>'
                     )
 
-                    sd, lowest_price, slope = self.get_stats(trading_pair)
+                    sd, lowest_price, slope, btc_correlation = self.get_stats(trading_pair)
 
                     process_autotrade_restrictions(
                         self,
@@ -171,11 +216,11 @@ class QFL_signals(SetupSignals):
                     )
 
                 # Avoid repeating signals with same coin
-                self.last_processed_asset[asset] = time()
+                self.last_processed_asset[asset] = self.clock.time()
 
             if (
                 asset in self.last_processed_asset
-                and (float(time()) - float(self.last_processed_asset[asset])) > 3600
+                and (float(self.clock.time()) - float(self.last_processed_asset[asset])) > 3600
             ):
                 del self.last_processed_asset[asset]
 
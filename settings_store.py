@@ -0,0 +1,230 @@
+import hashlib
+import json
+import logging
+import threading
+
+from logging import info
+from time import sleep, time
+from types import MappingProxyType
+
+import http_client
+from apis import BinbotApi
+from utils import handle_binance_errors
+
+
+def freeze(data):
+    """
+    Recursively convert dicts and lists into read-only
+    MappingProxyType and tuples
+    """
+    if isinstance(data, dict):
+        return MappingProxyType({key: freeze(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return tuple(freeze(value) for value in data)
+    return data
+
+
+def thaw(data):
+    """
+    Mutable deep copy of frozen (or plain) data, e.g. to modify or send settings
+    """
+    if isinstance(data, (dict, MappingProxyType)):
+        return {key: thaw(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [thaw(value) for value in data]
+    return data
+
+
+class SettingsSnapshot:
+    """
+    Immutable, versioned copy of controller data
+
+    A new snapshot is built every time something changes (copy-on-write),
+    so workers can hold a reference and read it without locks.
+    """
+
+    __slots__ = (
+        "version",
+        "digest",
+        "fetched_at",
+        "settings",
+        "test_autotrade_settings",
+        "blacklist",
+        "active_symbols",
+        "active_test_bots",
+    )
+
+    def __init__(
+        self,
+        version,
+        digest,
+        settings,
+        test_autotrade_settings,
+        blacklist,
+        active_symbols,
+        active_test_bots,
+    ) -> None:
+        set_attr = super().__setattr__
+        set_attr("version", version)
+        set_attr("digest", digest)
+        set_attr("fetched_at", time())
+        set_attr("settings", freeze(settings))
+        set_attr("test_autotrade_settings", freeze(test_autotrade_settings))
+        set_attr("blacklist", freeze(blacklist))
+        set_attr("active_symbols", frozenset(active_symbols))
+        set_attr("active_test_bots", frozenset(active_test_bots))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SettingsSnapshot is immutable")
+
+    @property
+    def interval(self) -> str:
+        return self.settings["candlestick_interval"]
+
+    @property
+    def max_request(self) -> int:
+        return int(self.settings["max_request"])
+
+    @property
+    def blacklisted_pairs(self) -> frozenset:
+        return frozenset(item["pair"] for item in self.blacklist)
+
+
+class SettingsStore(BinbotApi):
+    """
+    Holds the current SettingsSnapshot and refreshes it in the background
+
+    Polling uses conditional requests (If-None-Match) when the server returns ETags,
+    otherwise responses are compared by digest, so a new version
+    is only published when something actually changed.
+
+    Listeners subscribed with `subscribe` are called with (previous, current)
+    snapshots after every change.
+    """
+
+    def __init__(self, refresh_interval=60) -> None:
+        self.refresh_interval = refresh_interval
+        self.snapshot: SettingsSnapshot | None = None
+        self.listeners = []
+        self.etags = {}
+        self.responses = {}
+        # Only serializes writers, readers use self.snapshot directly
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def _get(self, url, params=None):
+        """
+        Conditional GET, reuses the last response on HTTP 304
+        """
+        key = (url, json.dumps(params, sort_keys=True))
+        headers = {}
+        if key in self.etags:
+            headers["If-None-Match"] = self.etags[key]
+
+        res = http_client.get(url=url, params=params, headers=headers)
+        if res.status_code == 304:
+            return self.responses[key]
+
+        data = handle_binance_errors(res)
+        if "ETag" in res.headers:
+            self.etags[key] = res.headers["ETag"]
+        self.responses[key] = data
+        return data
+
+    def _fetch(self) -> dict:
+        settings = self._get(self.bb_autotrade_settings_url)
+        test_autotrade = self._get(self.bb_test_autotrade_url)
+        blacklist = self._get(self.bb_blacklist_url)
+        active_bots = self._get(
+            self.bb_bot_url, params={"status": "active", "no_cooldown": True}
+        )
+        paper_trading_bots = self._get(
+            self.bb_test_bot_url, params={"status": "active", "no_cooldown": True}
+        )
+        return {
+            "settings": settings["data"],
+            "test_autotrade_settings": test_autotrade["data"],
+            "blacklist": blacklist["data"],
+            "active_symbols": [bot["pair"] for bot in active_bots["data"]],
+            "active_test_bots": [item["pair"] for item in paper_trading_bots["data"]],
+        }
+
+    def _publish(self, data) -> bool:
+        """
+        Build a new snapshot if data changed and notify listeners
+        """
+        digest = hashlib.sha1(
+            json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        previous = self.snapshot
+        if previous and previous.digest == digest:
+            return False
+
+        version = previous.version + 1 if previous else 1
+        self.snapshot = SettingsSnapshot(version, digest, **data)
+        info(f"Settings snapshot updated to version {version}")
+
+        if previous:
+            for listener in self.listeners:
+                try:
+                    listener(previous, self.snapshot)
+                except Exception as error:
+                    logging.error(f"Error from settings listener {listener}: {error}")
+        return True
+
+    def load(self):
+        """
+        Initial load
+
+        Removes restart flag (update_required), as we are already restarting
+        """
+        with self.lock:
+            settings_data = self._get(self.bb_autotrade_settings_url)
+            if (
+                "update_required" not in settings_data
+                or settings_data["data"]["update_required"]
+            ):
+                settings = thaw(settings_data["data"])
+                settings["update_required"] = time()
+                research_controller_res = http_client.put(
+                    url=self.bb_autotrade_settings_url, json=settings
+                )
+                handle_binance_errors(research_controller_res)
+
+            self._publish(self._fetch())
+
+    def load_snapshot(self, data):
+        """
+        Initial load from controller data in the format of _fetch
+        (settings, test_autotrade_settings, blacklist, active_symbols, active_test_bots)
+        instead of the API, e.g. replays. Don't start() after it, refresh would overwrite it
+        """
+        with self.lock:
+            self._publish(data)
+
+    def refresh(self) -> bool:
+        with self.lock:
+            return self._publish(self._fetch())
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def start(self):
+        """
+        Start background refresh
+        """
+        if self.thread:
+            return
+        self.thread = threading.Thread(
+            target=self._run, name="settings-refresh", daemon=True
+        )
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            sleep(self.refresh_interval)
+            try:
+                with http_client.request_caller("SettingsStore.refresh"):
+                    self.refresh()
+            except Exception as error:
+                logging.error(f"Failed to refresh settings: {error}")
@@ -1,13 +1,16 @@
 import json
 import logging
+import os
+import threading
 
 from datetime import datetime, timedelta
 from logging import info
-from time import sleep, time
+from time import sleep
 
 import numpy
 import pandas as pd
-import requests
+import http_client
+import indicators
 from algorithms.ma_candlestick import ma_candlestick_jump, ma_candlestick_drop
 from algorithms.rally import rally_or_pullback
 from algorithms.price_changes import price_rise_15
@@ -16,10 +19,33 @@ from algorithms.coinrule import fast_and_slow_macd, buy_low_sell_high
 from apis import BinbotApi
 from streaming.socket_client import SpotWebsocketStreamClient
 from scipy import stats
-from telegram_bot import TelegramBot
+from telegram_bot import TelegramBot, TelegramDispatcher
 from utils import handle_binance_errors, round_numbers
 from typing import Literal
 from autotrade import Autotrade
+from autotrade_queue import AutotradeQueue
+from balances import BalanceSnapshot
+from candles import FIELDS, CandleStore
+from clock import get_clock
+from indicators import CandleIndicators
+from kline_sync import KlineSync
+from metrics import get_metrics, register_report
+from price_cache import get_price_cache
+from settings_store import SettingsStore
+
+# Algorithms run by ResearchSignals.process_kline_stream
+ALGORITHMS = (
+    "buy_low_sell_high",
+    "price_rise_15",
+    "rally_or_pullback",
+    "fast_and_slow_macd",
+    "ma_candlestick_jump",
+    "ma_candlestick_drop",
+    "top_gainers_drop",
+)
+
+# Dummy stream when no symbol is subscribed, so the connection keeps streaming
+KEEP_ALIVE_SYMBOL = "BNBBTC"
 
 
 class SetupSignals(BinbotApi):
@@ -27,8 +53,14 @@ class SetupSignals(BinbotApi):
     Tools and functions that are shared by all signals
     """
 
-    def __init__(self):
-        self.interval = "1h"
+    def __init__(self, clock=None, offline=False):
+        # Wall clock in production, SimulatedClock for replays and simulations
+        self.clock = clock or get_clock()
+        # Replays: settings are loaded with SettingsStore.load_snapshot and candlesticks
+        # built from local candles, nothing is requested from Binbot or Binance for them
+        self.offline = offline
+        # Latency histograms per stage, see metrics.py
+        self.metrics = get_metrics()
         self.markets_streams = None
         self.skipped_fiat_currencies = [
             "DOWN",
@@ -36,35 +68,57 @@ class SetupSignals(BinbotApi):
             "AUD",
         ]  # on top of blacklist
         self.telegram_bot = TelegramBot()
-        self.max_request = 950  # Avoid HTTP 411 error by separating streams
-        self.active_symbols = []
-        self.active_test_bots = []
-        self.blacklist_data = []
-        self.test_autotrade_settings = {}
-        self.settings = {}
+        self.telegram_dispatcher = TelegramDispatcher(self.telegram_bot)
+        # Controller data (settings, blacklist, active bots), see properties below
+        self.settings_store = SettingsStore()
         # Because market domination analysis 40 weight from binance endpoints
-        self.market_domination_ts = datetime.now()
+        self.market_domination_ts = self.clock.now()
         self.market_domination_trend = None
         self.market_domination_reversal = None
         self.top_coins_gainers = []
 
         self.btc_change_perc = 0
         self.volatility = 0
+        self.sd = 0
+        self.lowest_price = None
+        # Candle features of the symbol being processed, see ResearchSignals.candle_features
+        self.accumulation_distribution = None
+        self.chaikin = None
+        self.chaikin_diff = None
+        self.obv = None
+        # Shared by all autotrades, avoids fetching balances on every signal
+        self.balance_snapshot = BalanceSnapshot(clock=self.clock)
+        # Autotrades run in background workers, see process_autotrade_restrictions
+        self.autotrade_queue = AutotradeQueue()
+        # Active bots check runs one job at a time per collection and claims the pair,
+        # so workers can't exceed max_active_autotrade_bots or open the same pair twice
+        self.autotrade_locks = {"bots": threading.Lock(), "paper_trading": threading.Lock()}
+        # Pairs claimed by jobs still opening their bot, counted as active bots
+        self.autotrade_pending = {"bots": set(), "paper_trading": set()}
+        # Open time of the kline being processed, used for autotrade idempotency
+        self.candle_open_time = None
 
     def send_telegram(self, msg):
         """
         Send message with telegram bot
         To avoid Conflict - duplicate Bot error
         /t command will still be available in telegram bot
+
+        Messages are queued and sent in the background (see TelegramDispatcher)
         """
-        if not hasattr(self.telegram_bot, "updater"):
-            self.telegram_bot.run_bot()
+        if self.offline:
+            logging.info(f"Signal: {msg}")
+            return
+
+        with self.metrics.span("send_telegram"):
+            if not hasattr(self.telegram_bot, "updater"):
+                self.telegram_bot.run_bot()
 
-        self.telegram_bot.send_msg(msg)
+            self.telegram_dispatcher.send(msg)
         return
 
     def blacklist_coin(self, pair, msg):
-        res = requests.post(
+        res = http_client.post(
             url=self.bb_blacklist_url, json={"pair": pair, "reason": msg}
         )
         result = handle_binance_errors(res)
@@ -80,7 +134,7 @@ class SetupSignals(BinbotApi):
         url = self.ticker24_url
         params = {"symbol": symbol}
 
-        res = requests.get(url=url, params=params)
+        res = http_client.get(url=url, params=params)
         data = handle_binance_errors(res)
         return data
 
@@ -111,79 +165,81 @@ class SetupSignals(BinbotApi):
 
         return False
 
+    @property
+    def settings(self):
+        snapshot = self.settings_store.snapshot
+        return snapshot.settings if snapshot else {}
+
+    @property
+    def test_autotrade_settings(self):
+        snapshot = self.settings_store.snapshot
+        return snapshot.test_autotrade_settings if snapshot else {}
+
+    @property
+    def blacklist_data(self):
+        snapshot = self.settings_store.snapshot
+        return snapshot.blacklist if snapshot else ()
+
+    @property
+    def active_symbols(self):
+        snapshot = self.settings_store.snapshot
+        return snapshot.active_symbols if snapshot else frozenset()
+
+    @property
+    def active_test_bots(self):
+        snapshot = self.settings_store.snapshot
+        return snapshot.active_test_bots if snapshot else frozenset()
+
+    @property
+    def interval(self):
+        snapshot = self.settings_store.snapshot
+        return snapshot.interval if snapshot else "1h"
+
+    @property
+    def max_request(self):
+        # Avoid HTTP 411 error by separating streams
+        snapshot = self.settings_store.snapshot
+        return snapshot.max_request if snapshot else 950
+
     def load_data(self):
         """
         Load controller data
 
         - Global settings for autotrade
         - Updated blacklist
+        - Active bots
+
+        After first load, data is kept up to date in the background by SettingsStore
         """
         info("Loading controller and blacklist data...")
-        if self.settings and self.test_autotrade_settings:
+        if self.settings_store.snapshot:
             info("Settings and Test autotrade settings already loaded, skipping...")
             return
+        if self.offline:
+            raise ValueError("Offline signals need settings, see SettingsStore.load_snapshot")
 
-        settings_res = requests.get(url=f"{self.bb_autotrade_settings_url}")
-        settings_data = handle_binance_errors(settings_res)
-        blacklist_res = requests.get(url=f"{self.bb_blacklist_url}")
-        blacklist_data = handle_binance_errors(blacklist_res)
+        with http_client.request_caller("load_data"):
+            self.settings_store.load()
+            self.settings_store.start()
 
-        # Show webscket errors
-        if "error" in (settings_data, blacklist_res) and (
-            settings_data["error"] == 1 or blacklist_res["error"] == 1
-        ):
-            print(settings_data)
-
-        # Remove restart flag, as we are already restarting
-        if (
-            "update_required" not in settings_data
-            or settings_data["data"]["update_required"]
-        ):
-            settings_data["data"]["update_required"] = time()
-            research_controller_res = requests.put(
-                url=self.bb_autotrade_settings_url, json=settings_data["data"]
-            )
-            handle_binance_errors(research_controller_res)
-
-        # Logic for autotrade
-        research_controller_res = requests.get(url=self.bb_autotrade_settings_url)
-        research_controller = handle_binance_errors(research_controller_res)
-        self.settings = research_controller["data"]
-
-        test_autotrade_settings = requests.get(url=f"{self.bb_test_autotrade_url}")
-        test_autotrade = handle_binance_errors(test_autotrade_settings)
-        self.test_autotrade_settings = test_autotrade["data"]
-
-        self.settings = settings_data["data"]
-        self.blacklist_data = blacklist_data["data"]
-        self.interval = self.settings["candlestick_interval"]
-        self.max_request = int(self.settings["max_request"])
-
-        # if autrotrade enabled and it's not an already active bot
-        # this avoids running too many useless bots
-        # Temporarily restricting to 1 bot for low funds
-        bots_res = requests.get(
-            url=self.bb_bot_url, params={"status": "active", "no_cooldown": True}
-        )
-        active_bots = handle_binance_errors(bots_res)["data"]
-        self.active_symbols = [bot["pair"] for bot in active_bots]
-
-        paper_trading_bots_res = requests.get(
-            url=self.bb_test_bot_url, params={"status": "active", "no_cooldown": True}
-        )
-        paper_trading_bots = handle_binance_errors(paper_trading_bots_res)
-        self.active_test_bots = [item["pair"] for item in paper_trading_bots["data"]]
-
-        self.market_domination()
+            self.market_domination()
         pass
 
     def post_error(self, msg):
-        res = requests.put(
+        res = http_client.put(
             url=self.bb_autotrade_settings_url, json={"system_logs": msg}
         )
         handle_binance_errors(res)
         return
 
+    def autotrade_job_key(self, symbol, algorithm, db_collection_name):
+        """
+        Idempotency key for autotrade jobs: pair + algorithm + candle time
+        Signals without candle (e.g. QFL) fall back to the current minute
+        """
+        candle_time = self.candle_open_time or int(self.clock.time() // 60) * 60000
+        return f"{db_collection_name}:{symbol}:{algorithm}:{candle_time}"
+
     def process_autotrade_restrictions(
         self, symbol, algorithm, test_only=False, *args, **kwargs
     ):
@@ -191,66 +247,168 @@ class SetupSignals(BinbotApi):
         Refactored autotrade conditions.
         Previously part of process_kline_stream
 
-        1. Checks if we have balance to trade
-        2. Check if we need to update websockets
-        3. Check if autotrade is enabled
-        4. Check if test autotrades
-        5. Check active strategy
+        1. Check if autotrade is enabled
+        2. Check if test autotrades
+        3. Submit autotrades to the autotrade queue,
+        balance and active bots checks run in the queue workers (see run_autotrade)
+        so that signal processing never waits on Binbot
+
+        Offline (replays) autotrades are only logged, whatever the settings
         """
+        if self.offline:
+            logging.info(f"Autotrade signal: {symbol} {algorithm} {kwargs}")
+            return
 
         """
         Test autotrade starts
 
         Wrap in try and except to avoid bugs stopping real bot trades
         """
-        try:
-            if (
-                symbol not in self.active_test_bots
-                and int(self.test_autotrade_settings["autotrade"]) == 1
-            ):
-                if self.reached_max_active_autobots("paper_trading"):
-                    logging.info(
-                        "Reached maximum number of active bots set in controller settings"
-                    )
-                else:
+        with self.metrics.span("autotrade_restrictions"):
+            try:
+                if (
+                    symbol not in self.active_test_bots
+                    and int(self.test_autotrade_settings["autotrade"]) == 1
+                ):
                     # Test autotrade runs independently of autotrade = 1
-                    test_autotrade = Autotrade(
-                        symbol, self.test_autotrade_settings, algorithm, "paper_trading"
+                    self.autotrade_queue.submit(
+                        self.autotrade_job_key(symbol, algorithm, "paper_trading"),
+                        self.run_test_autotrade,
+                        symbol,
+                        algorithm,
+                        **kwargs,
                     )
-                    test_autotrade.activate_autotrade(**kwargs)
-        except Exception as error:
-            print(error)
-            pass
-
-        # Check balance to avoid failed autotrades
-        balance_check = self.balance_estimate()
-        if balance_check < float(self.settings['base_order_size']):
-            print(f"Not enough funds to autotrade [bots].")
-            return
+            except Exception as error:
+                print(error)
+                pass
+
+            """
+            Real autotrade starts
+            """
+            if (int(self.settings["autotrade"]) == 1
+                and not test_only):
+                job_key = self.autotrade_job_key(symbol, algorithm, "bots")
+                self.autotrade_queue.submit(
+                    job_key,
+                    self.run_autotrade,
+                    symbol,
+                    algorithm,
+                    job_key,
+                    **kwargs,
+                )
+
+        return
 
+    def claim_autotrade(self, db_collection_name, symbol, algorithm) -> bool:
         """
-        Real autotrade starts
+        Check max active bots and duplicate pairs, including bots other workers are opening,
+        and claim symbol if a bot can be opened. Bot creation and activation run
+        without the lock, claims are released with release_autotrade
         """
-        if (int(self.settings["autotrade"]) == 1
-            and not test_only):
-            if self.reached_max_active_autobots("bots"):
+        with self.autotrade_locks[db_collection_name]:
+            pending = self.autotrade_pending[db_collection_name]
+            active_bots = self.active_autobots(db_collection_name)
+            if self.reached_max_active_autobots(
+                db_collection_name, active_bots + [{"pair": pair} for pair in pending]
+            ):
                 logging.info("Reached maximum number of active bots set in controller settings")
-            else:
+                return False
 
-                autotrade = Autotrade(symbol, self.settings, algorithm, "bots")
-                autotrade.activate_autotrade(**kwargs)
+            if symbol in pending or symbol in {bot["pair"] for bot in active_bots}:
+                logging.info(f"{db_collection_name} bot for {symbol} already active, skipping {algorithm}")
+                return False
 
-        return
+            pending.add(symbol)
+            return True
+
+    def release_autotrade(self, db_collection_name, symbol):
+        with self.autotrade_locks[db_collection_name]:
+            self.autotrade_pending[db_collection_name].discard(symbol)
+
+    def run_test_autotrade(self, symbol, algorithm, **kwargs):
+        """
+        Paper trading autotrade job, runs in the autotrade queue
+        """
+        if not self.claim_autotrade("paper_trading", symbol, algorithm):
+            return False
+
+        try:
+            test_autotrade = Autotrade(
+                symbol,
+                self.test_autotrade_settings,
+                algorithm,
+                "paper_trading",
+                balance_snapshot=self.balance_snapshot,
+                clock=self.clock,
+            )
+            return test_autotrade.activate_autotrade(**kwargs)
+        finally:
+            self.release_autotrade("paper_trading", symbol)
 
+    def run_autotrade(self, symbol, algorithm, job_key=None, **kwargs):
+        """
+        Real autotrade job, runs in the autotrade queue
+
+        Args:
+        - job_key: autotrade_job_key of the job, funds are reserved under it
+        so jobs of the same pair from different algorithms don't share a reservation
+        """
+        if job_key is None:
+            job_key = self.autotrade_job_key(symbol, algorithm, "bots")
+        # Reserve funds until the bot is opened,
+        # so concurrent signals can't spend the same balance
+        base_order_size = float(self.settings["base_order_size"])
+        if not self.balance_snapshot.reserve(job_key, base_order_size):
+            print(f"Not enough funds to autotrade [bots].")
+            return False
 
-    def reached_max_active_autobots(self, db_collection_name: str) -> bool:
+        opened = False
+        try:
+            if not self.claim_autotrade("bots", symbol, algorithm):
+                return False
+            try:
+                autotrade = Autotrade(
+                    symbol,
+                    self.settings,
+                    algorithm,
+                    "bots",
+                    balance_snapshot=self.balance_snapshot,
+                    clock=self.clock,
+                    reservation_key=job_key,
+                )
+                opened = autotrade.activate_autotrade(**kwargs)
+            finally:
+                self.release_autotrade("bots", symbol)
+        finally:
+            self.balance_snapshot.release(job_key, traded=bool(opened))
+
+        return opened
+
+    def active_autobots(self, db_collection_name: str) -> list:
+        """
+        Active bots of db_collection_name ["paper_trading", "bots"], fresh from Binbot
+        """
+        if db_collection_name == "paper_trading":
+            if not self.test_autotrade_settings:
+                self.load_data()
+            url = self.bb_test_bot_url
+        else:
+            if not self.settings:
+                self.load_data()
+            url = self.bb_bot_url
+
+        active_bots_res = http_client.get(url=url, params={"status": "active"})
+        return handle_binance_errors(active_bots_res)["data"]
+
+    def reached_max_active_autobots(self, db_collection_name: str, active_bots=None) -> bool:
         """
         Check max `max_active_autotrade_bots` in controller settings
 
         Args:
         - db_collection_name: Database collection name ["paper_trading", "bots"]
+        - active_bots: result of active_autobots, fetched if not given
 
-        If total active bots > settings.max_active_autotrade_bots
+        If total active bots >= settings.max_active_autotrade_bots
         do not open more bots. There are two reasons for this:
         - In the case of test bots, infininately opening bots will open hundreds of bots
         which will drain memory and downgrade server performance
@@ -258,29 +416,14 @@ class SetupSignals(BinbotApi):
         in bots that are actually not useful or not profitable. Some funds
         need to be left for Safety orders
         """
-        if db_collection_name == "paper_trading":
-            if not self.test_autotrade_settings:
-                self.load_data()
+        if active_bots is None:
+            active_bots = self.active_autobots(db_collection_name)
 
-            active_bots_res = requests.get(
-                url=self.bb_test_bot_url, params={"status": "active"}
-            )
-            active_bots = handle_binance_errors(active_bots_res)
-            active_count = len(active_bots["data"])
-            if active_count > self.test_autotrade_settings["max_active_autotrade_bots"]:
-                return True
+        if db_collection_name == "paper_trading":
+            return len(active_bots) >= self.test_autotrade_settings["max_active_autotrade_bots"]
 
         if db_collection_name == "bots":
-            if not self.settings:
-                self.load_data()
-
-            active_bots_res = requests.get(
-                url=self.bb_bot_url, params={"status": "active"}
-            )
-            active_bots = handle_binance_errors(active_bots_res)
-            active_count = len(active_bots["data"])
-            if active_count > self.settings["max_active_autotrade_bots"]:
-                return True
+            return len(active_bots) >= self.settings["max_active_autotrade_bots"]
 
         return False
 
@@ -294,8 +437,13 @@ class SetupSignals(BinbotApi):
         if > 70% of assets in a given market (USDT) dominated by gainers
         if < 70% of assets in a given market dominated by losers
         Establish the timing
+
+        Not available offline, gainers and losers series come from Binbot
         """
-        now = datetime.now()
+        if self.offline:
+            return
+
+        now = self.clock.now()
         momentum = self.check_market_momentum(now)
         # momentum = True
         if (
@@ -333,25 +481,67 @@ class SetupSignals(BinbotApi):
                 reversal_msg = f"{'Positive reversal' if self.market_domination_reversal else 'Negative reversal'}"
 
             logging.info(f"Current USDT market trend is: {reversal_msg}. BTC 24hr change: {self.btc_change_perc}")
-            self.market_domination_ts = datetime.now() + timedelta(hours=1)
+            self.market_domination_ts = self.clock.now() + timedelta(hours=1)
         pass
 
 
 class ResearchSignals(SetupSignals):
-    def __init__(self) -> None:
+    def __init__(self, clock=None, client=None, algorithms=None, offline=False) -> None:
+        """
+        Args:
+        - clock: see clock.py, defaults to wall clock
+        - client: websocket client, e.g. for replays (streaming/replay.py).
+        Defaults to a new connection to Binance
+        - algorithms: names of the algorithms to run (see ALGORITHMS), defaults to all
+        - offline: see SetupSignals, candlesticks are built with local_candlestick
+        """
         info("Started research signals")
+        self.algorithms = set(algorithms or ALGORITHMS)
         self.last_processed_kline = {}
-        self.client = SpotWebsocketStreamClient(
+        # USDT symbols trading in Binance and the subset we listen to (minus blacklist)
+        self.trading_symbols = set()
+        self.subscribed_symbols = set()
+        # Kline streams on the connection (<symbol>@kline_<interval>), of the subscribed
+        # symbols or KEEP_ALIVE_SYMBOL if there are none, see stream_intervals
+        self.streams = set()
+        # Check for new listings, delistings and blacklist changes every 15 min
+        self.universe_refresh_interval = 900
+        self.universe_thread = None
+        # Universe is updated from the refresh loop and settings listener threads
+        self.universe_lock = threading.RLock()
+        # Closed candles per symbol and streaming indicators updated from them.
+        # Algorithms can get higher timeframes with self.candles.resample(symbol, interval)
+        # and deep history (compressed beyond the last 1000, CANDLE_HISTORY) with self.candles.deep
+        self.candles = CandleStore(history=int(os.getenv("CANDLE_HISTORY", 7000)))
+        register_report("candles", self.candles.memory_report)
+        self.candles.subscribe(self.on_candle_close)
+        # Opt-in base stream (CANDLE_BASE_INTERVAL, e.g. 1m) subscribed next to candlestick_interval,
+        # for consumers of timeframes that can't be resampled from it (15m stats of QFL_signals
+        # with a 1h stream). It doubles the streams, without it base_candles are self.candles
+        self.base_interval = os.getenv("CANDLE_BASE_INTERVAL") or None
+        self.base_candles = self.candles
+        if self.base_interval:
+            self.base_candles = CandleStore(history=int(os.getenv("CANDLE_HISTORY", 7000)))
+            register_report("base_candles", self.base_candles.memory_report)
+        # Last prices for ticker_price, e.g. Autotrade margin shorts
+        self.price_cache = get_price_cache()
+        self.candle_indicators: dict[str, CandleIndicators] = {}
+        # Candles used for volatility, sd and lowest price, as many as the Binbot candlestick series
+        self.stats_window = 500
+        self.client = client or SpotWebsocketStreamClient(
             on_message=self.on_message,
             on_close=self.handle_close,
             on_error=self.handle_error,
         )
-        super().__init__()
+        super().__init__(clock=clock, offline=offline)
+        # Candles missed while disconnected are fetched before the next closed kline
+        self.kline_sync = KlineSync(self.candles, api=self, clock=self.clock)
+        self.settings_store.subscribe(self.on_settings_change)
 
     def new_tokens(self, projects) -> list:
         check_new_coin = (
             lambda coin_trade_time: (
-                datetime.now() - datetime.fromtimestamp(coin_trade_time)
+                self.clock.now() - datetime.fromtimestamp(coin_trade_time)
             ).days
             < 1
         )
@@ -371,6 +561,9 @@ class ResearchSignals(SetupSignals):
             on_close=self.handle_close,
             on_error=self.handle_error,
         )
+        # New connection has no subscriptions
+        self.subscribed_symbols = set()
+        self.streams = set()
         self.start_stream()
 
     def handle_error(self, socket, message):
@@ -379,12 +572,24 @@ class ResearchSignals(SetupSignals):
 
     def on_message(self, ws, message):
         res = json.loads(message)
+        self.price_cache.update_from_message(res)
 
         if "result" in res:
             print(f'Subscriptions: {res["result"]}')
 
         if "e" in res and res["e"] == "kline":
-            self.process_kline_stream(res)
+            if self.base_candles is not self.candles and res["k"]["i"] == self.base_interval:
+                self.base_candles.update(res["k"])
+            if res["k"]["i"] != self.interval:
+                return
+            if not self.offline:
+                self.kline_sync.catch_up(res["k"])
+            self.candles.update(res["k"])
+            if "E" in res:
+                # Exchange event time to receipt
+                self.metrics.observe("kline_lag", self.clock.time() - res["E"] / 1000)
+            with self.metrics.span("process_kline_stream"):
+                self.process_kline_stream(res)
 
     def log_volatility(self, data):
         """
@@ -428,49 +633,319 @@ class ResearchSignals(SetupSignals):
     def start_stream(self):
         logging.info("Initializing Research signals")
         self.load_data()
+        self.refresh_universe()
+
+        if not self.universe_thread:
+            self.universe_thread = threading.Thread(
+                target=self._universe_refresh_loop, name="universe-refresh", daemon=True
+            )
+            self.universe_thread.start()
+
+    def get_trading_symbols(self) -> set:
         exchange_info = self._exchange_info()
-        raw_symbols = set(
+        return set(
             coin["symbol"]
             for coin in exchange_info["symbols"]
             if coin["status"] == "TRADING"
             and coin["symbol"].endswith(self.settings["balance_to_use"])
         )
 
-        black_list = set(x["pair"] for x in self.blacklist_data)
-        market = raw_symbols - black_list
-        params = []
+    def refresh_universe(self, fetch=True):
+        """
+        Diff the USDT universe (trading symbols - blacklist) against current subscriptions
+
+        - Only new/removed streams are sent to the websocket
+        - Only changed entries are posted to the subscribed list in DB
+        - State of symbols that left the universe is evicted
+
+        Args:
+        - fetch: get trading symbols from Binance exchange info,
+        otherwise reuse the last ones (e.g. only blacklist changed)
+        """
+        with self.universe_lock:
+            if fetch:
+                self.trading_symbols = self.get_trading_symbols()
+
+            black_list = set(x["pair"] for x in self.blacklist_data)
+            market = self.trading_symbols - black_list
+            added, removed = self.update_subscriptions(market)
+
         subscription_list = []
-        for m in market:
-            params.append(f"{m.lower()}")
-            if m in black_list:
-                subscription_list.append(
-                    {
-                        "_id": m,
-                        "pair": m,
-                        "blacklisted": True,
-                    }
-                )
-            else:
-                subscription_list.append(
-                    {
-                        "_id": m,
-                        "pair": m,
-                        "blacklisted": False,
-                    }
-                )
+        for m in added | removed:
+            subscription_list.append(
+                {
+                    "_id": m,
+                    "pair": m,
+                    "blacklisted": m in black_list,
+                }
+            )
+
+        for symbol in removed:
+            self.evict_symbol(symbol)
 
         # update DB
-        self.update_subscribed_list(subscription_list)
+        if subscription_list:
+            self.update_subscribed_list(subscription_list)
+            logging.info(
+                f"Universe updated: subscribed {len(added)}, unsubscribed {len(removed)} symbols"
+            )
+
+        return added, removed
+
+    def _universe_refresh_loop(self):
+        while True:
+            sleep(self.universe_refresh_interval)
+            try:
+                self.refresh_universe()
+            except Exception as error:
+                logging.error(f"Failed to refresh universe: {error}")
+
+    def evict_symbol(self, symbol):
+        """
+        Remove per-symbol state once a symbol is no longer subscribed
+        """
+        self.last_processed_kline.pop(symbol, None)
+        self.candles.evict(symbol)
+        if self.base_candles is not self.candles:
+            self.base_candles.evict(symbol)
+        self.candle_indicators.pop(symbol, None)
+        self.kline_sync.evict(symbol)
+        self.price_cache.evict(symbol)
+
+    @property
+    def stream_intervals(self) -> tuple:
+        if self.base_interval and self.base_interval != self.interval:
+            return (self.interval, self.base_interval)
+        return (self.interval,)
+
+    def update_subscriptions(self, market: set):
+        """
+        Subscribe/unsubscribe only the streams that changed,
+        on the existing connection
 
-        self.client.klines(markets=params, interval=self.interval)
+        Streams of every interval in stream_intervals, so a new candlestick
+        interval replaces the streams of the previous one
+        """
+        symbols = set(market) or {KEEP_ALIVE_SYMBOL}
+        streams = {
+            f"{m.lower()}@kline_{interval}" for m in symbols for interval in self.stream_intervals
+        }
+        with self.universe_lock:
+            stale = self.streams - streams
+            new = streams - self.streams
+            if stale:
+                self.send_streams(self.client.unsubscribe, sorted(stale))
+            if new:
+                self.send_streams(self.client.subscribe, sorted(new))
+            self.streams = streams
+
+            removed = self.subscribed_symbols - market
+            added = market - self.subscribed_symbols
+            self.subscribed_symbols = set(market)
+        return added, removed
+
+    def send_streams(self, method, streams: list):
+        """
+        (Un)subscribe streams in messages of at most max_request streams,
+        read on every call so settings changes apply to the next message
+        """
+        size = max(int(self.max_request), 1)
+        for i in range(0, len(streams), size):
+            method(streams[i : i + size])
+
+    def on_settings_change(self, previous, snapshot):
+        """
+        Called by SettingsStore when controller data changes.
+        Streams are updated live instead of restarting
+        """
+        if previous.max_request != snapshot.max_request:
+            # Streams already subscribed stay, only new messages are split differently
+            logging.info(
+                f"Max streams per request changed {previous.max_request} -> {snapshot.max_request}"
+            )
+
+        if previous.interval != snapshot.interval:
+            logging.info(
+                f"Candlestick interval changed {previous.interval} -> {snapshot.interval}"
+            )
+            # Before start_stream there is nothing to replace,
+            # the first subscriptions use the new interval
+            with self.universe_lock:
+                if self.streams:
+                    self.update_subscriptions(self.subscribed_symbols)
+
+        if (
+            previous.settings["balance_to_use"] != snapshot.settings["balance_to_use"]
+        ):
+            self.refresh_universe()
+        elif previous.blacklisted_pairs != snapshot.blacklisted_pairs:
+            self.refresh_universe(fetch=False)
+
+    def _indicators_from_candles(self, symbol, candles) -> CandleIndicators:
+        indicators = self.candle_indicators[symbol] = CandleIndicators.from_candles(
+            candles.high, candles.low, candles.close, candles.volume, window=self.stats_window
+        )
+        return indicators
+
+    def on_candle_close(self, symbol, candles):
+        """
+        Update streaming indicators with the new closed candle (see CandleStore)
+        """
+        indicators = self.candle_indicators.get(symbol)
+        # First candle of a new buffer, e.g. after an interval change
+        if indicators is None or len(candles) == 1:
+            self._indicators_from_candles(symbol, candles)
+        else:
+            indicators.update(
+                candles.high[-1], candles.low[-1], candles.close[-1], candles.volume[-1]
+            )
+
+    def seed_candles(self, symbol, trace):
+        """
+        Warm up the candle store with the candlestick history,
+        the last candle of the trace is still open
+        """
+        candles = self.candles.get(symbol)
+        if "volume" not in trace or (
+            candles
+            and candles.interval == self.interval
+            and len(candles) >= len(trace["x"]) - 1
+        ):
+            return
+
+        self.candles.seed(
+            symbol,
+            self.interval,
+            trace["x"][:-1],
+            trace["open"][:-1],
+            trace["high"][:-1],
+            trace["low"][:-1],
+            trace["close"][:-1],
+            trace["volume"][:-1],
+        )
+        # Rebuilt from the merged history on next use
+        self.candle_indicators.pop(symbol, None)
+
+    def candle_features(self, symbol, close_price) -> bool:
+        """
+        Set features of symbol, kept up to date on each closed candle, as attributes
+        so algorithms can use them at no extra cost:
+        - volatility (log returns, %), sd and lowest_price over the last stats_window candles
+        - A/D line, Chaikin oscillator ADOSC(3, 10) and its change (chaikin_diff), OBV
+
+        Returns False if there are not enough local candles, see trace_features
+        """
+        indicators = self.candle_indicators.get(symbol)
+        candles = self.candles.get(symbol)
+        if indicators is None and candles:
+            indicators = self._indicators_from_candles(symbol, candles)
+
+        if indicators is None or len(indicators.std.window) < 2:
+            self.accumulation_distribution = None
+            self.chaikin = None
+            self.chaikin_diff = None
+            self.obv = None
+            return False
+
+        self.volatility = round_numbers(indicators.volatility.std.expanding * 100, 6)
+        self.sd = round_numbers(indicators.std.expanding, 4)
+        # Including the current price, as the candlestick series
+        self.lowest_price = min(indicators.lowest.expanding, close_price)
+
+        self.accumulation_distribution = indicators.volume.ad
+        self.chaikin = indicators.volume.adosc
+        self.chaikin_diff = indicators.volume.adosc_diff
+        self.obv = indicators.volume.obv
+        return True
+
+    def trace_features(self, data):
+        """
+        volatility, sd and lowest_price from the candlestick series,
+        when there are no local candles (e.g. series without volume)
+        """
+        self.volatility = self.log_volatility(data)
+        closing_prices = numpy.array(data["trace"][0]["close"]).astype(numpy.single)
+        # Average amplitude
+        self.sd = round_numbers(numpy.std(closing_prices), 4)
+        # historical lowest for short_buy_price
+        self.lowest_price = numpy.min(closing_prices)
+
+    def local_candlestick(self, symbol, kline) -> dict | None:
+        """
+        Candlestick series in the format of _get_candlestick(stats=True),
+        built from local candles and the kline being processed (last, maybe still open)
+
+        Moving averages, MACD and RSI only include values with enough candles.
+        Returns None if there are less than 2 candles
+        """
+        candles = self.candles.get(symbol)
+        data = numpy.empty((len(FIELDS), 0))
+        if candles and candles.interval == self.interval:
+            data = numpy.array([candles.column(name) for name in FIELDS])
+        if not data.shape[1] or kline["t"] > data[0, -1]:
+            current = [kline["t"], kline["o"], kline["h"], kline["l"], kline["c"], kline["v"]]
+            data = numpy.concatenate([data, numpy.array(current, dtype=float)[:, None]], axis=1)
+        if data.shape[1] < 2:
+            return None
+
+        open_time, open, high, low, close, volume = data[:, -self.stats_window :]
+        open_time = open_time.astype(numpy.int64)
+        macd_line, macd_signal, _ = indicators.macd(close)
+        rsi = indicators.rsi(close)
+
+        btc_correlation = 0.0
+        btc = self.candles.get("BTCUSDT")
+        if symbol != "BTCUSDT" and btc and btc.interval == self.interval:
+            _, index, btc_index = numpy.intersect1d(open_time, btc.open_time, return_indices=True)
+            if len(index) > 2:
+                btc_correlation = float(
+                    numpy.nan_to_num(numpy.corrcoef(close[index], btc.close[btc_index])[0, 1])
+                )
+
+        def values(series):
+            return series[~numpy.isnan(series)].tolist()
+
+        def indexed(series):
+            return {str(i): value for i, value in enumerate(values(series))}
+
+        return {
+            "trace": [
+                {
+                    "x": open_time.tolist(),
+                    "open": open.tolist(),
+                    "high": high.tolist(),
+                    "low": low.tolist(),
+                    "close": close.tolist(),
+                    "volume": volume.tolist(),
+                },
+                {"y": values(indicators.sma(close, 100))},
+                {"y": values(indicators.sma(close, 25))},
+                {"y": values(indicators.sma(close, 7))},
+            ],
+            "macd": indexed(macd_line),
+            "macd_signal": indexed(macd_signal),
+            "rsi": indexed(rsi),
+            "btc_correlation": {"close_price": btc_correlation},
+        }
+
+    def run_algorithm(self, algorithm, *args, **kwargs):
+        """
+        Run algorithm(self, *args, **kwargs) if enabled, timing it per algorithm
+        """
+        name = algorithm.__name__
+        if name not in self.algorithms:
+            return
+        with self.metrics.span(f"algorithm.{name}"):
+            return algorithm(self, *args, **kwargs)
 
     def process_kline_stream(self, result):
         """
         Updates market data in DB for research
         """
         # Sleep 1 hour because of snapshot account request weight
-        if datetime.now().time().hour == 0 and datetime.now().time().minute == 0:
-            sleep(1800)
+        now = self.clock.now()
+        if now.hour == 0 and now.minute == 0:
+            self.clock.sleep(1800)
 
         symbol = result["k"]["s"]
         if (
@@ -482,23 +957,34 @@ class ResearchSignals(SetupSignals):
         ):
             close_price = float(result["k"]["c"])
             open_price = float(result["k"]["o"])
-            data = self._get_candlestick(symbol, self.interval, stats=True)
-
-            self.volatility = self.log_volatility(data)
+            self.candle_open_time = result["k"]["t"]
+            with self.metrics.span("candlestick"):
+                if self.offline:
+                    data = self.local_candlestick(symbol, result["k"])
+                else:
+                    data = self._get_candlestick(symbol, self.interval, stats=True)
+            if data is None:
+                return
 
-            df = pd.DataFrame(
-                {
-                    "date": data["trace"][0]["x"],
-                    "close": numpy.array(data["trace"][0]["close"]).astype(float),
-                }
-            )
-            slope, intercept, rvalue, pvalue, stderr = stats.linregress(
-                df["date"], df["close"]
-            )
+            with self.metrics.span("linregress"):
+                df = pd.DataFrame(
+                    {
+                        "date": data["trace"][0]["x"],
+                        "close": numpy.array(data["trace"][0]["close"]).astype(float),
+                    }
+                )
+                slope, intercept, rvalue, pvalue, stderr = stats.linregress(
+                    df["date"], df["close"]
+                )
 
             if "error" in data and data["error"] == 1:
                 return
 
+            with self.metrics.span("candle_features"):
+                self.seed_candles(symbol, data["trace"][0])
+                if not self.candle_features(symbol, close_price):
+                    self.trace_features(data)
+
             ma_100 = data["trace"][1]["y"]
             ma_25 = data["trace"][2]["y"]
             ma_7 = data["trace"][3]["y"]
@@ -512,15 +998,7 @@ class ResearchSignals(SetupSignals):
                 print(msg)
                 return
 
-            # Average amplitude
-            msg = None
-            list_prices = numpy.array(data["trace"][0]["close"])
-            self.sd = round_numbers(numpy.std(list_prices.astype(numpy.single)), 4)
-
-            # historical lowest for short_buy_price
-            lowest_price = numpy.min(
-                numpy.array(data["trace"][0]["close"]).astype(numpy.single)
-            )
+            lowest_price = self.lowest_price
 
             # COIN/BTC correlation: closer to 1 strong
             btc_correlation = data["btc_correlation"]
@@ -529,8 +1007,8 @@ class ResearchSignals(SetupSignals):
                 self.market_domination_trend == "gainers"
                 and self.market_domination_reversal
             ):
-                buy_low_sell_high(
-                    self,
+                self.run_algorithm(
+                    buy_low_sell_high,
                     close_price,
                     symbol,
                     rsi,
@@ -539,8 +1017,8 @@ class ResearchSignals(SetupSignals):
                     ma_100,
                 )
 
-                price_rise_15(
-                    self,
+                self.run_algorithm(
+                    price_rise_15,
                     close_price,
                     symbol,
                     data["trace"][0]["close"][-2],
@@ -549,8 +1027,8 @@ class ResearchSignals(SetupSignals):
                     btc_correlation=btc_correlation,
                 )
 
-                rally_or_pullback(
-                    self,
+                self.run_algorithm(
+                    rally_or_pullback,
                     close_price,
                     symbol,
                     lowest_price,
@@ -563,8 +1041,8 @@ class ResearchSignals(SetupSignals):
                     btc_correlation,
                 )
 
-            fast_and_slow_macd(
-                self,
+            self.run_algorithm(
+                fast_and_slow_macd,
                 close_price,
                 symbol,
                 macd,
@@ -579,8 +1057,8 @@ class ResearchSignals(SetupSignals):
                 stderr,
             )
 
-            ma_candlestick_jump(
-                self,
+            self.run_algorithm(
+                ma_candlestick_jump,
                 close_price,
                 open_price,
                 ma_7,
@@ -596,8 +1074,8 @@ class ResearchSignals(SetupSignals):
                 btc_correlation=btc_correlation,
             )
 
-            ma_candlestick_drop(
-                self,
+            self.run_algorithm(
+                ma_candlestick_drop,
                 close_price,
                 open_price,
                 ma_7,
@@ -610,8 +1088,8 @@ class ResearchSignals(SetupSignals):
                 btc_correlation=btc_correlation,
             )
 
-            top_gainers_drop(
-                self,
+            self.run_algorithm(
+                top_gainers_drop,
                 close_price,
                 open_price,
                 ma_7,
@@ -623,15 +1101,16 @@ class ResearchSignals(SetupSignals):
                 btc_correlation,
             )
 
-            self.last_processed_kline[symbol] = time()
+            self.last_processed_kline[symbol] = self.clock.time()
 
         # If more than 6 hours passed has passed
         # Then we should resume sending signals for given symbol
         if (
             symbol in self.last_processed_kline
-            and (float(time()) - float(self.last_processed_kline[symbol])) > 6000
+            and (float(self.clock.time()) - float(self.last_processed_kline[symbol])) > 6000
         ):
             del self.last_processed_kline[symbol]
 
-        self.market_domination()
+        with self.metrics.span("market_domination"):
+            self.market_domination()
         pass
@@ -0,0 +1,113 @@
+import glob
+import gzip
+import logging
+import os
+import threading
+import time
+
+"""
+Websocket frame recorder
+
+Opt-in with RECORD_FRAMES_DIR environment variable.
+Every text frame received is appended to gzip files with its receipt timestamp,
+one frame per line: <timestamp ns>\t<frame>
+Files are rotated by size (uncompressed) and age, see streaming/replay.py to replay them.
+"""
+
+
+class FrameRecorder:
+    def __init__(
+        self,
+        directory,
+        max_bytes=64 * 1024 * 1024,
+        max_seconds=3600,
+        prefix="frames",
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.file = None
+        self.path = None
+        self.written = 0
+        self.opened_at = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _rotate(self):
+        if self.file:
+            self.file.close()
+        # Sortable names, replay reads files in name order
+        self.path = os.path.join(
+            self.directory, f"{self.prefix}-{time.time_ns()}.jsonl.gz"
+        )
+        self.file = gzip.open(self.path, "at", encoding="utf-8")
+        self.written = 0
+        self.opened_at = time.monotonic()
+        logging.info(f"Recording websocket frames to {self.path}")
+
+    def record(self, frame: str, timestamp_ns=None):
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        line = f"{timestamp_ns}\t{frame}\n"
+        with self.lock:
+            if (
+                not self.file
+                or self.written >= self.max_bytes
+                or time.monotonic() - self.opened_at >= self.max_seconds
+            ):
+                self._rotate()
+            self.file.write(line)
+            self.written += len(line)
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder() -> FrameRecorder | None:
+    """
+    Process wide recorder if RECORD_FRAMES_DIR is set, otherwise None
+    Shared so that reconnections keep writing to the same files
+    """
+    global _recorder
+    directory = os.getenv("RECORD_FRAMES_DIR")
+    if not directory:
+        return None
+    with _recorder_lock:
+        if not _recorder:
+            _recorder = FrameRecorder(directory)
+        return _recorder
+
+
+def frame_files(path) -> list:
+    """
+    Recorded files in order. Path can be a directory, a file or a glob pattern
+    """
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*.jsonl.gz")))
+    return sorted(glob.glob(path))
+
+
+def read_frames(paths):
+    """
+    Yields (timestamp in seconds, frame) from recorded files
+    A truncated last line (process killed while writing) is skipped
+    """
+    for path in paths:
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    timestamp, frame = line.rstrip("\n").split("\t", 1)
+                    yield int(timestamp) / 1e9, frame
+        except EOFError:
+            # File was not closed properly, keep what could be read
+            logging.warning(f"Incomplete frames file {path}")
@@ -0,0 +1,181 @@
+import argparse
+import json
+import logging
+
+from time import monotonic, sleep
+
+from clock import SimulatedClock, set_clock
+from streaming.recorder import frame_files, read_frames
+
+"""
+Replay websocket frames recorded by streaming/recorder.py
+
+Frames are fed to an on_message(ws, message) callback (e.g. ResearchSignals.on_message)
+at real time (speed=1), N times faster (speed=N) or as fast as possible (speed=0).
+A SimulatedClock is set to the receipt time of each frame before it's processed,
+so time checks (market momentum, cooldowns) behave as they did live.
+
+Replays run offline (see SetupSignals): settings come from --settings (controller data
+as SettingsStore._fetch returns it) or REPLAY_SETTINGS, candlesticks are built from the
+replayed klines. Nothing is requested from Binbot or Binance and autotrades are only
+logged, even if the settings enable them.
+
+Usage:
+python -m streaming.replay recordings/ --speed 10
+python -m streaming.replay recordings/ --speed 0 --settings controller.json
+"""
+
+# Controller data used without --settings, interval is the one of the recorded klines
+REPLAY_SETTINGS = {
+    "settings": {
+        "candlestick_interval": "1m",
+        "max_request": 950,
+        "autotrade": 0,
+        "strategy": "long",
+        "balance_to_use": "USDT",
+        "base_order_size": "15",
+        "balance_size_to_use": "0",
+        "max_active_autotrade_bots": 1,
+        "take_profit": 2.3,
+        "trailling": "true",
+        "trailling_deviation": 0.63,
+        "stop_loss": 3,
+        "update_required": None,
+        "system_logs": [],
+    },
+    "test_autotrade_settings": {
+        "candlestick_interval": "1m",
+        "autotrade": 0,
+        "balance_to_use": "USDT",
+        "max_active_autotrade_bots": 1,
+    },
+    "blacklist": [],
+    "active_symbols": [],
+    "active_test_bots": [],
+}
+
+
+def recorded_interval(paths) -> str | None:
+    """
+    Interval of the first kline in the recorded files
+    """
+    for _, frame in read_frames(paths):
+        message = json.loads(frame)
+        if isinstance(message, dict) and message.get("e") == "kline":
+            return message["k"]["i"]
+    return None
+
+
+def replay_settings(paths, settings_path=None) -> dict:
+    """
+    Controller data for SettingsStore.load_snapshot, from settings_path (JSON) or REPLAY_SETTINGS
+    """
+    if settings_path:
+        with open(settings_path) as f:
+            return json.load(f)
+
+    data = json.loads(json.dumps(REPLAY_SETTINGS))
+    interval = recorded_interval(paths)
+    if interval:
+        data["settings"]["candlestick_interval"] = interval
+        data["test_autotrade_settings"]["candlestick_interval"] = interval
+    return data
+
+
+class ReplayClient:
+    """
+    Stands in for SpotWebsocketStreamClient during replays,
+    subscriptions are only logged as frames come from files
+    """
+
+    def __init__(self) -> None:
+        self.subscriptions = set()
+
+    def subscribe(self, stream, id=None):
+        self.subscriptions.update([stream] if isinstance(stream, str) else stream)
+
+    def unsubscribe(self, stream, id=None):
+        self.subscriptions.difference_update(
+            [stream] if isinstance(stream, str) else stream
+        )
+
+    def klines(self, markets: list, interval: str, id=None, action=None):
+        self.subscribe([f"{market.lower()}@kline_{interval}" for market in markets])
+
+    def stop(self, id=None):
+        pass
+
+
+class ReplayDriver:
+    def __init__(self, paths, on_message, clock: SimulatedClock, speed: float = 1) -> None:
+        """
+        Args:
+        - paths: recorded files, in order (see recorder.frame_files)
+        - on_message: callback(ws, message)
+        - clock: simulated clock shared with the code under replay
+        - speed: 1 real time, N times faster, 0 as fast as possible
+        """
+        self.paths = paths
+        self.on_message = on_message
+        self.clock = clock
+        self.speed = speed
+        self.frames = 0
+        self.errors = 0
+
+    def run(self, limit=None) -> dict:
+        started = monotonic()
+        first_timestamp = None
+        last_timestamp = None
+
+        for timestamp, frame in read_frames(self.paths):
+            if first_timestamp is None:
+                first_timestamp = timestamp
+                self.clock.set(timestamp)
+
+            if self.speed:
+                target = (timestamp - first_timestamp) / self.speed
+                delay = target - (monotonic() - started)
+                if delay > 0:
+                    sleep(delay)
+
+            self.clock.set(timestamp)
+            last_timestamp = timestamp
+            try:
+                self.on_message(None, frame)
+            except Exception as error:
+                self.errors += 1
+                logging.error(f"Error replaying frame: {error}")
+
+            self.frames += 1
+            if limit and self.frames >= limit:
+                break
+
+        elapsed = monotonic() - started
+        simulated = (last_timestamp - first_timestamp) if first_timestamp else 0
+        return {
+            "frames": self.frames,
+            "errors": self.errors,
+            "elapsed": round(elapsed, 3),
+            "simulated": round(simulated, 3),
+            "frames_per_second": round(self.frames / elapsed, 2) if elapsed else 0,
+        }
+
+
+if __name__ == "__main__":
+    from signals import ResearchSignals
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Replay recorded websocket frames")
+    parser.add_argument("path", help="Recordings directory, file or glob")
+    parser.add_argument("--speed", type=float, default=1, help="1 real time, N times faster, 0 as fast as possible")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after N frames")
+    parser.add_argument("--settings", help="Controller data JSON, defaults to REPLAY_SETTINGS")
+    args = parser.parse_args()
+
+    paths = frame_files(args.path)
+    clock = SimulatedClock()
+    set_clock(clock)
+    research = ResearchSignals(clock=clock, client=ReplayClient(), offline=True)
+    research.settings_store.load_snapshot(replay_settings(paths, args.settings))
+    driver = ReplayDriver(paths, research.on_message, clock, args.speed)
+    print(driver.run(limit=args.limit))
@@ -1,3 +1,5 @@
+import os
+
 from streaming.socket_manager import BinanceWebsocketClient
 
 class SpotWebsocketStreamClient(BinanceWebsocketClient):
@@ -6,7 +8,7 @@ class SpotWebsocketStreamClient(BinanceWebsocketClient):
 
     def __init__(
         self,
-        stream_url="wss://stream.binance.com:443",
+        stream_url=None,
         on_message=None,
         on_open=None,
         on_close=None,
@@ -14,7 +16,11 @@ class SpotWebsocketStreamClient(BinanceWebsocketClient):
         on_ping=None,
         on_pong=None,
         is_combined=False,
+        recorder=None,
     ):
+        if not stream_url:
+            # BINANCE_WS_URL overrides it, e.g. local fake exchange
+            stream_url = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:443")
         if is_combined:
             stream_url = stream_url + "/stream"
         else:
@@ -27,6 +33,7 @@ class SpotWebsocketStreamClient(BinanceWebsocketClient):
             on_error=on_error,
             on_ping=on_ping,
             on_pong=on_pong,
+            recorder=recorder,
         )
 
     def klines(self, markets: list, interval: str, id=None, action=None):
@@ -9,6 +9,7 @@ from websocket import (
     WebSocketException,
     WebSocketConnectionClosedException,
 )
+from streaming.recorder import get_recorder
 
 
 class BinanceSocketManager(threading.Thread):
@@ -22,6 +23,7 @@ class BinanceSocketManager(threading.Thread):
         on_ping=None,
         on_pong=None,
         logger=None,
+        recorder=None,
     ):
         threading.Thread.__init__(self)
         if not logger:
@@ -34,6 +36,8 @@ class BinanceSocketManager(threading.Thread):
         self.on_ping = on_ping
         self.on_pong = on_pong
         self.on_error = on_error
+        # streaming.recorder.FrameRecorder, keeps received frames for replays
+        self.recorder = recorder
         self.create_ws_connection()
     
     def create_ws_connection(self):
@@ -78,6 +82,8 @@ class BinanceSocketManager(threading.Thread):
                 data = frame.data
                 if op_code == ABNF.OPCODE_TEXT:
                     data = data.decode("utf-8")
+                    if self.recorder:
+                        self.recorder.record(data)
                 self._callback(self.on_message, data)
 
     def close(self):
@@ -110,10 +116,14 @@ class BinanceWebsocketClient:
         on_ping=None,
         on_pong=None,
         logger=None,
+        recorder=None,
     ):
         if not logger:
             logger = logging.getLogger(__name__)
         self.logger = logger
+        if not recorder:
+            # Opt-in with RECORD_FRAMES_DIR
+            recorder = get_recorder()
         self.socket_manager = self._initialize_socket(
             stream_url,
             on_message,
@@ -123,6 +133,7 @@ class BinanceWebsocketClient:
             on_ping,
             on_pong,
             logger,
+            recorder,
         )
 
         # start the thread
@@ -139,6 +150,7 @@ class BinanceWebsocketClient:
         on_ping,
         on_pong,
         logger,
+        recorder=None,
     ):
         return BinanceSocketManager(
             stream_url,
@@ -149,6 +161,7 @@ class BinanceWebsocketClient:
             on_ping=on_ping,
             on_pong=on_pong,
             logger=logger,
+            recorder=recorder,
         )
 
     def get_timestamp(self):
@@ -173,14 +186,12 @@ class BinanceWebsocketClient:
         json_msg = json.dumps({"method": "SUBSCRIBE", "params": stream, "id": id})
         self.socket_manager.send_message(json_msg)
 
-    def unsubscribe(self, stream: str, id=None):
+    def unsubscribe(self, stream: str | list, id=None):
         if not id:
             id = self.get_timestamp()
 
-        if not self._single_stream(stream):
-            raise ValueError("Invalid stream name, expect a string")
-
-        stream = [stream]
+        if self._single_stream(stream):
+            stream = [stream]
         self.socket_manager.send_message(
             json.dumps({"method": "UNSUBSCRIBE", "params": stream, "id": id})
         )
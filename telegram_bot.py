@@ -1,5 +1,11 @@
+import html
+import logging
 import os
+import threading
 
+from collections import deque
+from queue import Empty, Full, Queue
+from time import monotonic, sleep
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import (
     CallbackContext,
@@ -17,7 +23,8 @@ class TelegramBot:
     def __init__(self):
         self.token = os.getenv("TELEGRAM_BOT_KEY")
         self.chat_id = os.getenv("TELEGRAM_USER_ID")
-        self.updater = Updater(self.token)
+        # TELEGRAM_API_URL overrides Telegram Bot API, e.g. local fake exchange
+        self.updater = Updater(self.token, base_url=os.getenv("TELEGRAM_API_URL"))
 
     def buy(self, update: Update, context: CallbackContext) -> None:
         """Sends a message with three inline buttons attached."""
@@ -71,3 +78,170 @@ class TelegramBot:
         )
         self.updater.dispatcher.add_handler(CallbackQueryHandler(self.button))
         return
+
+
+class TelegramDispatcher:
+    """
+    Non-blocking outbound queue for telegram messages
+
+    Messages are queued by the caller and sent by a background thread.
+    Messages that arrive within `coalesce_window` seconds are merged into one digest,
+    and sending is throttled to stay under Telegram limits
+    (about 1 message per second per chat, 20 per minute in groups)
+    https://core.telegram.org/bots/faq#my-bot-is-hitting-limits-how-do-i-avoid-this
+    """
+
+    # Telegram rejects messages longer than this
+    max_length = 4096
+    separator = "\n\n"
+
+    def __init__(
+        self,
+        telegram_bot: TelegramBot,
+        coalesce_window=2,
+        min_interval=1.1,
+        max_per_minute=20,
+        max_queue=1000,
+    ):
+        self.telegram_bot = telegram_bot
+        self.coalesce_window = coalesce_window
+        self.min_interval = min_interval
+        self.max_per_minute = max_per_minute
+        self.queue: Queue = Queue(maxsize=max_queue)
+        self.sent_at: deque = deque()
+        self.dropped = 0
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def send(self, msg):
+        """
+        Queue message, never blocks. If the queue is full the message is dropped
+        """
+        self._start()
+        try:
+            self.queue.put_nowait(msg)
+        except Full:
+            self.dropped += 1
+            logging.error(f"Telegram queue full, dropped {self.dropped} messages")
+
+    def _start(self):
+        with self.lock:
+            if not self.thread:
+                self.thread = threading.Thread(
+                    target=self._run, name="telegram-dispatcher", daemon=True
+                )
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = monotonic() + self.coalesce_window
+            while True:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except Empty:
+                    break
+
+            for digest in self._digests(batch):
+                self._wait_for_slot()
+                self._deliver(digest)
+
+    def _cut(self, msg) -> int:
+        """
+        Length of the first part of msg: the last line break, space or any position
+        up to max_length outside HTML tags, elements and entities (messages use parse_mode="HTML"),
+        0 if there is none
+        """
+        newline = space = boundary = 0
+        depth = 0
+        tag = closing = entity = False
+        for i, char in enumerate(msg[: self.max_length + 1]):
+            if i and not depth and not tag and not entity:
+                boundary = i
+                if char == "\n":
+                    newline = i
+                elif char == " ":
+                    space = i
+            if tag:
+                if char == ">":
+                    tag = False
+                    depth += -1 if closing else 1
+            elif char == "<":
+                tag = True
+                closing = msg.startswith("</", i)
+            elif char == "&":
+                entity = True
+            elif entity and (char == ";" or char.isspace()):
+                entity = False
+        return newline or space or boundary
+
+    def _split(self, msg):
+        """
+        Split a message over max_length without breaking its HTML (see _cut),
+        otherwise Telegram rejects the parts
+        """
+        parts = []
+        while len(msg) > self.max_length:
+            cut = self._cut(msg)
+            if not cut:
+                # An element longer than max_length, the rest is sent as text
+                msg = html.escape(msg, quote=False)
+                cut = self._cut(msg) or self.max_length
+            parts.append(msg[:cut])
+            msg = msg[cut:].lstrip("\n ")
+        parts.append(msg)
+        return parts
+
+    def _digests(self, batch):
+        """
+        Merge messages into as few as possible under max_length
+        A single message over the limit is split (see _split)
+        """
+        digests = []
+        current = ""
+        for msg in (part for msg in batch for part in self._split(msg)):
+            if current and len(current) + len(self.separator) + len(msg) > self.max_length:
+                digests.append(current)
+                current = ""
+            current = f"{current}{self.separator}{msg}" if current else msg
+        if current:
+            digests.append(current)
+        return digests
+
+    def _wait_for_slot(self):
+        now = monotonic()
+        while self.sent_at and now - self.sent_at[0] > 60:
+            self.sent_at.popleft()
+
+        wait = 0
+        if self.sent_at:
+            wait = self.min_interval - (now - self.sent_at[-1])
+        if len(self.sent_at) >= self.max_per_minute:
+            wait = max(wait, 60 - (now - self.sent_at[0]))
+        if wait > 0:
+            sleep(wait)
+
+    def _deliver(self, msg, retries=1):
+        """
+        Send msg, retrying after flood control. Counts once against the rate limits
+        """
+        try:
+            while True:
+                try:
+                    self.telegram_bot.send_msg(msg)
+                    return
+                except Exception as error:
+                    # telegram.error.RetryAfter when we hit flood limits
+                    retry_after = getattr(error, "retry_after", None)
+                    if retry_after and retries > 0:
+                        logging.warning(f"Telegram flood control, retrying in {retry_after}s")
+                        retries -= 1
+                        sleep(retry_after)
+                        continue
+                    logging.error(f"Failed to send telegram message: {error}")
+                    return
+        finally:
+            self.sent_at.append(monotonic())
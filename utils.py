@@ -2,7 +2,7 @@ import math
 import logging
 
 from decimal import Decimal
-from time import sleep
+from clock import get_clock
 from requests import HTTPError, Response
 
 
@@ -53,7 +53,7 @@ def handle_binance_errors(response: Response):
     if 400 <= response.status_code < 500:
         print(response.status_code, response.url)
         if response.status_code == 418:
-            sleep(120)
+            get_clock().sleep(120)
 
     # Calculate request weights and pause half of the way (1200/2=600)
     if (
@@ -61,7 +61,7 @@ def handle_binance_errors(response: Response):
         and int(response.headers["x-mbx-used-weight-1m"]) > 600
     ):
         print("Request weight limit prevention pause, waiting 1 min")
-        sleep(120)
+        get_clock().sleep(120)
 
     content = response.json()
 
@@ -111,8 +111,10 @@ def bollinguer_spreads(ma_100, ma_25, ma_7):
     - spread: spread in absolute value
     """
 
-    band_1 = ((ma_100[500] - ma_25[500]) / ma_100[500]) * 100
-    band_2 = ((ma_25[500] - ma_7[500]) / ma_25[500]) * 100
+    # Latest values, series length depends on the candlestick limit
+    ma_100, ma_25, ma_7 = ma_100[len(ma_100) - 1], ma_25[len(ma_25) - 1], ma_7[len(ma_7) - 1]
+    band_1 = ((ma_100 - ma_25) / ma_100) * 100
+    band_2 = ((ma_25 - ma_7) / ma_25) * 100
 
     return {
         "band_1": abs(float(supress_notation(band_1, 4))),